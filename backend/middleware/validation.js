@@ -60,6 +60,18 @@ const schemas = {
       })
   }),
 
+  lead: Joi.object({
+    // Lead queue journal id; repeated deliveries of the same lead upsert on it
+    id: Joi.string().max(64).optional(),
+    client_id: Joi.string().max(64).optional(),
+    session_id: Joi.string().trim().max(255).default('unknown'),
+    name: Joi.string().trim().min(1).max(255).required(),
+    business: Joi.string().trim().max(255).optional().allow(''),
+    phone: Joi.string().trim().min(1).max(50).required(),
+    source: Joi.string().trim().max(100).default('rasa_voice_agent'),
+    timestamp: Joi.number().optional().allow(null)
+  }),
+
   handoff: Joi.object({
     session_id: Joi.string()
       .uuid()
@@ -75,6 +87,15 @@ const schemas = {
   })
 };
 
+// Bulk lead ingestion wraps the single-lead schema
+schemas.leadBatch = Joi.object({
+  leads: Joi.array()
+    .items(schemas.lead)
+    .min(1)
+    .max(parseInt(process.env.MAX_LEAD_BATCH_SIZE) || 500)
+    .required()
+});
+
 /**
  * Create validation middleware for specific schema
  * @param {string} schemaName - Name of the schema to validate against
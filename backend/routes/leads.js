@@ -0,0 +1,87 @@
+/**
+ * Lead ingestion endpoints
+ * Receives leads captured by the Rasa action server, singly or in batches
+ */
+
+const express = require('express');
+const { createClient } = require('@supabase/supabase-js');
+const logger = require('../utils/logger');
+const { validateInput } = require('../middleware/validation');
+const router = express.Router();
+
+const SUPABASE_URL = process.env.SUPABASE_URL || '';
+const SUPABASE_KEY = process.env.SUPABASE_KEY || '';
+
+const supabase = SUPABASE_URL && SUPABASE_KEY
+  ? createClient(SUPABASE_URL, SUPABASE_KEY)
+  : null;
+
+/**
+ * Map an action-server lead onto a leads table row
+ * @param {Object} lead - Validated lead payload
+ * @returns {Object} - Row for the leads table
+ */
+function toLeadRow(lead) {
+  return {
+    session_id: lead.session_id,
+    name: lead.name,
+    phone_number: lead.phone,
+    source_channel: lead.source,
+    client_lead_id: lead.id || null,
+    metadata: {
+      business: lead.business,
+      client_id: lead.client_id,
+      latest_event_time: lead.timestamp
+    }
+  };
+}
+
+/**
+ * Insert lead rows in a single round-trip. Leads carrying a journal id are
+ * upserted on it, so a batch retried after a lost response is not stored twice.
+ * @param {Array<Object>} leads - Validated lead payloads
+ * @returns {Promise<number>} - Number of leads accepted
+ */
+async function insertLeads(leads) {
+  if (!supabase) {
+    throw new Error('Supabase not configured');
+  }
+
+  const { error } = await supabase
+    .from('leads')
+    .upsert(leads.map(toLeadRow), { onConflict: 'client_lead_id', ignoreDuplicates: true });
+
+  if (error) throw error;
+  return leads.length;
+}
+
+/**
+ * POST /api/leads
+ * Store a single lead
+ */
+router.post('/', validateInput('lead'), async (req, res) => {
+  try {
+    const inserted = await insertLeads([req.body]);
+    res.status(201).json({ inserted });
+  } catch (error) {
+    logger.error('Lead ingestion error', { endpoint: '/', error: error.message });
+    res.status(500).json({ error: 'Failed to store lead' });
+  }
+});
+
+/**
+ * POST /api/leads/bulk
+ * Store a batch of leads from the action server's write-behind queue
+ */
+router.post('/bulk', validateInput('leadBatch'), async (req, res) => {
+  try {
+    const inserted = await insertLeads(req.body.leads);
+    logger.info('Stored lead batch', { count: inserted });
+    res.status(201).json({ inserted });
+  } catch (error) {
+    logger.error('Lead ingestion error', { endpoint: '/bulk', error: error.message });
+    res.status(500).json({ error: 'Failed to store leads' });
+  }
+});
+
+module.exports = router;
@@ -17,6 +17,7 @@ const telegramRoutes = require('./routes/telegram');
 const whatsappRoutes = require('./routes/whatsapp');
 const webRoutes = require('./routes/web');
 const analyticsRoutes = require('./routes/analytics');
+const leadRoutes = require('./routes/leads');
 require('dotenv').config();
 
 const app = express();
@@ -51,6 +52,7 @@ app.use('/api/telegram', telegramRoutes);
 app.use('/api/whatsapp', whatsappRoutes);
 app.use('/api/web', webRoutes);
 app.use('/api/analytics', analyticsRoutes);
+app.use('/api/leads', leadRoutes);
 
 // In-memory session store (replace with Redis in production)
 const sessions = new Map();
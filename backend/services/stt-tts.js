@@ -3,6 +3,7 @@
  * Production-ready with comprehensive validation and error handling
  */
 
+const crypto = require('crypto');
 const axios = require('axios');
 const logger = require('../utils/logger');
 
@@ -15,25 +16,48 @@ const MINIMAX_MODEL = process.env.MINIMAX_MODEL || 'speech-02-hd';
 // Configuration constants
 const TTS_TIMEOUT_MS = parseInt(process.env.TTS_TIMEOUT_MS) || 30000;
 const MAX_TEXT_LENGTH = parseInt(process.env.MAX_TEXT_LENGTH) || 5000;
-const DEFAULT_VOICE_SETTINGS = {
-  speed: 1.0,
-  pitch: 0,
-  emotion: 'neutral'
-};
+
+// Action server TTS (POST /audio/tts): replies that render a domain response
+// are voiced from its pre-rendered clips. Enabled by AUDIO_TTS_TOKEN
+const AUDIO_TTS_TOKEN = process.env.AUDIO_TTS_TOKEN || '';
+const ACTION_TTS_URL = process.env.ACTION_TTS_URL ||
+  `${process.env.ACTION_SERVER_URL || 'http://localhost:5055'}/audio/tts`;
 
 // Valid language codes
 const VALID_LANGUAGES = ['en', 'pidgin'];
 
-// Voice ID mapping (constant, not recreated per call)
-const VOICE_ID_MAP = {
-  odia: 'moss_audio_4e6eb029-ab89-11f0-a74c-2a7a0b4baedc', // African male default
-  odiamale: 'moss_audio_4e6eb029-ab89-11f0-a74c-2a7a0b4baedc',
-  marcus: 'moss_audio_a59cd561-ab87-11f0-a74c-2a7a0b4baedc', // American male
-  marcy: 'moss_audio_fdad4786-ab84-11f0-a816-023f15327f7a', // American female
-  joslyn: 'moss_audio_141d8c4c-a6f8-11f0-84c1-0ec6fa858d82', // African female
-  alice: 'moss_audio_4e6eb029-ab89-11f0-a74c-2a7a0b4baedc',
-  default: 'moss_audio_4e6eb029-ab89-11f0-a74c-2a7a0b4baedc'
-};
+// Voice profiles shared with the Rasa actions
+// (generated by `python -m actions.voices --export ../backend/config/voices.json`)
+const voiceRegistry = require('../config/voices.json');
+
+// Voice lookup by lowercase name or alias (constant, not recreated per call)
+const VOICE_PROFILES = Object.entries(voiceRegistry.profiles).reduce((profiles, [name, profile]) => {
+  profiles[name] = profile;
+  for (const alias of profile.aliases || []) {
+    profiles[alias] = profile;
+  }
+  return profiles;
+}, {});
+VOICE_PROFILES.default = voiceRegistry.profiles[voiceRegistry.default];
+
+// The exported request and cache-key templates are built for one model;
+// with another model the request is built here and has no shared cache key
+const USE_TEMPLATES = voiceRegistry.model === MINIMAX_MODEL;
+if (!USE_TEMPLATES) {
+  logger.warn(`voices.json was exported for model ${voiceRegistry.model}, not ${MINIMAX_MODEL}; TTS cache keys are not shared with the actions`);
+}
+
+/**
+ * Fills an exported template ({prefix, suffix} around the JSON-encoded text).
+ * JSON.stringify matches Python's json.dumps(text, ensure_ascii=False), so
+ * the result is byte for byte what the action server renders.
+ * @param {Object} template - Template from voices.json
+ * @param {string} text - Text for the slot
+ * @returns {string} - Rendered JSON
+ */
+function renderTemplate(template, text) {
+  return template.prefix + JSON.stringify(text) + template.suffix;
+}
 
 /**
  * Convert audio to text using MiniMax STT
@@ -123,17 +147,32 @@ function validateLanguage(language) {
 }
 
 /**
- * Gets voice ID from voice name (case-insensitive)
+ * Gets the voice profile for a voice name or alias (case-insensitive)
  * @param {string} voiceName - Voice name
- * @returns {string} - Voice ID
+ * @returns {Object} - Profile with voice_id, speed, vol and pitch
  */
-function getVoiceId(voiceName) {
+function getVoiceProfile(voiceName) {
   if (!voiceName || typeof voiceName !== 'string') {
-    return VOICE_ID_MAP.default;
+    return VOICE_PROFILES.default;
   }
   
   const normalized = voiceName.toLowerCase().trim();
-  return VOICE_ID_MAP[normalized] || VOICE_ID_MAP.default;
+  return VOICE_PROFILES[normalized] || VOICE_PROFILES.default;
+}
+
+/**
+ * TTS cache key of a text in a voice, the same as the action server's
+ * make_cache_key for that profile (null if the templates do not apply)
+ * @param {string} text - Text to synthesize
+ * @param {string} voiceName - Voice name or alias
+ * @returns {string|null} - Hex SHA-256 key
+ */
+function ttsCacheKey(text, voiceName) {
+  const templates = getVoiceProfile(voiceName).templates;
+  if (!USE_TEMPLATES || !templates) {
+    return null;
+  }
+  return crypto.createHash('sha256').update(renderTemplate(templates.cache_key, text), 'utf8').digest('hex');
 }
 
 /**
@@ -242,6 +281,31 @@ function sanitizeError(error) {
   return message;
 }
 
+/**
+ * Voices text on the action server, which joins pre-rendered clips for
+ * domain responses and shares its TTS cache
+ * @param {string} text - Validated text
+ * @param {string} voiceName - Voice name or alias
+ * @returns {Promise<string>} - Data URI
+ * @throws {Error} If the action server cannot voice it
+ */
+async function actionServerTextToSpeech(text, voiceName) {
+  const response = await axios.post(
+    ACTION_TTS_URL,
+    { text, voice: voiceName, cache_key: ttsCacheKey(text, voiceName) },
+    {
+      headers: {
+        'Authorization': `Bearer ${AUDIO_TTS_TOKEN}`,
+        'Content-Type': 'application/json'
+      },
+      responseType: 'arraybuffer',
+      timeout: TTS_TIMEOUT_MS
+    }
+  );
+  logger.debug('TTS from action server', { source: response.headers['x-tts-source'] });
+  return `data:audio/mp3;base64,${Buffer.from(response.data).toString('base64')}`;
+}
+
 /**
  * Convert text to speech using MiniMax TTS (t2a_v2 endpoint)
  * 
@@ -249,9 +313,15 @@ function sanitizeError(error) {
  * @param {string} [language='en'] - Language code ('en' or 'pidgin')
  * @param {string} [voiceName='Odia'] - Voice name (Odia, Marcus, Marcy, Joslyn)
  * @param {Object} [options={}] - Additional options
- * @param {number} [options.speed=1.0] - Speech speed (0.5-2.0)
- * @param {number} [options.pitch=0] - Voice pitch (-20 to 20)
- * @param {string} [options.emotion='neutral'] - Emotion setting
+ * @param {number} [options.speed] - Speech speed (0.5-2.0), defaults to the voice profile
+ * @param {number} [options.vol] - Volume (0-10], defaults to the voice profile
+ * @param {number} [options.pitch] - Voice pitch (-12 to 12), defaults to the voice profile
+ * @param {string} [options.emotion] - Emotion setting, none by default
+ *
+ * Without overrides the text goes to the action server first when
+ * AUDIO_TTS_TOKEN is set, so domain responses are voiced from pre-rendered
+ * clips; otherwise (or if that fails) the request is the profile's exported
+ * template, the same body the action server sends.
  * 
  * @returns {Promise<string>} - Data URI (data:audio/mp3;base64,...) or URL
  * 
@@ -265,23 +335,50 @@ function sanitizeError(error) {
  * // Returns: 'data:audio/mp3;base64,SUQzBAAAAAA...'
  */
 async function textToSpeech(text, language = 'en', voiceName = 'Odia', options = {}) {
+  // Validate and sanitize inputs
+  const validatedText = validateText(text);
+  const validatedLanguage = validateLanguage(language);
+  const voiceProfile = getVoiceProfile(voiceName);
+  const overridden = ['speed', 'vol', 'pitch', 'emotion'].some(field => options[field] !== undefined);
+
+  if (AUDIO_TTS_TOKEN && !overridden) {
+    try {
+      return await actionServerTextToSpeech(validatedText, voiceName);
+    } catch (error) {
+      logger.warn('Action server TTS failed, calling MiniMax directly', {
+        message: sanitizeError(error),
+        status: error.response?.status
+      });
+    }
+  }
+
   // Validate configuration
   if (!MINIMAX_API_KEY || !MINIMAX_GROUP_ID) {
     throw new Error('MiniMax TTS not configured: API_KEY and GROUP_ID required');
   }
   
-  // Validate and sanitize inputs
-  const validatedText = validateText(text);
-  const validatedLanguage = validateLanguage(language);
-  const voiceId = getVoiceId(voiceName);
-  
-  // Build voice settings with options override
-  const voiceSettings = {
-    voice_id: voiceId,
-    speed: options.speed ?? DEFAULT_VOICE_SETTINGS.speed,
-    pitch: options.pitch ?? DEFAULT_VOICE_SETTINGS.pitch,
-    emotion: options.emotion ?? DEFAULT_VOICE_SETTINGS.emotion
-  };
+  let requestBody;
+  if (USE_TEMPLATES && voiceProfile.templates && !overridden) {
+    requestBody = renderTemplate(voiceProfile.templates.request, validatedText);
+    logger.debug('TTS request', { voice: voiceProfile.voice_id, cacheKey: ttsCacheKey(validatedText, voiceName) });
+  } else {
+    // Build voice settings from the shared profile with options override
+    const voiceSettings = {
+      voice_id: voiceProfile.voice_id,
+      speed: options.speed ?? voiceProfile.speed,
+      vol: options.vol ?? voiceProfile.vol,
+      pitch: options.pitch ?? voiceProfile.pitch
+    };
+    if (options.emotion !== undefined) {
+      voiceSettings.emotion = options.emotion;
+    }
+    requestBody = {
+      text: validatedText,
+      model: MINIMAX_MODEL,
+      voice_setting: voiceSettings,
+      audio_setting: voiceRegistry.audio_setting
+    };
+  }
   
   // Construct endpoint
   const ttsEndpoint = `${MINIMAX_API_URL}/t2a_v2?GroupId=${MINIMAX_GROUP_ID}`;
@@ -289,12 +386,7 @@ async function textToSpeech(text, language = 'en', voiceName = 'Odia', options =
   try {
     const response = await axios.post(
       ttsEndpoint,
-      {
-        text: validatedText,
-        model: MINIMAX_MODEL,
-        voice_setting: voiceSettings,
-        language_boost: 'auto'
-      },
+      requestBody,
       {
         headers: {
           'Authorization': `Bearer ${MINIMAX_API_KEY}`,
@@ -384,6 +476,7 @@ async function detectLanguage(input) {
 module.exports = {
   speechToText,
   textToSpeech,
+  ttsCacheKey,
   detectLanguage
 };
 
@@ -38,9 +38,14 @@ CREATE TABLE IF NOT EXISTS leads (
     source_channel TEXT NOT NULL,
     created_at TIMESTAMPTZ DEFAULT NOW(),
     updated_at TIMESTAMPTZ DEFAULT NOW(),
-    metadata JSONB DEFAULT '{}'::jsonb
+    metadata JSONB DEFAULT '{}'::jsonb,
+    -- Journal id from the action server's lead queue; a retried batch upserts on it
+    client_lead_id TEXT UNIQUE
 );
 
+-- Databases created before client_lead_id existed
+ALTER TABLE leads ADD COLUMN IF NOT EXISTS client_lead_id TEXT UNIQUE;
+
 CREATE INDEX IF NOT EXISTS idx_leads_session_id ON leads(session_id);
 CREATE INDEX IF NOT EXISTS idx_leads_status ON leads(status);
 CREATE INDEX IF NOT EXISTS idx_leads_created_at ON leads(created_at);
@@ -3,11 +3,15 @@
 Extract the love TTS audio from the MiniMax response and save as MP3
 """
 
-import json
-import base64
 import os
+import sys
 from datetime import datetime
 
+# Add the Rasa agent directory to the path for the actions package
+sys.path.append('rasa-agent')
+
+from actions.audio_extract import extract_audio
+
 def extract_audio_from_response():
     """Extract audio data from the TTS response file."""
     
@@ -20,104 +24,62 @@ def extract_audio_from_response():
     
     print(f"📂 Reading response from: {response_file}")
     
+    # Look for audio data in various possible locations
+    audio_paths = [('response', 'data', key) for key in ['audio', 'audio_data', 'content', 'file', 'mp3']]
+    audio_paths.append(('response', 'data'))
+    
     try:
-        with open(response_file, 'r') as f:
-            data = json.load(f)
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        output_file = f"love_meditation_african_male_{timestamp}.mp3"
         
-        print("✅ Response file loaded successfully")
-        
-        # Check response structure
-        if 'response' not in data:
-            print("❌ No 'response' key in data")
+        # Stream the audio straight into the MP3 file; hex vs base64 is auto-detected
+        try:
+            print("🔄 Decoding audio data...")
+            with open(response_file, 'rb') as source, open(output_file, 'wb') as sink:
+                result = extract_audio(source, sink, paths=audio_paths)
+        except ValueError as e:
+            print(f"❌ Failed to decode audio: {e}")
+            if os.path.exists(output_file):
+                os.remove(output_file)
             return None
         
-        response = data['response']
+        print(f"✅ Successfully decoded {result['bytes']} bytes of {result['encoding']} audio data")
         
-        # Look for audio data in various possible locations
-        audio_data = None
-        audio_info = {}
+        # Get audio info
+        audio_info = result['extra_info']
+        if audio_info:
+            print(f"📊 Audio info:")
+            print(f"   - Length: {audio_info.get('audio_length', 'unknown')} ms")
+            print(f"   - Size: {audio_info.get('audio_size', 'unknown')} bytes")
+            print(f"   - Format: {audio_info.get('audio_format', 'unknown')}")
+            print(f"   - Sample Rate: {audio_info.get('audio_sample_rate', 'unknown')} Hz")
+            print(f"   - Bitrate: {audio_info.get('bitrate', 'unknown')} bps")
         
-        if 'data' in response:
-            response_data = response['data']
-            
-            # Check for base64 audio data
-            if isinstance(response_data, dict):
-                # Look for audio in various keys
-                for key in ['audio', 'audio_data', 'content', 'file', 'mp3']:
-                    if key in response_data:
-                        audio_data = response_data[key]
-                        print(f"🎵 Found audio data in key: {key}")
-                        break
-                
-                # Get audio info
-                if 'extra_info' in response:
-                    audio_info = response['extra_info']
-                    print(f"📊 Audio info:")
-                    print(f"   - Length: {audio_info.get('audio_length', 'unknown')} ms")
-                    print(f"   - Size: {audio_info.get('audio_size', 'unknown')} bytes")
-                    print(f"   - Format: {audio_info.get('audio_format', 'unknown')}")
-                    print(f"   - Sample Rate: {audio_info.get('audio_sample_rate', 'unknown')} Hz")
-                    print(f"   - Bitrate: {audio_info.get('bitrate', 'unknown')} bps")
-            
-            elif isinstance(response_data, str):
-                # The data might be directly the base64 string
-                audio_data = response_data
-                print("🎵 Found audio data as direct string")
-        
-        if not audio_data:
-            print("❌ No audio data found in response")
-            print("📋 Available keys in response:")
-            print(json.dumps(list(response.keys()), indent=2))
-            if 'data' in response:
-                print("📋 Available keys in response.data:")
-                if isinstance(response['data'], dict):
-                    print(json.dumps(list(response['data'].keys()), indent=2))
-            return None
+        print(f"💾 Audio saved as: {output_file}")
         
-        # Try to decode the base64 audio data
+        # Try to play it
         try:
-            print("🔄 Decoding base64 audio data...")
-            audio_bytes = base64.b64decode(audio_data)
-            print(f"✅ Successfully decoded {len(audio_bytes)} bytes of audio data")
+            import subprocess
+            import platform
             
-            # Save as MP3 file
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            output_file = f"love_meditation_african_male_{timestamp}.mp3"
-            
-            with open(output_file, 'wb') as f:
-                f.write(audio_bytes)
-            
-            print(f"💾 Audio saved as: {output_file}")
-            
-            # Try to play it
-            try:
-                import subprocess
-                import platform
-                
-                system = platform.system()
-                if system == "Darwin":  # macOS
-                    subprocess.run(["open", output_file])
-                    print("🎵 Audio should be playing on macOS!")
-                elif system == "Linux":
-                    subprocess.run(["xdg-open", output_file])
-                    print("🎵 Audio should be playing on Linux!")
-                elif system == "Windows":
-                    os.startfile(output_file)
-                    print("🎵 Audio should be playing on Windows!")
-                else:
-                    print(f"🔗 Please manually play: {output_file}")
-                    
-            except Exception as e:
-                print(f"⚠️  Could not auto-play: {e}")
+            system = platform.system()
+            if system == "Darwin":  # macOS
+                subprocess.run(["open", output_file])
+                print("🎵 Audio should be playing on macOS!")
+            elif system == "Linux":
+                subprocess.run(["xdg-open", output_file])
+                print("🎵 Audio should be playing on Linux!")
+            elif system == "Windows":
+                os.startfile(output_file)
+                print("🎵 Audio should be playing on Windows!")
+            else:
                 print(f"🔗 Please manually play: {output_file}")
-            
-            return output_file
-            
+                
         except Exception as e:
-            print(f"❌ Failed to decode base64 audio: {e}")
-            print("🔍 Audio data preview (first 100 chars):")
-            print(audio_data[:100] if len(audio_data) > 100 else audio_data)
-            return None
+            print(f"⚠️  Could not auto-play: {e}")
+            print(f"🔗 Please manually play: {output_file}")
+        
+        return output_file
             
     except Exception as e:
         print(f"❌ Error reading response file: {e}")
@@ -3,10 +3,17 @@
 Extract the love TTS audio from hex-encoded MiniMax response and save as MP3
 """
 
-import json
+import mmap
 import os
+import sys
 from datetime import datetime
 
+# Add the Rasa agent directory to the path for the actions package
+sys.path.append('rasa-agent')
+
+from actions.audio_extract import extract_audio_file
+from actions.mp3_frames import Mp3FormatError, parse_mp3
+
 def extract_audio_from_response():
     """Extract hex-encoded audio data from the TTS response file."""
     
@@ -20,15 +27,19 @@ def extract_audio_from_response():
     print(f"📂 Reading response from: {response_file}")
     
     try:
-        with open(response_file, 'r') as f:
-            data = json.load(f)
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        output_file = f"love_meditation_african_male_{timestamp}.mp3"
         
-        print("✅ Response file loaded successfully")
+        # Stream the hex audio straight into the MP3 file without loading the JSON
+        try:
+            print("🔄 Streaming hex data to audio bytes...")
+            result = extract_audio_file(response_file, output_file)
+        except ValueError as e:
+            print(f"❌ Failed to convert hex data: {e}")
+            return None
         
-        # Get the response data
-        response = data['response']
-        audio_data = response['data']['audio']
-        audio_info = response['extra_info']
+        print("✅ Response file processed successfully")
+        audio_info = result['extra_info']
         
         print(f"📊 Audio info:")
         print(f"   - Length: {audio_info['audio_length']} ms ({audio_info['audio_length']/1000:.1f} seconds)")
@@ -37,70 +48,55 @@ def extract_audio_from_response():
         print(f"   - Sample Rate: {audio_info['audio_sample_rate']:,} Hz")
         print(f"   - Bitrate: {audio_info['bitrate']:,} bps")
         print(f"   - Channels: {audio_info['audio_channel']}")
+        print(f"✅ Successfully converted {result['bytes']:,} bytes of audio data")
         
-        # Convert hex string to bytes
+        # Verify it's an MP3 file: every frame header, not just the first bytes
         try:
-            print("🔄 Converting hex data to audio bytes...")
-            audio_bytes = bytes.fromhex(audio_data)
-            print(f"✅ Successfully converted {len(audio_bytes):,} bytes of audio data")
-            
-            # Verify it's an MP3 file (should start with ID3 or FF FB)
-            if audio_bytes[:3] == b'ID3':
-                print("✅ Confirmed: Valid MP3 file with ID3 header")
-            elif audio_bytes[:2] == b'\xff\xfb':
-                print("✅ Confirmed: Valid MP3 file with MPEG header")
-            else:
-                print(f"⚠️  Unusual header: {audio_bytes[:10].hex()}")
-            
-            # Save as MP3 file
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            output_file = f"love_meditation_african_male_{timestamp}.mp3"
-            
-            with open(output_file, 'wb') as f:
-                f.write(audio_bytes)
-            
-            print(f"💾 Audio saved as: {output_file}")
+            with open(output_file, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                mp3 = parse_mp3(data)
+            print(f"✅ Confirmed: Valid MP3, {mp3.frames:,} frames, {mp3.duration:.3f} seconds")
+            if round(mp3.duration * 1000) != audio_info['audio_length']:
+                print(f"⚠️  Duration mismatch: frames give {mp3.duration * 1000:.0f} ms, "
+                      f"MiniMax reported {audio_info['audio_length']} ms")
+        except Mp3FormatError as e:
+            print(f"⚠️  Not a valid MP3 file: {e}")
+        
+        print(f"💾 Audio saved as: {output_file}")
+        
+        # Verify file size matches
+        actual_size = os.path.getsize(output_file)
+        expected_size = audio_info['audio_size']
+        
+        if actual_size == expected_size:
+            print(f"✅ File size verification passed: {actual_size:,} bytes")
+        else:
+            print(f"⚠️  Size mismatch: got {actual_size:,}, expected {expected_size:,}")
+        
+        # Try to play it
+        try:
+            import subprocess
+            import platform
             
-            # Verify file size matches
-            actual_size = os.path.getsize(output_file)
-            expected_size = audio_info['audio_size']
+            system = platform.system()
+            print(f"🎵 Attempting to play on {system}...")
             
-            if actual_size == expected_size:
-                print(f"✅ File size verification passed: {actual_size:,} bytes")
+            if system == "Darwin":  # macOS
+                subprocess.run(["open", output_file])
+                print("🎵 Audio should be playing on macOS!")
+            elif system == "Linux":
+                subprocess.run(["xdg-open", output_file])
+                print("🎵 Audio should be playing on Linux!")
+            elif system == "Windows":
+                os.startfile(output_file)
+                print("🎵 Audio should be playing on Windows!")
             else:
-                print(f"⚠️  Size mismatch: got {actual_size:,}, expected {expected_size:,}")
-            
-            # Try to play it
-            try:
-                import subprocess
-                import platform
-                
-                system = platform.system()
-                print(f"🎵 Attempting to play on {system}...")
-                
-                if system == "Darwin":  # macOS
-                    subprocess.run(["open", output_file])
-                    print("🎵 Audio should be playing on macOS!")
-                elif system == "Linux":
-                    subprocess.run(["xdg-open", output_file])
-                    print("🎵 Audio should be playing on Linux!")
-                elif system == "Windows":
-                    os.startfile(output_file)
-                    print("🎵 Audio should be playing on Windows!")
-                else:
-                    print(f"🔗 Please manually play: {output_file}")
-                    
-            except Exception as e:
-                print(f"⚠️  Could not auto-play: {e}")
                 print(f"🔗 Please manually play: {output_file}")
-            
-            return output_file
-            
-        except ValueError as e:
-            print(f"❌ Failed to convert hex data: {e}")
-            print("🔍 Audio data preview (first 200 chars):")
-            print(audio_data[:200])
-            return None
+                
+        except Exception as e:
+            print(f"⚠️  Could not auto-play: {e}")
+            print(f"🔗 Please manually play: {output_file}")
+        
+        return output_file
             
     except Exception as e:
         print(f"❌ Error processing response file: {e}")
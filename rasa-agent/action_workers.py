@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""
+Multi-process action server
+
+`rasa run actions` serves every action from one event loop on one core, so
+a blocking action holds up all the others. This script supervises several
+action server processes on the same port instead:
+
+- Each worker binds the port with SO_REUSEPORT and the kernel spreads new
+  connections across them, so the workers share no accept lock.
+- Workers share the TTS cache and blob store directories, and the counters
+  that must be global (cache sizes, the MiniMax retry budget and rate
+  limit) through a memory-mapped file (actions/shared_state.py).
+- A worker that exits is restarted with backoff; SIGTERM/SIGINT stop all of
+  them.
+
+Workers also relay /audio/* on the action port to their audio server, for
+hosts such as Render that route only one port to a service; set
+AUDIO_PUBLIC_URL to the service's public URL to utter audio by reference,
+and point the backend's ACTION_TTS_URL at <action port>/audio/tts.
+
+Each worker keeps its own lead journal (worker 0 uses LEAD_JOURNAL_PATH,
+worker i adds ".i" before the extension) so replay after a restart never
+sends a lead twice; worker 0 adopts the journals of indexes beyond the
+current worker count. Circuit breakers and the in-memory cache tier stay
+per worker.
+
+Usage:
+    python action_workers.py --port 5055            # ACTION_WORKERS workers
+    python action_workers.py --port 5055 --workers 4
+"""
+
+import argparse
+import logging
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional, Text
+
+logger = logging.getLogger("action_workers")
+
+# 0 = one worker per available CPU
+ACTION_WORKERS = int(os.getenv("ACTION_WORKERS", "0"))
+ACTION_WORKER_RESTART_MAX_SECONDS = float(os.getenv("ACTION_WORKER_RESTART_MAX_SECONDS", "30"))
+ACTION_WORKER_STOP_TIMEOUT_SECONDS = float(os.getenv("ACTION_WORKER_STOP_TIMEOUT_SECONDS", "10"))
+
+# Headers passed through when relaying /audio/* from the action port
+RELAYED_REQUEST_HEADERS = ("Range", "If-Range", "If-None-Match", "If-Modified-Since",
+                           "Authorization", "Content-Type")
+RELAYED_RESPONSE_HEADERS = ("Content-Type", "Content-Range", "Accept-Ranges", "Cache-Control", "ETag",
+                            "Last-Modified", "X-Audio-Start-Seconds", "X-Audio-Duration-Seconds",
+                            "X-TTS-Source", "X-TTS-Cache-Key")
+
+# A worker that lived this long is healthy again and restarts without delay
+STABLE_SECONDS = 30
+POLL_SECONDS = 0.5
+
+
+def available_cpus() -> int:
+    """CPUs this process may use, honouring a cgroup v2 CPU quota (containers)."""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    try:
+        with open("/sys/fs/cgroup/cpu.max", "r") as f:
+            quota, period = f.read().split()
+        if quota != "max":
+            cpus = min(cpus, max(1, int(quota) // int(period)))
+    except (OSError, ValueError):
+        pass
+    return cpus
+
+
+class Worker:
+    """One supervised action server process."""
+
+    def __init__(self, index: int, command: List[Text], env: Dict[Text, Text]):
+        self.index = index
+        self.command = command
+        self.env = env
+        self.process: Optional[subprocess.Popen] = None
+        self.started_at = 0.0
+        self.restart_at = 0.0
+        self.backoff = 0.0
+
+    def start(self) -> None:
+        self.process = subprocess.Popen(self.command, env=self.env)
+        self.started_at = time.monotonic()
+        logger.info("Started worker %d (pid %d)", self.index, self.process.pid)
+
+    def check(self) -> None:
+        """Restart the worker if it has exited and its backoff has passed."""
+        now = time.monotonic()
+        if self.process is not None:
+            code = self.process.poll()
+            if code is None:
+                return
+            lived = now - self.started_at
+            self.backoff = 0.0 if lived > STABLE_SECONDS else min(
+                ACTION_WORKER_RESTART_MAX_SECONDS, max(1.0, self.backoff * 2))
+            self.restart_at = now + self.backoff
+            self.process = None
+            logger.error("Worker %d exited with %s after %.0fs, restarting in %.0fs",
+                         self.index, code, lived, self.backoff)
+        if now >= self.restart_at:
+            self.start()
+
+    def stop(self) -> None:
+        if self.process is not None and self.process.poll() is None:
+            self.process.terminate()
+
+    def wait(self, deadline: float) -> None:
+        if self.process is None:
+            return
+        try:
+            self.process.wait(timeout=max(0.0, deadline - time.monotonic()))
+        except subprocess.TimeoutExpired:
+            logger.warning("Worker %d did not stop in time, killing it", self.index)
+            self.process.kill()
+            self.process.wait()
+
+
+def supervise(args: argparse.Namespace) -> None:
+    if not hasattr(socket, "SO_REUSEPORT"):
+        sys.exit("SO_REUSEPORT is not available on this platform; run `rasa run actions` instead")
+
+    from actions.lead_queue import LEAD_JOURNAL_PATH, worker_journal_path
+
+    count = args.workers or available_cpus()
+    command = [sys.executable, os.path.abspath(__file__), "worker",
+               "--port", str(args.port), "--actions", args.actions]
+
+    workers = []
+    for index in range(count):
+        env = dict(os.environ,
+                   ACTION_WORKER_INDEX=str(index),
+                   ACTION_WORKER_COUNT=str(count),
+                   LEAD_JOURNAL_PATH=worker_journal_path(LEAD_JOURNAL_PATH, index))
+        workers.append(Worker(index, command, env))
+
+    stopping = []
+    signal.signal(signal.SIGTERM, lambda *_: stopping.append(True))
+    signal.signal(signal.SIGINT, lambda *_: stopping.append(True))
+
+    logger.info("Starting %d action server workers on port %d", count, args.port)
+    try:
+        while not stopping:
+            for worker in workers:
+                worker.check()
+            time.sleep(POLL_SECONDS)
+    finally:
+        logger.info("Stopping action server workers")
+        for worker in workers:
+            worker.stop()
+        deadline = time.monotonic() + ACTION_WORKER_STOP_TIMEOUT_SECONDS
+        for worker in workers:
+            worker.wait(deadline)
+
+
+def serve(args: argparse.Namespace) -> None:
+    """Run one action server process on a SO_REUSEPORT socket."""
+    import aiohttp
+    from rasa_sdk.endpoint import create_app
+    from rasa_sdk.plugin import plugin_manager
+    from sanic.response import text
+
+    from actions.audio_server import STREAM_IDLE_TIMEOUT_SECONDS, ensure_started, local_url
+    from actions.http_client import close_session, get_session
+    from actions.lead_queue import get_lead_queue
+    from actions.prerendered import get_prerendered
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.bind((os.getenv("SANIC_HOST", "0.0.0.0"), args.port))
+    sock.listen(args.backlog)
+
+    app = create_app(args.actions, cors_origins="*")
+    plugin_manager().hook.attach_sanic_app_extensions(app=app)
+
+    async def start_audio_server(app, loop) -> None:
+        # Started eagerly so every worker answers on the shared audio port
+        try:
+            await ensure_started()
+        except OSError as e:
+            logger.error("Could not start audio server: %s", str(e))
+
+    async def load_state(app, loop) -> None:
+        # Done here rather than at import so importing the actions touches no files
+        get_prerendered()
+        get_lead_queue().start()
+
+    async def stop_http_session(app, loop) -> None:
+        await close_session()
+
+    async def relay_audio(request, path):
+        session = await get_session()
+        url = local_url(request.path + (f"?{request.query_string}" if request.query_string else ""))
+        try:
+            upstream = await session.request(
+                request.method, url, data=request.body or None,
+                headers={name: request.headers[name] for name in RELAYED_REQUEST_HEADERS
+                         if name in request.headers},
+                timeout=aiohttp.ClientTimeout(total=None, sock_read=STREAM_IDLE_TIMEOUT_SECONDS))
+        except aiohttp.ClientError:
+            return text("Audio server unavailable", status=502)
+        async with upstream:
+            response = await request.respond(
+                status=upstream.status,
+                headers={name: upstream.headers[name] for name in RELAYED_RESPONSE_HEADERS
+                         if name in upstream.headers})
+            async for chunk in upstream.content.iter_any():
+                await response.send(chunk)
+            await response.eof()
+
+    app.add_route(relay_audio, "/audio/<path:path>", methods=["GET", "POST"])
+    app.register_listener(start_audio_server, "after_server_start")
+    app.register_listener(load_state, "after_server_start")
+    app.register_listener(stop_http_session, "before_server_stop")
+    app.run(sock=sock, workers=1, access_log=False, motd=False)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run the action server as several supervised processes")
+    parser.add_argument("command", nargs="?", default="supervise", choices=["supervise", "worker"],
+                        help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "5055")))
+    parser.add_argument("--workers", type=int, default=ACTION_WORKERS, help="0 = one per available CPU")
+    parser.add_argument("--actions", default="actions", help="Package to load actions from")
+    parser.add_argument("--backlog", type=int, default=100)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s - %(message)s")
+    if args.command == "worker":
+        serve(args)
+    else:
+        supervise(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,38 @@
-from typing import Any, Text, Dict, List
+from typing import Any, AsyncIterator, Text, Dict, List
 from rasa_sdk import Action, Tracker
 from rasa_sdk.executor import CollectingDispatcher
-import requests
+import aiohttp
+import asyncio
+import base64
 import os
 import logging
+import time
+
+from . import audio_server
+from .blob_store import get_blob_store
+from .chunked_tts import CHUNKED_TTS_MIN_CHARS, iter_chunked_synthesis, synthesize_chunked
+from .lead_queue import get_lead_queue
+from .metrics import timed_action
+from .minimax import MINIMAX_STREAM, MiniMaxError, stream_synthesize, synthesize
+from .routing import get_routes
+from .tracker_view import TrackerView
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Utter finished audio as a blob store URL rather than an inline data URI;
+# only by default once AUDIO_PUBLIC_URL says where callers can fetch it
+AUDIO_BY_REFERENCE = (os.getenv("AUDIO_BY_REFERENCE")
+                      or str(audio_server.AUDIO_PUBLIC_URL_CONFIGURED)).lower() == "true"
+# Stream URLs point at the audio server too, so streaming also needs a public URL
+AUDIO_STREAMING = MINIMAX_STREAM and audio_server.AUDIO_PUBLIC_URL_CONFIGURED
+if MINIMAX_STREAM and not AUDIO_STREAMING:
+    logger.warning("MINIMAX_STREAM is on but AUDIO_PUBLIC_URL is not set; sending audio inline instead")
+
+# Strong references to background synthesis tasks so they are not garbage collected
+_background_tasks = set()
+
 class ActionLogToBackend(Action):
     """
     Custom action to log lead information to the backend API.
@@ -18,14 +42,17 @@ class ActionLogToBackend(Action):
     def name(self) -> Text:
         return "action_log_to_backend"
 
-    def run(self, dispatcher: CollectingDispatcher,
-            tracker: Tracker,
-            domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
+    @timed_action
+    async def run(self, dispatcher: CollectingDispatcher,
+                  tracker: Tracker,
+                  domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
+        
+        view = TrackerView(tracker)
         
         # Extract slot values
-        name = tracker.get_slot("name")
-        business = tracker.get_slot("business")
-        phone = tracker.get_slot("phone")
+        name = view.slot("name")
+        business = view.slot("business")
+        phone = view.slot("phone")
         
         # Validate required data
         if not all([name, business, phone]):
@@ -39,41 +66,17 @@ class ActionLogToBackend(Action):
             "business": str(business).strip(),
             "phone": str(phone).strip(),
             "source": "rasa_voice_agent",
-            "timestamp": tracker.current_state().get("latest_event_time")
+            "session_id": view.sender_id,
+            # Read directly: current_state() would copy the whole event history
+            "timestamp": view.latest_event_time
         }
         
         try:
-            backend_url = os.getenv("BACKEND_URL")
-            if not backend_url:
-                logger.error("BACKEND_URL environment variable not set")
-                return []
-            
-            # Ensure URL format is correct
-            if not backend_url.startswith(('http://', 'https://')):
-                backend_url = f"https://{backend_url}"
-            
-            # Make API request with timeout and proper headers
-            response = requests.post(
-                f"{backend_url}/api/leads",
-                json=lead_data,
-                timeout=10,
-                headers={
-                    "Content-Type": "application/json",
-                    "User-Agent": "CallWaitingAI-Rasa-Agent/1.0"
-                }
-            )
-            
-            response.raise_for_status()
-            logger.info("Successfully logged lead for %s (%s)", name, business)
-            
-        except requests.exceptions.Timeout:
-            logger.error("Timeout while logging lead to backend")
-        except requests.exceptions.ConnectionError:
-            logger.error("Connection error while logging lead to backend")
-        except requests.exceptions.HTTPError as e:
-            logger.error("HTTP error while logging lead: %s", e.response.status_code)
-        except Exception as e:
-            logger.error("Unexpected error logging lead: %s", str(e))
+            # Journaled locally and sent to the backend in batches
+            await get_lead_queue().enqueue(lead_data)
+            logger.info("Queued lead for %s (%s)", name, business)
+        except OSError as e:
+            logger.error("Could not journal lead: %s", str(e))
         
         return []
 
@@ -87,9 +90,10 @@ class ActionSendToMiniMax(Action):
     def name(self) -> Text:
         return "action_send_to_minimax"
 
-    def run(self, dispatcher: CollectingDispatcher,
-            tracker: Tracker,
-            domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
+    @timed_action
+    async def run(self, dispatcher: CollectingDispatcher,
+                  tracker: Tracker,
+                  domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
         
         # Get the latest message text
         latest_message = tracker.latest_message
@@ -102,102 +106,106 @@ class ActionSendToMiniMax(Action):
             logger.warning("Empty text for MiniMax TTS synthesis")
             return []
         
-        # Check if this is a love-related question and provide a beautiful response
-        if any(word in original_text.lower() for word in ['love', 'meaning of love', 'true love']):
-            text_to_synthesize = """The true meaning of love whispers to us in the quiet moments between heartbeats. 
-
-Love is not just an emotion, but a choice we make each day. It's the gentle touch that says "you matter" without words. It's seeing someone's flaws and choosing to stay, not despite them, but because they make that person beautifully human.
-
-True love is patient. It doesn't rush or demand, but waits with open arms. It's the safety of knowing someone will catch you when you fall, and the courage to let yourself be vulnerable.
-
-Love is found in small gestures - a warm cup of coffee on a cold morning, a listening ear after a difficult day, or simply sitting together in comfortable silence. It's choosing kindness when anger would be easier.
-
-The deepest love starts with loving yourself - accepting your own imperfections and treating yourself with the same compassion you'd show a dear friend. Only then can you truly give love to others.
-
-Love is not possession, but freedom. It's wanting the best for someone, even if that means letting them go. It's celebrating their dreams and supporting their journey, wherever it may lead.
-
-In the end, love is the thread that connects all hearts, the light that guides us home, and the gentle reminder that we are never truly alone in this beautiful, complex world."""
-        else:
-            # For other messages, use the original text
-            text_to_synthesize = original_text
-        
-        # Get MiniMax configuration from environment
-        minimax_url = os.getenv("MINIMAX_API_URL")
-        api_key = os.getenv("MINIMAX_API_KEY")
-        group_id = os.getenv("MINIMAX_GROUP_ID")
-        model = os.getenv("MINIMAX_MODEL", "speech-02-hd")
-        
-        # Validate required configuration
-        if not all([minimax_url, api_key, group_id]):
-            logger.error("Missing MiniMax configuration - URL: %s, API Key: %s, Group ID: %s",
-                        bool(minimax_url), bool(api_key), bool(group_id))
-            return []
-        
-        # Prepare request headers and body
-        headers = {
-            "Authorization": f"Bearer {api_key}",
-            "Content-Type": "application/json",
-            "User-Agent": "CallWaitingAI-Rasa-Agent/1.0"
-        }
+        # Canned responses (e.g. the love monologue) and their voice come from tts_routes.yml
+        route = get_routes().resolve(original_text)
+        text_to_synthesize = route.text
+        voice_settings = route.voice_setting
         
-        # Use soft female voice for love-related content
-        voice_settings = {
-            "voice_id": "female-soft",
-            "speed": 0.9,  # Slightly slower for gentle delivery
-            "vol": 0.8,    # Moderate volume
-            "pitch": 0     # Natural pitch
-        } if 'love' in original_text.lower() else {
-            "voice_id": "female_calm",
-            "speed": 1.0,
-            "vol": 1.0,
-            "pitch": 0
-        }
-        
-        request_body = {
-            "group_id": group_id,
-            "model": model,
-            "text": text_to_synthesize,
-            "voice_setting": voice_settings
-        }
+        # Long texts are synthesized sentence by sentence in parallel
+        chunked = len(text_to_synthesize) >= CHUNKED_TTS_MIN_CHARS
         
         try:
-            # Make API request to MiniMax
-            response = requests.post(
-                minimax_url,
-                headers=headers,
-                json=request_body,
-                timeout=15
-            )
+            if AUDIO_STREAMING:
+                chunks = (iter_chunked_synthesis(text_to_synthesize, voice_settings) if chunked
+                          else stream_synthesize(text_to_synthesize, voice_settings, cache_key=route.cache_key))
+                await self._utter_stream(dispatcher, text_to_synthesize, chunks)
+                return []
             
-            response.raise_for_status()
-            response_data = response.json()
+            custom = {"tts_provider": "minimax"}
+            if chunked:
+                audio = await synthesize_chunked(text_to_synthesize, voice_settings)
+                logger.info("Generated chunked TTS audio for text: %s", text_to_synthesize[:50])
+            else:
+                # Synthesize via MiniMax; repeated prompts are served from the TTS cache
+                result = await synthesize(text_to_synthesize, voice_settings, cache_key=route.cache_key)
+                audio = result.audio
+                custom["cache_hit"] = result.cache_hit
+                logger.info("Generated TTS audio (%s) for text: %s",
+                            "cache hit" if result.cache_hit else "cache miss",
+                            text_to_synthesize[:50])
             
-            # Extract audio URL from response
-            audio_url = response_data.get("audio_url")
-            if audio_url:
-                logger.info("Successfully generated TTS audio for text: %s", text_to_synthesize[:50])
-                
-                # Send audio URL back to dispatcher (for voice channel integration)
-                dispatcher.utter_message(
-                    text="Audio generated successfully",
-                    custom={
-                        "audio_url": audio_url,
-                        "tts_provider": "minimax"
-                    }
-                )
+            # Send audio back to dispatcher (for voice channel integration)
+            if AUDIO_BY_REFERENCE:
+                # A short URL to the blob store instead of the whole clip in the message
+                await audio_server.ensure_started()
+                blob_id = get_blob_store().put(audio, None if chunked else result.cache_key)
+                custom["audio_id"] = blob_id
+                custom["audio_url"] = audio_server.blob_url(blob_id)
             else:
-                logger.warning("No audio URL in MiniMax response")
-                
-        except requests.exceptions.Timeout:
+                audio_b64 = base64.b64encode(audio).decode("ascii")
+                custom["audio_url"] = f"data:audio/mp3;base64,{audio_b64}"
+            dispatcher.utter_message(text="Audio generated successfully", custom=custom)
+            
+        except MiniMaxError as e:
+            logger.error(str(e))
+        except asyncio.TimeoutError:
             logger.error("Timeout while calling MiniMax TTS API")
-        except requests.exceptions.ConnectionError:
+        except aiohttp.ClientConnectionError:
             logger.error("Connection error while calling MiniMax TTS API")
-        except requests.exceptions.HTTPError as e:
-            logger.error("HTTP error from MiniMax TTS API: %s", e.response.status_code)
+        except aiohttp.ClientResponseError as e:
+            logger.error("HTTP error from MiniMax TTS API: %s", e.status)
+        except OSError as e:
+            logger.error("Failed to store TTS audio: %s", str(e))
         except ValueError as e:
-            logger.error("Invalid JSON response from MiniMax TTS API: %s", str(e))
+            logger.error("Invalid response from MiniMax TTS API: %s", str(e))
         except Exception as e:
             logger.error("Unexpected error calling MiniMax TTS API: %s", str(e))
         
         return []
 
+    async def _utter_stream(self, dispatcher: CollectingDispatcher,
+                            text: Text,
+                            chunks: AsyncIterator[bytes]) -> None:
+        """
+        Consume the audio chunks in the background and utter a stream URL
+        as soon as the first one arrives. Later chunks flow through
+        the audio server's bounded buffer while the caller is listening.
+        """
+        await audio_server.ensure_started()
+        stream = audio_server.open_stream()
+        first_chunk = asyncio.get_running_loop().create_future()
+        started = time.perf_counter()
+        
+        async def produce() -> None:
+            try:
+                async for chunk in chunks:
+                    if not first_chunk.done():
+                        first_chunk.set_result(None)
+                    await stream.put(chunk)
+                await stream.close()
+            except Exception as e:
+                if not first_chunk.done():
+                    first_chunk.set_exception(e)
+                else:
+                    logger.error("MiniMax TTS stream failed mid-way: %s", str(e))
+                audio_server.discard_stream(stream.id)
+                await stream.close(e)
+        
+        task = asyncio.create_task(produce())
+        _background_tasks.add(task)
+        task.add_done_callback(_background_tasks.discard)
+        
+        await first_chunk
+        time_to_first_audio_ms = (time.perf_counter() - started) * 1000
+        logger.info("Streaming TTS audio (first chunk in %.0f ms) for text: %s",
+                    time_to_first_audio_ms, text[:50])
+        
+        dispatcher.utter_message(
+            text="Audio generated successfully",
+            custom={
+                "audio_url": audio_server.stream_url(stream.id),
+                "tts_provider": "minimax",
+                "streaming": True,
+                "time_to_first_audio_ms": round(time_to_first_audio_ms)
+            }
+        )
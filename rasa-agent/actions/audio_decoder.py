@@ -0,0 +1,77 @@
+"""
+Incremental decoders for text-encoded audio
+Decode hex or base64 audio piece by piece without holding the whole payload
+"""
+
+import base64
+import binascii
+import re
+from typing import Text, Union
+
+_HEX_ONLY = re.compile(rb"[0-9a-fA-F]*")
+_WHITESPACE = re.compile(rb"\s+")
+
+
+def _as_bytes(chunk: Union[Text, bytes]) -> bytes:
+    return chunk.encode("ascii") if isinstance(chunk, str) else bytes(chunk)
+
+
+class IncrementalHexDecoder:
+    """Decode a hex string that arrives in arbitrary-sized pieces."""
+
+    def __init__(self):
+        self._pending = b""
+
+    def decode(self, chunk: Union[Text, bytes]) -> bytes:
+        data = self._pending + _as_bytes(chunk).strip()
+        usable = len(data) - (len(data) % 2)
+        self._pending = data[usable:]
+        try:
+            return binascii.unhexlify(data[:usable])
+        except binascii.Error as e:
+            raise ValueError(f"Invalid hex audio data: {e}") from e
+
+    def finish(self) -> bytes:
+        if self._pending:
+            raise ValueError("Odd-length hex audio data")
+        return b""
+
+
+class IncrementalBase64Decoder:
+    """Decode a base64 string that arrives in arbitrary-sized pieces."""
+
+    def __init__(self):
+        self._pending = b""
+
+    def decode(self, chunk: Union[Text, bytes]) -> bytes:
+        data = self._pending + _WHITESPACE.sub(b"", _as_bytes(chunk))
+        usable = len(data) - (len(data) % 4)
+        self._pending = data[usable:]
+        try:
+            return base64.b64decode(data[:usable], validate=True)
+        except binascii.Error as e:
+            raise ValueError(f"Invalid base64 audio data: {e}") from e
+
+    def finish(self) -> bytes:
+        if self._pending:
+            raise ValueError("Truncated base64 audio data")
+        return b""
+
+
+def detect_encoding(sample: Union[Text, bytes]) -> Text:
+    """
+    Guess whether a text audio payload is hex or base64 from its first bytes.
+    Base64 MP3 data starts with "SUQz" (ID3) or "//" (frame sync), neither
+    of which is valid hex.
+    """
+    sample = _as_bytes(sample).strip()
+    return "hex" if _HEX_ONLY.fullmatch(sample) else "base64"
+
+
+def make_decoder(encoding: Text):
+    """Return an incremental decoder for 'hex' or 'base64'."""
+    if encoding == "hex":
+        return IncrementalHexDecoder()
+    if encoding == "base64":
+        return IncrementalBase64Decoder()
+    raise ValueError(f"Unsupported audio encoding: {encoding}")
@@ -0,0 +1,285 @@
+"""
+Streaming extractor for audio embedded in MiniMax JSON responses
+
+Scans the JSON incrementally and decodes the audio string (hex or base64)
+in fixed-size chunks straight into a file or writable buffer, so peak
+memory stays constant no matter how long the clip is. Works on raw API
+responses ({"data": {"audio": ...}}) and on the saved generator dumps
+({"response": {"data": {"audio": ...}}}). Other small values can be
+collected on the way by path prefix, e.g. the request a dump was made from.
+"""
+
+import json
+import re
+from typing import Any, BinaryIO, Dict, List, Optional, Sequence, Text, Tuple, Union
+
+from .audio_decoder import detect_encoding, make_decoder
+
+EXTRACT_CHUNK_SIZE = 64 * 1024
+
+AUDIO_PATHS = (("data", "audio"), ("response", "data", "audio"))
+INFO_KEY = "extra_info"
+DATA_URI_PREFIX = re.compile(rb"^data:[\w/.+-]+;base64,")
+
+_WHITESPACE = b" \t\r\n"
+_STRING_STOP = re.compile(rb'["\\]')
+_SCALAR_END = re.compile(rb"[\s,}\]]")
+# Longest scalar kept for extra_info; larger strings are skipped unread
+_MAX_INFO_VALUE = 4096
+# Longest string kept for a collected field (texts can run to a few pages)
+_MAX_FIELD_VALUE = 256 * 1024
+
+Sink = Union[BinaryIO, bytearray, memoryview]
+
+
+class AudioExtractError(ValueError):
+    """
+    Raised when the JSON is malformed or holds no audio at a known path.
+    fields holds the values collected before the error (see extract_audio).
+    """
+
+    def __init__(self, message: Text, fields: Optional[Dict[Tuple[Text, ...], Any]] = None):
+        super().__init__(message)
+        self.fields = fields or {}
+
+
+class _Reader:
+    """Byte reader over a file with a fixed-size refillable window."""
+
+    def __init__(self, source: BinaryIO, chunk_size: int):
+        self.source = source
+        self.chunk_size = chunk_size
+        self.buf = b""
+        self.pos = 0
+
+    def fill(self) -> bool:
+        block = self.source.read(self.chunk_size)
+        if not block:
+            return False
+        self.buf = self.buf[self.pos:] + block
+        self.pos = 0
+        return True
+
+    def peek(self) -> Optional[int]:
+        while self.pos >= len(self.buf):
+            if not self.fill():
+                return None
+        return self.buf[self.pos]
+
+    def skip_whitespace(self) -> Optional[int]:
+        while True:
+            byte = self.peek()
+            if byte is None or byte not in _WHITESPACE:
+                return byte
+            self.pos += 1
+
+    def iter_string(self):
+        """
+        Yield the raw contents of the string at pos (opening quote already
+        consumed) in window-sized pieces, leaving pos after the closing quote.
+        """
+        while True:
+            if self.pos >= len(self.buf) and not self.fill():
+                raise AudioExtractError("Unterminated string in JSON")
+            match = _STRING_STOP.search(self.buf, self.pos)
+            if match is None:
+                piece, self.pos = self.buf[self.pos:], len(self.buf)
+                yield piece
+                continue
+
+            end = match.start()
+            if end > self.pos:
+                yield self.buf[self.pos:end]
+            if self.buf[end] == 0x22:  # closing quote
+                self.pos = end + 1
+                return
+
+            # Backslash escape: make sure the escaped byte is in the window
+            self.pos = end
+            while len(self.buf) - self.pos < 2:
+                if not self.fill():
+                    raise AudioExtractError("Unterminated escape in JSON")
+            escaped = self.buf[self.pos + 1:self.pos + 2]
+            if escaped == b"u":
+                while len(self.buf) - self.pos < 6:
+                    if not self.fill():
+                        raise AudioExtractError("Unterminated escape in JSON")
+                yield json.loads(b'"' + self.buf[self.pos:self.pos + 6] + b'"').encode("utf-8")
+                self.pos += 6
+            else:
+                yield json.loads(b'"' + self.buf[self.pos:self.pos + 2] + b'"').encode("utf-8")
+                self.pos += 2
+
+    def read_string(self, limit: int) -> Optional[bytes]:
+        """Read a whole string; returns None (string skipped) if longer than limit."""
+        parts: List[bytes] = []
+        size = 0
+        for piece in self.iter_string():
+            size += len(piece)
+            if size <= limit:
+                parts.append(piece)
+        return b"".join(parts) if size <= limit else None
+
+    def read_scalar(self) -> bytes:
+        parts = []
+        while True:
+            if self.pos >= len(self.buf) and not self.fill():
+                break
+            match = _SCALAR_END.search(self.buf, self.pos)
+            if match is not None:
+                parts.append(self.buf[self.pos:match.start()])
+                self.pos = match.start()
+                break
+            parts.append(self.buf[self.pos:])
+            self.pos = len(self.buf)
+        return b"".join(parts)
+
+
+class _SinkWriter:
+    def __init__(self, sink: Sink):
+        self.sink = sink
+        self.offset = 0
+        self._write = getattr(sink, "write", None)
+        self._view = None if self._write else memoryview(sink).cast("B")
+
+    def write(self, data: bytes) -> None:
+        if not data:
+            return
+        if self._write is not None:
+            self._write(data)
+        else:
+            end = self.offset + len(data)
+            if end > len(self._view):
+                raise AudioExtractError("Audio does not fit in the provided buffer")
+            self._view[self.offset:end] = data
+        self.offset += len(data)
+
+
+def extract_audio(source: BinaryIO,
+                  sink: Sink,
+                  paths: Sequence[Tuple[Text, ...]] = AUDIO_PATHS,
+                  chunk_size: int = EXTRACT_CHUNK_SIZE,
+                  fields: Sequence[Tuple[Text, ...]] = ()) -> Dict[Text, Any]:
+    """
+    Stream the audio string from a JSON document in source into sink.
+
+    source is a binary file object; sink is a binary file object or a
+    writable buffer (bytearray/memoryview) large enough for the audio.
+    Returns {"bytes": written, "encoding": "hex"|"base64", "extra_info": {...},
+    "fields": {...}}, where fields maps the path of every scalar found under
+    one of the fields prefixes to its value.
+    """
+    targets = {tuple(path) for path in paths}
+    prefixes = [tuple(prefix) for prefix in fields]
+    reader = _Reader(source, chunk_size)
+    writer = _SinkWriter(sink)
+    result: Dict[Text, Any] = {"bytes": 0, "encoding": None, "extra_info": {}, "fields": {}}
+
+    # Each frame: [key of this container in its parent, current key, expecting key]
+    stack: List[list] = []
+
+    def path_for_value() -> Tuple[Text, ...]:
+        return tuple(frame[1] for frame in stack if frame[1] is not None)
+
+    def in_info() -> bool:
+        return len(stack) >= 2 and stack[-1][0] == INFO_KEY
+
+    def collected(path: Tuple[Text, ...]) -> bool:
+        return any(path[:len(prefix)] == prefix for prefix in prefixes)
+
+    while True:
+        byte = reader.skip_whitespace()
+        if byte is None:
+            break
+        reader.pos += 1
+
+        if byte in b",:":
+            if byte == 0x2C and stack and stack[-1][2] is not None:
+                stack[-1][2] = True
+            continue
+
+        if byte in b"{[":
+            parent_key = stack[-1][1] if stack else None
+            stack.append([parent_key, None, True if byte == 0x7B else None])
+            continue
+
+        if byte in b"}]":
+            if not stack:
+                raise AudioExtractError("Unbalanced JSON document")
+            stack.pop()
+            if stack:
+                stack[-1][1] = None
+            continue
+
+        frame = stack[-1] if stack else None
+        if byte == 0x22:
+            if frame is not None and frame[2]:
+                key = reader.read_string(_MAX_INFO_VALUE)
+                frame[1] = key.decode("utf-8") if key is not None else ""
+                frame[2] = False
+                continue
+
+            path = path_for_value()
+            if path in targets and result["encoding"] is None:
+                _decode_string(reader, writer, result)
+            elif in_info():
+                value = reader.read_string(_MAX_INFO_VALUE)
+                if value is not None:
+                    result["extra_info"][frame[1]] = value.decode("utf-8")
+            elif collected(path):
+                value = reader.read_string(_MAX_FIELD_VALUE)
+                if value is not None:
+                    result["fields"][path] = value.decode("utf-8")
+            else:
+                for _ in reader.iter_string():
+                    pass
+        else:
+            reader.pos -= 1
+            token = reader.read_scalar()
+            if not token:
+                raise AudioExtractError(f"Unexpected byte in JSON: {chr(byte)!r}")
+            if in_info():
+                result["extra_info"][frame[1]] = json.loads(token)
+            elif collected(path_for_value()):
+                result["fields"][path_for_value()] = json.loads(token)
+
+        if frame is not None and frame[2] is not None:
+            frame[1] = None
+
+    if result["encoding"] is None:
+        raise AudioExtractError("No audio data found in JSON document", result["fields"])
+    result["bytes"] = writer.offset
+    return result
+
+
+def _decode_string(reader: _Reader, writer: _SinkWriter, result: Dict[Text, Any]) -> None:
+    decoder = None
+    head = b""
+    for piece in reader.iter_string():
+        if decoder is None:
+            # Buffer a few bytes so the encoding (and any data: URI) can be sniffed
+            head += piece
+            if len(head) < 64:
+                continue
+            piece, head = head, b""
+            piece = DATA_URI_PREFIX.sub(b"", piece, count=1)
+            result["encoding"] = detect_encoding(piece[:64])
+            decoder = make_decoder(result["encoding"])
+        writer.write(decoder.decode(piece))
+
+    if decoder is None:
+        head = DATA_URI_PREFIX.sub(b"", head, count=1)
+        if not head:
+            raise AudioExtractError("Audio field is empty")
+        result["encoding"] = detect_encoding(head)
+        decoder = make_decoder(result["encoding"])
+        writer.write(decoder.decode(head))
+    decoder.finish()
+
+
+def extract_audio_file(json_path: Text,
+                       output_path: Text,
+                       chunk_size: int = EXTRACT_CHUNK_SIZE) -> Dict[Text, Any]:
+    """Extract the audio from a JSON response file into an audio file."""
+    with open(json_path, "rb") as source, open(output_path, "wb") as sink:
+        return extract_audio(source, sink, chunk_size=chunk_size)
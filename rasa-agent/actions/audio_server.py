@@ -0,0 +1,327 @@
+"""
+Side HTTP server for audio produced by the action server
+Runs on its own port inside the action server's event loop and serves
+audio streams that are still being synthesized, finished audio from the
+blob store (with HTTP range support and seeking by time), plus the
+Prometheus /metrics endpoint. With AUDIO_TTS_TOKEN set it also voices the
+backend's bot replies (POST /audio/tts), from pre-rendered clips where the
+reply renders a domain response.
+
+Under action_workers.py every worker listens on the shared port and on a
+private loopback port. A stream lives in the worker that produces it, so
+its id names that worker and the others relay requests for it; /metrics
+gathers every worker's series.
+"""
+
+import asyncio
+import functools
+import hmac
+import logging
+import mmap
+import os
+import uuid
+from typing import Dict, Optional, Text, Tuple
+
+import aiohttp
+from aiohttp import web
+
+from .blob_store import AUDIO_BLOB_TTL_SECONDS, get_blob_store
+from .http_client import get_session
+from .metrics import merge_expositions, metrics_response, render_metrics
+from .minimax import MiniMaxError, synthesize
+from .mp3_frames import Mp3FormatError, Mp3Info, parse_mp3
+from .presynth import synthesize_reply
+from .shared_state import ACTION_WORKER_COUNT, worker_index
+from .voices import BACKEND_DEFAULT_VOICE, VOICES
+
+logger = logging.getLogger(__name__)
+
+AUDIO_SERVER_HOST = os.getenv("AUDIO_SERVER_HOST", "0.0.0.0")
+AUDIO_SERVER_PORT = int(os.getenv("AUDIO_SERVER_PORT", "5056"))
+# Base URL callers reach this server at. Until it is set, actions send audio
+# inline: the localhost default is only reachable from the same machine
+AUDIO_PUBLIC_URL_CONFIGURED = bool(os.getenv("AUDIO_PUBLIC_URL"))
+AUDIO_PUBLIC_URL = (os.getenv("AUDIO_PUBLIC_URL") or f"http://localhost:{AUDIO_SERVER_PORT}").rstrip("/")
+
+STREAM_BUFFER_CHUNKS = int(os.getenv("STREAM_BUFFER_CHUNKS", "64"))
+STREAM_IDLE_TIMEOUT_SECONDS = float(os.getenv("STREAM_IDLE_TIMEOUT_SECONDS", "30"))
+# Worker i of action_workers.py also listens on 127.0.0.1:<base + i>
+AUDIO_WORKER_PORT_BASE = int(os.getenv("AUDIO_WORKER_PORT_BASE", "5160"))
+# Bearer token the backend sends to POST /audio/tts; unset disables the endpoint
+AUDIO_TTS_TOKEN = os.getenv("AUDIO_TTS_TOKEN", "")
+
+_END_OF_STREAM = None
+
+
+class AudioStream:
+    """
+    Bounded single-consumer buffer between a synthesis task and a listener.
+    The producer blocks once the buffer is full, so a slow or absent
+    listener applies backpressure instead of growing memory.
+    """
+
+    def __init__(self, max_chunks: int = STREAM_BUFFER_CHUNKS):
+        self.id = uuid.uuid4().hex
+        if worker_index() is not None:
+            self.id = f"{worker_index()}-{self.id}"
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_chunks)
+        self.error: Optional[BaseException] = None
+
+    async def put(self, chunk: bytes) -> None:
+        await asyncio.wait_for(self._queue.put(chunk), STREAM_IDLE_TIMEOUT_SECONDS)
+
+    async def close(self, error: Optional[BaseException] = None) -> None:
+        self.error = error
+        try:
+            await asyncio.wait_for(self._queue.put(_END_OF_STREAM), STREAM_IDLE_TIMEOUT_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+
+    async def get(self) -> Optional[bytes]:
+        """Return the next chunk, or None once the stream has ended."""
+        return await asyncio.wait_for(self._queue.get(), STREAM_IDLE_TIMEOUT_SECONDS)
+
+
+_streams: Dict[Text, AudioStream] = {}
+_runner: Optional[web.AppRunner] = None
+_runner_lock: Optional[asyncio.Lock] = None
+
+
+def open_stream() -> AudioStream:
+    """Register a new audio stream and return it."""
+    stream = AudioStream()
+    _streams[stream.id] = stream
+    return stream
+
+
+def discard_stream(stream_id: Text) -> None:
+    _streams.pop(stream_id, None)
+
+
+def stream_url(stream_id: Text) -> Text:
+    return f"{AUDIO_PUBLIC_URL}/audio/stream/{stream_id}"
+
+
+def blob_url(blob_id: Text) -> Text:
+    return f"{AUDIO_PUBLIC_URL}/audio/blob/{blob_id}"
+
+
+def _worker_url(index: int, path: Text) -> Text:
+    return f"http://127.0.0.1:{AUDIO_WORKER_PORT_BASE + index}{path}"
+
+
+def local_url(path: Text) -> Text:
+    """URL of path on this process's audio server, for relaying from another listener."""
+    if worker_index() is not None:
+        return _worker_url(worker_index(), path)
+    return f"http://127.0.0.1:{AUDIO_SERVER_PORT}{path}"
+
+
+def _stream_owner(stream_id: Text) -> Optional[int]:
+    """Worker that produces a stream, if it is another one."""
+    owner, _, rest = stream_id.partition("-")
+    if worker_index() is None or not rest or not owner.isdigit() or int(owner) == worker_index():
+        return None
+    return int(owner)
+
+
+async def _relay_stream(request: web.Request, owner: int) -> web.StreamResponse:
+    """Pass a stream produced by another worker through to the listener."""
+    session = await get_session()
+    timeout = aiohttp.ClientTimeout(total=None, sock_read=STREAM_IDLE_TIMEOUT_SECONDS)
+    try:
+        upstream = await session.get(_worker_url(owner, request.path), timeout=timeout)
+    except aiohttp.ClientError:
+        raise web.HTTPNotFound()  # The worker is gone, and its streams with it
+
+    async with upstream:
+        if upstream.status != 200:
+            raise web.HTTPNotFound()
+        response = web.StreamResponse(headers={"Content-Type": "audio/mpeg"})
+        response.enable_chunked_encoding()
+        await response.prepare(request)
+        try:
+            async for chunk in upstream.content.iter_any():
+                await response.write(chunk)
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            logger.warning("Relay of audio stream %s from worker %d broke off",
+                           request.match_info["stream_id"], owner)
+    await response.write_eof()
+    return response
+
+
+async def handle_stream(request: web.Request) -> web.StreamResponse:
+    """GET /audio/stream/{id} - relay chunks to the listener as they arrive."""
+    stream_id = request.match_info["stream_id"]
+    stream = _streams.pop(stream_id, None)
+    if stream is None:
+        owner = _stream_owner(stream_id)
+        if owner is not None:
+            return await _relay_stream(request, owner)
+        raise web.HTTPNotFound()
+
+    response = web.StreamResponse(headers={"Content-Type": "audio/mpeg"})
+    response.enable_chunked_encoding()
+    await response.prepare(request)
+
+    try:
+        while True:
+            chunk = await stream.get()
+            if chunk is _END_OF_STREAM:
+                break
+            await response.write(chunk)
+    except asyncio.TimeoutError:
+        logger.warning("Audio stream %s stalled, closing", stream.id)
+
+    await response.write_eof()
+    return response
+
+
+@functools.lru_cache(maxsize=64)
+def _frame_index(path: Text, mtime_ns: int, size: int) -> Mp3Info:
+    # Keyed on mtime and size too: a blob id is a TTS cache key, and the key can
+    # be re-synthesized with different bytes once the old blob has expired
+    if size == 0:
+        raise Mp3FormatError("Blob is empty")
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        return parse_mp3(data)
+
+
+def _read_from(path: Text, seconds: float) -> Tuple[bytes, float, float]:
+    stat = os.stat(path)
+    info = _frame_index(path, stat.st_mtime_ns, stat.st_size)
+    offset, start = info.seek(seconds)
+    with open(path, "rb") as f:
+        f.seek(offset)
+        return f.read(info.audio_end - offset), start, info.duration
+
+
+async def handle_blob(request: web.Request) -> web.StreamResponse:
+    """
+    GET /audio/blob/{id} - serve stored audio. FileResponse answers Range
+    and If-Range requests with 206 partial content and sends the file with
+    sendfile where the platform supports it.
+
+    ?t=<seconds> serves the audio from the MP3 frame playing at that time
+    instead, found through the blob's frame index; X-Audio-Start-Seconds
+    gives the frame's exact start.
+    """
+    path = get_blob_store().path(request.match_info["blob_id"])
+    if path is None:
+        raise web.HTTPNotFound()
+    # Blobs are content-addressed, so their bytes never change
+    headers = {
+        "Content-Type": "audio/mpeg",
+        "Cache-Control": f"public, max-age={AUDIO_BLOB_TTL_SECONDS}, immutable",
+    }
+    if "t" not in request.query:
+        return web.FileResponse(path, headers=headers)
+
+    try:
+        seconds = float(request.query["t"])
+    except ValueError:
+        raise web.HTTPBadRequest(text="t must be a number of seconds")
+    try:
+        body, start, duration = await asyncio.get_running_loop().run_in_executor(
+            None, _read_from, path, seconds)
+    except FileNotFoundError:
+        raise web.HTTPNotFound()  # Evicted since path() looked it up
+    except Mp3FormatError as e:
+        logger.warning("Cannot seek in blob %s: %s", path, str(e))
+        raise web.HTTPRequestRangeNotSatisfiable(text="Audio cannot be seeked")
+    headers["X-Audio-Start-Seconds"] = f"{start:.3f}"
+    headers["X-Audio-Duration-Seconds"] = f"{duration:.3f}"
+    return web.Response(body=body, headers=headers)
+
+
+async def handle_metrics(request: web.Request) -> web.Response:
+    """
+    GET /metrics - this process's series; under action_workers.py also every
+    other worker's (?scope=worker limits it to the worker answering).
+    """
+    local = render_metrics()
+    if worker_index() is None or request.query.get("scope") == "worker":
+        return metrics_response(local)
+
+    session = await get_session()
+
+    async def fetch(index: int) -> Text:
+        try:
+            async with session.get(_worker_url(index, "/metrics?scope=worker"),
+                                   timeout=aiohttp.ClientTimeout(total=5)) as response:
+                return await response.text() if response.status == 200 else ""
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            return ""  # Restarting worker; its series come back on the next scrape
+
+    peers = [index for index in range(ACTION_WORKER_COUNT) if index != worker_index()]
+    texts = await asyncio.gather(*(fetch(index) for index in peers))
+    return metrics_response(merge_expositions([local, *texts]))
+
+
+async def handle_tts(request: web.Request) -> web.Response:
+    """
+    POST /audio/tts {"text", "voice", "cache_key"?} - voice a bot reply for
+    the backend. A reply rendered from a pre-rendered domain response is
+    joined from its clips, synthesizing only the slot values; anything else
+    is synthesized (and cached) whole. X-TTS-Source says which happened.
+    cache_key is the backend's key for the text and is only compared with
+    ours, so a stale voices.json shows up in the logs.
+    """
+    if not hmac.compare_digest(request.headers.get("Authorization", ""), f"Bearer {AUDIO_TTS_TOKEN}"):
+        raise web.HTTPUnauthorized()
+    try:
+        body = await request.json()
+        text = body["text"].strip()
+    except (ValueError, KeyError, TypeError, AttributeError):
+        raise web.HTTPBadRequest(text="Expected a JSON object with a text string")
+    if not text:
+        raise web.HTTPBadRequest(text="text is empty")
+    profile = VOICES.get(body.get("voice"), VOICES[BACKEND_DEFAULT_VOICE])
+
+    headers = {"Content-Type": "audio/mpeg", "X-TTS-Source": "prerendered"}
+    try:
+        audio = await synthesize_reply(text, profile.name)
+        if audio is None:
+            result = await synthesize(text, profile.voice_setting)
+            audio = result.audio
+            headers.update({"X-TTS-Source": "synthesized", "X-TTS-Cache-Key": result.cache_key})
+            if body.get("cache_key") and body["cache_key"] != result.cache_key:
+                logger.warning("Backend TTS cache key differs for voice %s; re-export voices.json", profile.name)
+    except (MiniMaxError, asyncio.TimeoutError, aiohttp.ClientError) as e:
+        logger.warning("TTS for the backend failed: %s", str(e))
+        raise web.HTTPBadGateway(text="TTS failed")
+    return web.Response(body=bytes(audio), headers=headers)
+
+
+def create_app() -> web.Application:
+    app = web.Application()
+    app.router.add_get("/audio/stream/{stream_id}", handle_stream)
+    app.router.add_get("/audio/blob/{blob_id}", handle_blob)
+    app.router.add_get("/metrics", handle_metrics)
+    if AUDIO_TTS_TOKEN:
+        app.router.add_post("/audio/tts", handle_tts)
+    return app
+
+
+async def ensure_started() -> None:
+    """Start the audio server on the running loop if it is not already up."""
+    global _runner, _runner_lock
+
+    if _runner is not None:
+        return
+    if _runner_lock is None:
+        _runner_lock = asyncio.Lock()
+
+    async with _runner_lock:
+        if _runner is not None:
+            return
+        runner = web.AppRunner(create_app(), access_log=None)
+        await runner.setup()
+        # Workers share the public port; the kernel spreads connections across them
+        site = web.TCPSite(runner, AUDIO_SERVER_HOST, AUDIO_SERVER_PORT, reuse_address=True,
+                           reuse_port=worker_index() is not None)
+        await site.start()
+        if worker_index() is not None:
+            await web.TCPSite(runner, "127.0.0.1", AUDIO_WORKER_PORT_BASE + worker_index()).start()
+        _runner = runner
+        logger.info("Audio server listening on %s:%d", AUDIO_SERVER_HOST, AUDIO_SERVER_PORT)
@@ -0,0 +1,272 @@
+"""
+Batch TTS generation
+
+Renders a JSONL or CSV file of prompts to MP3 files with an async worker
+pool, a request rate limit and retry with exponential backoff. Requests
+also go through the account-wide MiniMax scheduler in the batch class, so
+they yield to live calls on the action server. They get a long timeout
+(--timeout) and are never hedged, so a long row is neither cut off nor
+billed twice. Finished
+rows are recorded in a checkpoint file so an interrupted run resumes where
+it stopped.
+
+Each row needs "id" and "text"; "voice" is a profile name or alias from
+the voice registry or a raw MiniMax voice_id, and "settings" (a JSON object,
+or speed/vol/pitch CSV columns) overrides the voice parameters. A row with
+overrides that are not numbers of the right kind is recorded as failed.
+
+Audio is cached in a directory of the batch's own (<output>/.tts_cache by
+default), not the live TTS cache, so a large batch cannot evict the clips
+the action server is serving.
+
+Usage:
+    python -m actions.batch_tts prompts.jsonl --output audio/ --workers 8 --rate 5
+"""
+
+import argparse
+import asyncio
+import csv
+import json
+import logging
+import math
+import os
+import random
+import re
+from typing import Any, Dict, Iterator, Set, Text
+
+import aiohttp
+
+from .http_client import close_session
+from .minimax import RATE_LIMIT_CODES, MiniMaxError, MiniMaxUnavailableError, load_config, synthesize
+from .rate_limit import RateLimiter
+from .scheduler import PRIORITY_BATCH
+from .tts_cache import TTSCache
+from .voices import DEFAULT_VOICE, VOICE_SETTINGS, VOICES
+
+logger = logging.getLogger(__name__)
+
+BATCH_WORKERS = int(os.getenv("BATCH_TTS_WORKERS", "4"))
+BATCH_RATE_PER_SECOND = float(os.getenv("BATCH_TTS_RATE", "2"))
+BATCH_MAX_RETRIES = int(os.getenv("BATCH_TTS_MAX_RETRIES", "5"))
+BATCH_BACKOFF_SECONDS = float(os.getenv("BATCH_TTS_BACKOFF_SECONDS", "1"))
+BATCH_BACKOFF_MAX_SECONDS = float(os.getenv("BATCH_TTS_BACKOFF_MAX_SECONDS", "60"))
+# Per request; long rows take far longer than the live MINIMAX_TIMEOUT_SECONDS
+BATCH_TIMEOUT_SECONDS = float(os.getenv("BATCH_TTS_TIMEOUT_SECONDS", "120"))
+# Empty means a .tts_cache directory inside the output directory
+BATCH_CACHE_DIR = os.getenv("BATCH_TTS_CACHE_DIR", "")
+
+CHECKPOINT_FILE = "checkpoint.jsonl"
+VOICE_PARAMETERS = ("speed", "vol", "pitch")
+
+RETRYABLE_MINIMAX_CODES = RATE_LIMIT_CODES
+
+_SAFE_ID = re.compile(r"[^\w.-]+")
+
+
+def read_rows(path: Text) -> Iterator[Dict[Text, Any]]:
+    """Yield prompt rows from a .jsonl or .csv file."""
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        if path.endswith(".csv"):
+            for row in csv.DictReader(f):
+                yield row
+        else:
+            for line_number, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except ValueError as e:
+                    logger.error("Skipping invalid JSON on line %d: %s", line_number, str(e))
+
+
+def _voice_parameter(parameter: Text, value: Any, kind: type) -> Any:
+    """Convert an override to the type of the voice's own value, or raise ValueError."""
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{parameter} must be a number, got {value!r}") from None
+    if not math.isfinite(number):
+        raise ValueError(f"{parameter} must be finite, got {value!r}")
+    if kind is int:
+        if not number.is_integer():
+            raise ValueError(f"{parameter} must be a whole number, got {value!r}")
+        return int(number)
+    return number
+
+
+def build_voice_setting(row: Dict[Text, Any]) -> Dict[Text, Any]:
+    """
+    Resolve a row's voice and setting overrides into a MiniMax voice_setting.
+    Raises ValueError for malformed settings or overrides.
+    """
+    voice = row.get("voice") or DEFAULT_VOICE
+    if voice in VOICES:
+        voice_setting = dict(VOICE_SETTINGS[VOICES[voice].name])
+    else:
+        voice_setting = {"voice_id": voice, "speed": 1.0, "vol": 1.0, "pitch": 0}
+
+    settings = row.get("settings") or {}
+    if isinstance(settings, str):
+        settings = json.loads(settings)
+    if not isinstance(settings, dict):
+        raise ValueError(f"settings must be a JSON object, got {settings!r}")
+    for parameter in VOICE_PARAMETERS:
+        value = settings.get(parameter, row.get(parameter))
+        if value not in (None, ""):
+            voice_setting[parameter] = _voice_parameter(parameter, value, type(voice_setting[parameter]))
+    return voice_setting
+
+
+def load_checkpoint(path: Text) -> Set[Text]:
+    """Return the ids already rendered according to the checkpoint file."""
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue  # Torn final line from an interrupted run
+            if entry.get("status") == "done":
+                done.add(entry["id"])
+    return done
+
+
+def is_retryable(error: Exception) -> bool:
+    if isinstance(error, (asyncio.TimeoutError, aiohttp.ClientConnectionError)):
+        return True
+    if isinstance(error, aiohttp.ClientResponseError):
+        return error.status == 429 or error.status >= 500
+    if isinstance(error, MiniMaxUnavailableError):
+        return True  # Circuits close again after CIRCUIT_OPEN_SECONDS
+    if isinstance(error, MiniMaxError):
+        return error.status_code in RETRYABLE_MINIMAX_CODES
+    return False
+
+
+async def run_batch(input_path: Text,
+                    output_dir: Text,
+                    workers: int = BATCH_WORKERS,
+                    rate_per_second: float = BATCH_RATE_PER_SECOND,
+                    max_retries: int = BATCH_MAX_RETRIES,
+                    cache_dir: Text = BATCH_CACHE_DIR,
+                    timeout: float = BATCH_TIMEOUT_SECONDS) -> Dict[Text, int]:
+    """Render every row of input_path into output_dir/<id>.mp3."""
+    config = load_config()
+    os.makedirs(output_dir, exist_ok=True)
+    cache = TTSCache(cache_dir=cache_dir or os.path.join(output_dir, ".tts_cache"), memory_bytes=0)
+    checkpoint_path = os.path.join(output_dir, CHECKPOINT_FILE)
+    done = load_checkpoint(checkpoint_path)
+    limiter = RateLimiter(rate_per_second)
+    stats = {"rendered": 0, "skipped": 0, "failed": 0}
+
+    queue: asyncio.Queue = asyncio.Queue(maxsize=workers * 2)
+    checkpoint = open(checkpoint_path, "a", encoding="utf-8")
+
+    def record(row_id: Text, status: Text, **details: Any) -> None:
+        checkpoint.write(json.dumps({"id": row_id, "status": status, **details}) + "\n")
+        checkpoint.flush()
+
+    async def render(row: Dict[Text, Any]) -> None:
+        row_id = str(row["id"])
+        try:
+            voice_setting = build_voice_setting(row)
+        except ValueError as e:
+            stats["failed"] += 1
+            record(row_id, "failed", error=str(e))
+            logger.error("Invalid voice settings for %s: %s", row_id, str(e))
+            return
+        filename = _SAFE_ID.sub("_", row_id) + ".mp3"
+        path = os.path.join(output_dir, filename)
+
+        for attempt in range(max_retries + 1):
+            await limiter.acquire()
+            try:
+                result = await synthesize(row["text"], voice_setting, config, priority=PRIORITY_BATCH,
+                                          cache=cache, timeout=timeout)
+                break
+            except Exception as e:
+                if attempt >= max_retries or not is_retryable(e):
+                    stats["failed"] += 1
+                    record(row_id, "failed", error=str(e))
+                    logger.error("Failed to render %s: %s", row_id, str(e))
+                    return
+                delay = min(BATCH_BACKOFF_MAX_SECONDS, BATCH_BACKOFF_SECONDS * 2 ** attempt)
+                delay *= random.uniform(0.5, 1.0)
+                logger.warning("Retrying %s in %.1fs (attempt %d): %s", row_id, delay, attempt + 1, str(e))
+                await asyncio.sleep(delay)
+
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(result.audio)
+        os.replace(tmp_path, path)
+
+        stats["rendered"] += 1
+        record(row_id, "done", file=filename, bytes=len(result.audio), cache_key=result.cache_key)
+
+    async def worker() -> None:
+        while True:
+            row = await queue.get()
+            try:
+                if row is None:
+                    return
+                await render(row)
+            except Exception as e:
+                stats["failed"] += 1
+                logger.error("Failed to render row %s: %s", row.get("id"), str(e))
+            finally:
+                queue.task_done()
+
+    tasks = [asyncio.create_task(worker()) for _ in range(max(1, workers))]
+    try:
+        for row in read_rows(input_path):
+            if not row.get("id") or not row.get("text"):
+                logger.warning("Skipping row without id/text: %s", row)
+                continue
+            if str(row["id"]) in done:
+                stats["skipped"] += 1
+                continue
+            await queue.put(row)
+        for _ in tasks:
+            await queue.put(None)
+        await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
+        checkpoint.close()
+
+    logger.info("Batch complete: %d rendered, %d skipped (checkpoint), %d failed",
+                stats["rendered"], stats["skipped"], stats["failed"])
+    return stats
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Render a JSONL/CSV file of prompts to MP3 with MiniMax TTS")
+    parser.add_argument("input", help="Prompt file (.jsonl or .csv) with id, text, voice, settings")
+    parser.add_argument("--output", default="tts_output", help="Directory for MP3 files and the checkpoint")
+    parser.add_argument("--workers", type=int, default=BATCH_WORKERS, help="Concurrent workers")
+    parser.add_argument("--rate", type=float, default=BATCH_RATE_PER_SECOND,
+                        help="Maximum requests started per second (0 for no limit)")
+    parser.add_argument("--retries", type=int, default=BATCH_MAX_RETRIES, help="Retries per prompt")
+    parser.add_argument("--cache-dir", default=BATCH_CACHE_DIR,
+                        help="Audio cache for this batch (default: <output>/.tts_cache)")
+    parser.add_argument("--timeout", type=float, default=BATCH_TIMEOUT_SECONDS,
+                        help="Seconds to wait for each request")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    async def run() -> None:
+        try:
+            await run_batch(args.input, args.output, args.workers, args.rate, args.retries, args.cache_dir,
+                            args.timeout)
+        finally:
+            await close_session()
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
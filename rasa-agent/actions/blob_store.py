@@ -0,0 +1,129 @@
+"""
+Local store for synthesized audio served by reference
+Actions write the decoded MP3 bytes here once and utter a short URL to the
+audio server instead of a base64 data URI; channels fetch (or range-request)
+the file from there. Blobs expire after a TTL and the oldest are evicted once
+the store grows past its size limit.
+"""
+
+import hashlib
+import logging
+import os
+import re
+import time
+from typing import Optional, Text, Union
+
+from .shared_state import SharedCounters, get_shared_state
+
+logger = logging.getLogger(__name__)
+
+AUDIO_BLOB_DIR = os.getenv("AUDIO_BLOB_DIR", ".audio_blobs")
+AUDIO_BLOB_MAX_MB = int(os.getenv("AUDIO_BLOB_MAX_MB", "256"))
+AUDIO_BLOB_TTL_SECONDS = int(os.getenv("AUDIO_BLOB_TTL_SECONDS", "3600"))
+
+BLOB_SUFFIX = ".mp3"
+STORE_BYTES = "blob_store.bytes"
+_BLOB_ID = re.compile(r"^[0-9a-f]{16,64}$")
+
+
+class BlobStore:
+    """
+    Content-addressed audio files in one directory. Writing a blob that is
+    already stored only refreshes its modification time, so repeated
+    cache hits cost a stat and a utime rather than a rewrite. Action server
+    workers share the directory and, for the process-wide store, its size.
+    """
+
+    def __init__(self,
+                 directory: Text = AUDIO_BLOB_DIR,
+                 max_bytes: int = AUDIO_BLOB_MAX_MB * 1024 * 1024,
+                 ttl_seconds: int = AUDIO_BLOB_TTL_SECONDS,
+                 counters: Optional[SharedCounters] = None):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._counters = counters or SharedCounters()
+        os.makedirs(directory, exist_ok=True)
+        self._counters.set(STORE_BYTES, sum(size for _, _, size in self._scan()))
+
+    def path(self, blob_id: Text) -> Optional[Text]:
+        """Filesystem path of a live blob, or None if the id is unknown or expired."""
+        if not _BLOB_ID.match(blob_id):
+            return None
+        path = os.path.join(self.directory, blob_id + BLOB_SUFFIX)
+        try:
+            stored_at = os.path.getmtime(path)
+        except OSError:
+            return None
+        if self.ttl_seconds > 0 and time.time() - stored_at > self.ttl_seconds:
+            return None
+        return path
+
+    def put(self, audio: Union[bytes, memoryview], blob_id: Optional[Text] = None) -> Text:
+        """
+        Store audio and return its id. blob_id may be a TTS cache key, which
+        already identifies the audio; otherwise the content is hashed.
+        """
+        blob_id = blob_id or hashlib.sha256(audio).hexdigest()
+        if not _BLOB_ID.match(blob_id):
+            raise ValueError(f"Invalid blob id: {blob_id}")
+
+        path = os.path.join(self.directory, blob_id + BLOB_SUFFIX)
+        try:
+            os.utime(path)
+            return blob_id
+        except FileNotFoundError:
+            pass
+
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(audio)
+        os.replace(tmp_path, path)
+
+        if self._counters.add(STORE_BYTES, len(audio)) > self.max_bytes:
+            self._evict()
+        return blob_id
+
+    def _scan(self):
+        """Yield (path, mtime, size) for every blob."""
+        for entry in os.scandir(self.directory):
+            if not entry.name.endswith(BLOB_SUFFIX):
+                continue
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            yield entry.path, stat.st_mtime, stat.st_size
+
+    def _evict(self) -> None:
+        """Remove expired blobs, then the oldest ones until under the size limit."""
+        entries = sorted(self._scan(), key=lambda entry: entry[1])
+        used = sum(size for _, _, size in entries)
+        now = time.time()
+        evicted = 0
+
+        for path, mtime, size in entries:
+            expired = self.ttl_seconds > 0 and now - mtime > self.ttl_seconds
+            if used <= self.max_bytes and not expired:
+                continue
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            used -= size
+            evicted += 1
+
+        self._counters.set(STORE_BYTES, used)
+        if evicted:
+            logger.info("Evicted %d audio blobs (store usage: %d bytes)", evicted, used)
+
+
+_store: Optional[BlobStore] = None
+
+
+def get_blob_store() -> BlobStore:
+    """Return the process-wide blob store."""
+    global _store
+    if _store is None:
+        _store = BlobStore(counters=get_shared_state())
+    return _store
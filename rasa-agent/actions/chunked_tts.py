@@ -0,0 +1,107 @@
+"""
+Sentence-level chunked TTS pipeline
+Splits long texts at paragraph and sentence boundaries, synthesizes the pieces
+in parallel and yields the audio back in order as soon as each piece is ready.
+"""
+
+import asyncio
+import logging
+import os
+import re
+from typing import Any, AsyncIterator, Dict, List, Optional, Text
+
+from .minimax import synthesize
+from .mp3_frames import Mp3FormatError, audio_frames
+
+logger = logging.getLogger(__name__)
+
+CHUNKED_TTS_MIN_CHARS = int(os.getenv("CHUNKED_TTS_MIN_CHARS", "300"))
+CHUNKED_TTS_MAX_CHARS = int(os.getenv("CHUNKED_TTS_MAX_CHARS", "400"))
+CHUNKED_TTS_CONCURRENCY = int(os.getenv("CHUNKED_TTS_CONCURRENCY", "4"))
+
+PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+# Sentence end, optionally followed by a closing quote or bracket that stays with it
+SENTENCE_END = re.compile(r"(?:(?<=[.!?])|(?<=[.!?][\"')\]]))\s+")
+CLAUSE_BREAK = re.compile(r"(?<=[,;:\-])\s+")
+
+
+def _split_long(sentence: Text, max_chars: int) -> List[Text]:
+    """Break an over-long sentence at clause boundaries, then at spaces."""
+    pieces: List[Text] = []
+    current = ""
+    for part in CLAUSE_BREAK.split(sentence):
+        words = part.split() if len(part) > max_chars else [part]
+        for word in words:
+            candidate = f"{current} {word}" if current else word
+            if current and len(candidate) > max_chars:
+                pieces.append(current)
+                current = word
+            else:
+                current = candidate
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def split_text(text: Text, max_chars: int = CHUNKED_TTS_MAX_CHARS) -> List[Text]:
+    """
+    Split text into sentence-sized chunks for synthesis.
+    Sentences are kept whole where possible so each one maps to its own
+    cache entry and is reused wherever the same sentence appears again.
+    """
+    chunks: List[Text] = []
+    for paragraph in PARAGRAPH_BREAK.split(text):
+        paragraph = " ".join(paragraph.split())
+        if not paragraph:
+            continue
+        for sentence in SENTENCE_END.split(paragraph):
+            sentence = sentence.strip()
+            if not sentence:
+                continue
+            if len(sentence) > max_chars:
+                chunks.extend(_split_long(sentence, max_chars))
+            else:
+                chunks.append(sentence)
+    return chunks
+
+
+async def iter_chunked_synthesis(text: Text,
+                                 voice_setting: Dict[Text, Any],
+                                 concurrency: int = CHUNKED_TTS_CONCURRENCY,
+                                 config: Optional[Dict[Text, Text]] = None) -> AsyncIterator[bytes]:
+    """
+    Synthesize every chunk of text with bounded concurrency and yield the
+    audio in order. Chunk 1 is yielded as soon as it is ready while later
+    chunks are still rendering.
+
+    Each chunk is a complete MP3 with its own tags and Xing/Info frame, so
+    only its audio frames are yielded (plus the first chunk's ID3v2 tag):
+    together the pieces form one stream rather than a run of files.
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def render(chunk: Text):
+        async with semaphore:
+            result = await synthesize(chunk, voice_setting, config)
+            return result.audio
+
+    tasks = [asyncio.ensure_future(render(chunk)) for chunk in split_text(text)]
+    try:
+        for index, task in enumerate(tasks):
+            audio = await task
+            try:
+                yield audio_frames(audio, keep_tag=index == 0)
+            except Mp3FormatError as e:
+                logger.warning("Chunk %d is not a clean MP3, passing it through as is: %s", index, str(e))
+                yield bytes(audio)
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def synthesize_chunked(text: Text,
+                             voice_setting: Dict[Text, Any],
+                             concurrency: int = CHUNKED_TTS_CONCURRENCY,
+                             config: Optional[Dict[Text, Text]] = None) -> bytes:
+    """Synthesize text chunk by chunk and return the reassembled MP3."""
+    return b"".join([audio async for audio in iter_chunked_synthesis(text, voice_setting, concurrency, config)])
@@ -0,0 +1,422 @@
+"""
+Compact storage for generated TTS clips
+
+A pack directory holds two files:
+
+- clips.pack: records appended one after another, each a fixed binary
+  header (format, sample rate, bitrate, channels, duration, sizes, the
+  clip key, a SHA-256 of the text and a CRC-32 of the audio), the raw
+  audio bytes and a short compact-JSON metadata blob (text, voice, model).
+- clips.idx: an open-addressing hash table from clip key to record offset,
+  rewritten whenever clips are added.
+
+ClipPack memory-maps both files, so a lookup is one or two probes into the
+index and the audio is returned as a zero-copy memoryview.
+
+Clip keys are TTS cache keys (make_cache_key) when the voice settings are
+known, so packed clips line up with the TTS cache; otherwise the SHA-256 of
+the text.
+
+The migrate command converts the pretty-printed JSON dumps the generator
+scripts used to write (hex audio plus the request and response repeated)
+into a pack, decoding the audio as each dump streams past:
+
+Usage:
+    python -m actions.clip_pack migrate ../love_tts_*.json --pack clips/
+    python -m actions.clip_pack list --pack clips/
+    python -m actions.clip_pack extract <key> --pack clips/ --output clip.mp3
+"""
+
+import argparse
+import hashlib
+import io
+import json
+import logging
+import mmap
+import os
+import struct
+import zlib
+from typing import Any, Dict, Iterator, NamedTuple, Optional, Text, Tuple, Union
+
+from .audio_extract import AudioExtractError, extract_audio
+from .tts_cache import make_cache_key
+
+logger = logging.getLogger(__name__)
+
+PACK_FILE = "clips.pack"
+INDEX_FILE = "clips.idx"
+
+RECORD_MAGIC = b"CLIP"
+INDEX_MAGIC = b"CIDX"
+FORMAT_VERSION = 1
+
+# magic, version, audio format, channels, sample rate, bitrate, duration ms,
+# metadata size, audio size, key, text SHA-256, audio CRC-32
+RECORD_HEADER = struct.Struct("<4sBBHIIIIQ32s32sI")
+# magic, version, slot count
+INDEX_HEADER = struct.Struct("<4sHQ")
+# key, record offset + 1 (0 marks an empty slot)
+INDEX_SLOT = struct.Struct("<32sQ")
+
+AUDIO_FORMATS = {"mp3": 1, "pcm": 2, "flac": 3, "wav": 4}
+_FORMAT_NAMES = {code: name for name, code in AUDIO_FORMATS.items()}
+
+
+class ClipPackError(ValueError):
+    """Raised for malformed pack or index files and unusable source dumps."""
+
+
+class Clip(NamedTuple):
+    key: Text
+    text_hash: Text
+    audio_format: Text
+    sample_rate: int
+    bitrate: int
+    channels: int
+    duration_ms: int
+    audio: memoryview
+    meta: Dict[Text, Any]
+
+
+def text_hash(text: Text) -> Text:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _slot_count(entries: int) -> int:
+    """Power of two keeping the table at most half full."""
+    slots = 8
+    while slots < entries * 2:
+        slots *= 2
+    return slots
+
+
+def _home_slot(key: bytes, slots: int) -> int:
+    return int.from_bytes(key[:8], "little") & (slots - 1)
+
+
+def _scan_records(pack: Union[bytes, mmap.mmap]) -> Tuple[Dict[bytes, int], int]:
+    """
+    Return the offsets of the complete records in a pack (raw key -> offset)
+    and where the last one ends. Anything after that is a record torn by a
+    writer that did not finish.
+    """
+    entries: Dict[bytes, int] = {}
+    offset = 0
+    while offset + RECORD_HEADER.size <= len(pack):
+        fields = RECORD_HEADER.unpack_from(pack, offset)
+        end = offset + RECORD_HEADER.size + fields[8] + fields[7]
+        if fields[0] != RECORD_MAGIC or end > len(pack):
+            break
+        entries[fields[9]] = offset
+        offset = end
+    return entries, offset
+
+
+def _map(path: Text) -> Union[bytes, mmap.mmap]:
+    """Memory-map a file read-only; empty files (which mmap refuses) read as b""."""
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return b""
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def _fsync_directory(directory: Text) -> None:
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def write_index(directory: Text, entries: Dict[bytes, int]) -> None:
+    """Write the index for entries (raw key -> record offset), replacing the old one atomically."""
+    slots = _slot_count(len(entries))
+    table = bytearray(INDEX_HEADER.size + slots * INDEX_SLOT.size)
+    INDEX_HEADER.pack_into(table, 0, INDEX_MAGIC, FORMAT_VERSION, slots)
+    for key, offset in entries.items():
+        slot = _home_slot(key, slots)
+        while INDEX_SLOT.unpack_from(table, INDEX_HEADER.size + slot * INDEX_SLOT.size)[1]:
+            slot = (slot + 1) & (slots - 1)
+        INDEX_SLOT.pack_into(table, INDEX_HEADER.size + slot * INDEX_SLOT.size, key, offset + 1)
+
+    path = os.path.join(directory, INDEX_FILE)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(table)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    _fsync_directory(directory)
+
+
+class ClipPackWriter:
+    """
+    Appends clips to a pack and rewrites its index on close, once the pack
+    is synced to disk. Clips whose key is already packed are skipped. A
+    record left half-written by a crashed writer is cut off on open. Use as
+    a context manager.
+    """
+
+    def __init__(self, directory: Text):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, PACK_FILE)
+        self._pack = open(path, "a+b")
+        size = os.fstat(self._pack.fileno()).st_size
+        pack = _map(path)
+        try:
+            self._entries, end = _scan_records(pack)
+        finally:
+            if isinstance(pack, mmap.mmap):
+                pack.close()
+        if end < size:
+            logger.warning("Truncating %d bytes of an unfinished record at the end of %s", size - end, path)
+            self._pack.truncate(end)
+            os.fsync(self._pack.fileno())
+            # Appends land at the new end; tell() must report it for the index
+            self._pack.seek(end)
+
+    def __contains__(self, key: Text) -> bool:
+        return bytes.fromhex(key) in self._entries
+
+    def add(self,
+            key: Text,
+            audio: bytes,
+            text: Text,
+            audio_format: Text = "mp3",
+            sample_rate: int = 0,
+            bitrate: int = 0,
+            channels: int = 1,
+            duration_ms: int = 0,
+            meta: Optional[Dict[Text, Any]] = None) -> bool:
+        """Append a clip; returns False if its key was already in the pack."""
+        raw_key = bytes.fromhex(key)
+        if len(raw_key) != 32:
+            raise ClipPackError(f"Clip keys are SHA-256 hex digests, got {key!r}")
+        if raw_key in self._entries:
+            return False
+        if audio_format not in AUDIO_FORMATS:
+            raise ClipPackError(f"Unsupported audio format: {audio_format}")
+
+        meta_bytes = json.dumps({"text": text, **(meta or {})}, separators=(",", ":"),
+                                ensure_ascii=False).encode("utf-8")
+        header = RECORD_HEADER.pack(
+            RECORD_MAGIC, FORMAT_VERSION, AUDIO_FORMATS[audio_format], channels, sample_rate, bitrate,
+            duration_ms, len(meta_bytes), len(audio), raw_key, bytes.fromhex(text_hash(text)),
+            zlib.crc32(audio))
+        offset = self._pack.tell()
+        self._pack.write(header)
+        self._pack.write(audio)
+        self._pack.write(meta_bytes)
+        self._entries[raw_key] = offset
+        return True
+
+    def close(self) -> None:
+        self._pack.flush()
+        os.fsync(self._pack.fileno())
+        self._pack.close()
+        write_index(self.directory, self._entries)
+
+    def __enter__(self) -> "ClipPackWriter":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+class ClipPack:
+    """Read-only, memory-mapped view of a pack directory."""
+
+    def __init__(self, directory: Text):
+        self.directory = directory
+        self._pack = _map(os.path.join(directory, PACK_FILE))
+        self._index = _map(os.path.join(directory, INDEX_FILE))
+        if len(self._index) < INDEX_HEADER.size:
+            raise ClipPackError(f"{INDEX_FILE} in {directory} is truncated")
+        magic, version, self._slots = INDEX_HEADER.unpack_from(self._index, 0)
+        if magic != INDEX_MAGIC or version != FORMAT_VERSION:
+            raise ClipPackError(f"{INDEX_FILE} in {directory} is not a version {FORMAT_VERSION} clip index")
+
+    def _offset(self, raw_key: bytes) -> Optional[int]:
+        slot = _home_slot(raw_key, self._slots)
+        for _ in range(self._slots):
+            stored_key, stored = INDEX_SLOT.unpack_from(self._index, INDEX_HEADER.size + slot * INDEX_SLOT.size)
+            if not stored:
+                return None
+            if stored_key == raw_key:
+                return stored - 1
+            slot = (slot + 1) & (self._slots - 1)
+        return None
+
+    def get(self, key: Text, verify: bool = False) -> Optional[Clip]:
+        """Return the clip stored under key, or None. verify checks the audio CRC."""
+        try:
+            offset = self._offset(bytes.fromhex(key))
+        except ValueError:
+            return None
+        if offset is None:
+            return None
+
+        (magic, _, audio_format, channels, sample_rate, bitrate, duration_ms,
+         meta_size, audio_size, raw_key, raw_text_hash, crc) = RECORD_HEADER.unpack_from(self._pack, offset)
+        start = offset + RECORD_HEADER.size
+        if magic != RECORD_MAGIC or start + audio_size + meta_size > len(self._pack):
+            raise ClipPackError(f"Index points at a damaged record for {key}")
+        audio = memoryview(self._pack)[start:start + audio_size]
+        if verify and zlib.crc32(audio) != crc:
+            raise ClipPackError(f"Audio of clip {key} does not match its checksum")
+        meta = json.loads(self._pack[start + audio_size:start + audio_size + meta_size])
+        return Clip(raw_key.hex(), raw_text_hash.hex(), _FORMAT_NAMES.get(audio_format, "unknown"),
+                    sample_rate, bitrate, channels, duration_ms, audio, meta)
+
+    def __contains__(self, key: Text) -> bool:
+        return self.get(key) is not None
+
+    def _slots_in_use(self) -> Iterator[Tuple[bytes, int]]:
+        for slot in range(self._slots):
+            key, stored = INDEX_SLOT.unpack_from(self._index, INDEX_HEADER.size + slot * INDEX_SLOT.size)
+            if stored:
+                yield key, stored - 1
+
+    def keys(self) -> Iterator[Text]:
+        """Keys of the indexed clips, in pack order."""
+        for key, _ in sorted(self._slots_in_use(), key=lambda item: item[1]):
+            yield key.hex()
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self._slots_in_use())
+
+
+# Values of a generator dump read besides the audio, under a "response" key
+# in generator dumps and at the top level in raw API responses
+DUMP_FIELDS = (("text",), ("generated_at",), ("settings",), ("payload_used",),
+               ("trace_id",), ("base_resp",), ("response", "trace_id"), ("response", "base_resp"))
+
+
+def _subtree(fields: Dict[Tuple[Text, ...], Any], *prefix: Text) -> Dict[Text, Any]:
+    """Rebuild the object at prefix from the flat path -> value map of extract_audio."""
+    tree: Dict[Text, Any] = {}
+    for path, value in fields.items():
+        if path[:len(prefix)] != prefix or len(path) == len(prefix):
+            continue
+        node = tree
+        for key in path[len(prefix):-1]:
+            node = node.setdefault(key, {})
+        node[path[-1]] = value
+    return tree
+
+
+def _check_status(fields: Dict[Tuple[Text, ...], Any]) -> None:
+    base_resp = _subtree(fields, "response", "base_resp") or _subtree(fields, "base_resp")
+    if base_resp.get("status_code", 0) != 0:
+        raise ClipPackError(f"dump holds a failed request ({base_resp.get('status_code')}: "
+                            f"{base_resp.get('status_msg')})")
+
+
+def _clip_from_dump(path: Text) -> Tuple[Text, bytes, Text, Dict[Text, Any], Dict[Text, Any]]:
+    """
+    Pull (key, audio, text, extra_info, meta) out of a generator JSON dump.
+    The audio is decoded as the file streams past (see actions/audio_extract.py),
+    so the hex string is never held in memory as a whole.
+    """
+    audio = io.BytesIO()
+    try:
+        with open(path, "rb") as source:
+            extracted = extract_audio(source, audio, fields=DUMP_FIELDS)
+    except AudioExtractError as e:
+        _check_status(e.fields)  # A failed request is the likelier reason there is no audio
+        raise
+    fields = extracted["fields"]
+    _check_status(fields)
+
+    payload = _subtree(fields, "payload_used")
+    text = fields.get(("text",)) or payload.get("text") or ""
+    if payload.get("voice_setting") and payload.get("model"):
+        key = make_cache_key(text, payload["voice_setting"], payload["model"], payload.get("audio_setting"))
+    else:
+        key = text_hash(text)
+    meta = {
+        "voice_setting": payload.get("voice_setting") or _subtree(fields, "settings"),
+        "model": payload.get("model"),
+        "generated_at": fields.get(("generated_at",)),
+        "trace_id": fields.get(("response", "trace_id")) or fields.get(("trace_id",)),
+    }
+    return key, audio.getvalue(), text, extracted["extra_info"], {k: v for k, v in meta.items() if v}
+
+
+def migrate(json_paths, directory: Text, remove_source: bool = False) -> Dict[Text, int]:
+    """Convert generator JSON dumps into the pack in directory."""
+    stats = {"packed": 0, "duplicate": 0, "skipped": 0, "json_bytes": 0, "packed_bytes": 0}
+    packed_sources = []
+    with ClipPackWriter(directory) as writer:
+        for path in json_paths:
+            try:
+                key, audio, text, info, meta = _clip_from_dump(path)
+            except (OSError, ValueError) as e:
+                stats["skipped"] += 1
+                logger.warning("Skipping %s: %s", path, str(e))
+                continue
+
+            if info.get("audio_size") and info["audio_size"] != len(audio):
+                logger.warning("%s: extra_info says %d audio bytes, decoded %d",
+                               path, info["audio_size"], len(audio))
+            added = writer.add(key, audio, text,
+                               audio_format=info.get("audio_format") or "mp3",
+                               sample_rate=int(info.get("audio_sample_rate") or 0),
+                               bitrate=int(info.get("bitrate") or 0),
+                               channels=int(info.get("audio_channel") or 1),
+                               duration_ms=int(info.get("audio_length") or 0),
+                               meta={**meta, "source": os.path.basename(path)})
+            stats["packed" if added else "duplicate"] += 1
+            stats["json_bytes"] += os.path.getsize(path)
+            logger.info("%s %s -> %s (%d audio bytes)", "Packed" if added else "Already packed",
+                        path, key, len(audio))
+            packed_sources.append(path)
+
+    # Only once the pack is synced and indexed, so a crash never loses a clip
+    if remove_source:
+        for path in packed_sources:
+            os.remove(path)
+    stats["packed_bytes"] = os.path.getsize(os.path.join(directory, PACK_FILE))
+    return stats
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compact, indexed storage for generated TTS clips")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    migrate_parser = subparsers.add_parser("migrate", help="Convert generator JSON dumps into a pack")
+    migrate_parser.add_argument("json", nargs="+", help="JSON dump files")
+    migrate_parser.add_argument("--remove-source", action="store_true", help="Delete the dumps once the pack is written")
+    subparsers.add_parser("list", help="List the clips in a pack")
+    extract_parser = subparsers.add_parser("extract", help="Write one clip's audio to a file")
+    extract_parser.add_argument("key")
+    extract_parser.add_argument("--output", required=True)
+    for subparser in subparsers.choices.values():
+        subparser.add_argument("--pack", default="clips", help="Pack directory")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s - %(message)s")
+
+    if args.command == "migrate":
+        stats = migrate(args.json, args.pack, args.remove_source)
+        logger.info("Packed %d, already packed %d, skipped %d; %d bytes of JSON -> pack of %d bytes",
+                    stats["packed"], stats["duplicate"], stats["skipped"],
+                    stats["json_bytes"], stats["packed_bytes"])
+        return
+
+    pack = ClipPack(args.pack)
+    if args.command == "list":
+        for key in pack.keys():
+            clip = pack.get(key)
+            print(f"{key}  {clip.audio_format}  {clip.duration_ms / 1000:7.1f}s  {len(clip.audio):>10,} B  "
+                  f"{clip.meta.get('text', '')[:50]!r}")
+    else:
+        clip = pack.get(args.key, verify=True)
+        if clip is None:
+            parser.error(f"No clip {args.key} in {args.pack}")
+        with open(args.output, "wb") as f:
+            f.write(clip.audio)
+
+
+if __name__ == "__main__":
+    main()
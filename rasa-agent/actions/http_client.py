@@ -0,0 +1,64 @@
+"""
+Shared HTTP client for the action server
+One pooled, keep-alive aiohttp session per process, reused by every action
+"""
+
+import asyncio
+import logging
+import os
+from typing import Optional
+
+import aiohttp
+
+from .metrics import METRICS_ENABLED, trace_config
+
+logger = logging.getLogger(__name__)
+
+# Connection pool configuration
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "200"))
+HTTP_POOL_PER_HOST = int(os.getenv("HTTP_POOL_PER_HOST", "50"))
+HTTP_KEEPALIVE_TIMEOUT = float(os.getenv("HTTP_KEEPALIVE_TIMEOUT", "30"))
+HTTP_DNS_CACHE_TTL = int(os.getenv("HTTP_DNS_CACHE_TTL", "300"))
+
+USER_AGENT = "CallWaitingAI-Rasa-Agent/1.0"
+
+_session: Optional[aiohttp.ClientSession] = None
+_session_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+async def get_session() -> aiohttp.ClientSession:
+    """
+    Return the process-wide client session, creating it on first use.
+    The session is tied to the running event loop, so a new one is built
+    if the loop changes (e.g. one-off scripts calling asyncio.run twice).
+    """
+    global _session, _session_loop
+
+    loop = asyncio.get_running_loop()
+    if _session is None or _session.closed or _session_loop is not loop:
+        connector = aiohttp.TCPConnector(
+            limit=HTTP_POOL_SIZE,
+            limit_per_host=HTTP_POOL_PER_HOST,
+            keepalive_timeout=HTTP_KEEPALIVE_TIMEOUT,
+            ttl_dns_cache=HTTP_DNS_CACHE_TTL,
+        )
+        _session = aiohttp.ClientSession(
+            connector=connector,
+            headers={"User-Agent": USER_AGENT},
+            trace_configs=[trace_config()] if METRICS_ENABLED else None,
+        )
+        _session_loop = loop
+        logger.info("Created HTTP session (pool: %d, per host: %d)",
+                    HTTP_POOL_SIZE, HTTP_POOL_PER_HOST)
+
+    return _session
+
+
+async def close_session() -> None:
+    """Close the shared session and release pooled connections."""
+    global _session, _session_loop
+
+    if _session is not None and not _session.closed:
+        await _session.close()
+    _session = None
+    _session_loop = None
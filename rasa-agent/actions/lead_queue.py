@@ -0,0 +1,319 @@
+"""
+Write-behind queue for leads captured by the action server
+
+Leads are appended to a local journal, collected into batches by size or
+time window and sent to the backend as one bulk request. Failed batches are
+retried with exponential backoff; anything not yet acknowledged by the
+backend stays in the journal and is replayed when the action server restarts.
+
+Each lead is sent with its journal id and the backend upserts on it, so a
+batch resent after a lost response is not stored twice. A batch the backend
+rejects outright (4xx, e.g. one phone number failing validation) is split
+until the offending leads are isolated; those go to a dead-letter journal
+and the rest are delivered, so one bad lead cannot block the queue.
+
+Under action_workers.py every worker has its own journal (see
+worker_journal_path). Worker 0 adopts the journals of workers that no
+longer exist, e.g. after the worker count was lowered, so no lead is
+stranded in a file nobody replays.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import random
+import re
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Sequence, Text
+
+import aiohttp
+
+from .http_client import get_session
+from .shared_state import ACTION_WORKER_COUNT, worker_index
+
+logger = logging.getLogger(__name__)
+
+LEAD_BATCH_SIZE = int(os.getenv("LEAD_BATCH_SIZE", "20"))
+LEAD_BATCH_WINDOW_SECONDS = float(os.getenv("LEAD_BATCH_WINDOW_SECONDS", "2"))
+LEAD_REQUEST_TIMEOUT_SECONDS = float(os.getenv("LEAD_REQUEST_TIMEOUT_SECONDS", "10"))
+LEAD_BACKOFF_SECONDS = float(os.getenv("LEAD_BACKOFF_SECONDS", "1"))
+LEAD_BACKOFF_MAX_SECONDS = float(os.getenv("LEAD_BACKOFF_MAX_SECONDS", "300"))
+LEAD_JOURNAL_PATH = os.getenv("LEAD_JOURNAL_PATH", "lead_journal.jsonl")
+# Leads the backend rejected; defaults to the journal path plus ".dead"
+LEAD_DEAD_LETTER_PATH = os.getenv("LEAD_DEAD_LETTER_PATH", "")
+
+# Client errors worth retrying as they are; any other 4xx rejects the batch for good
+RETRYABLE_CLIENT_STATUSES = {408, 429}
+
+# Rewrite the journal once this many acknowledged entries have piled up
+JOURNAL_COMPACT_THRESHOLD = 1000
+
+
+class LeadRejected(Exception):
+    """Raised when the backend refuses a batch in a way a retry cannot fix."""
+
+    def __init__(self, status: int, detail: Text):
+        super().__init__(f"HTTP {status}: {detail}")
+        self.status = status
+        self.detail = detail
+
+
+def worker_journal_path(path: Text, index: int) -> Text:
+    """Journal of worker index: path itself for worker 0, ".<index>" before the extension for the rest."""
+    if index == 0:
+        return path
+    root, extension = os.path.splitext(path)
+    return f"{root}.{index}{extension}"
+
+
+def orphaned_journals(path: Text, worker_count: int) -> List[Text]:
+    """Journals next to path that belong to worker indexes at or above worker_count."""
+    directory = os.path.dirname(path) or "."
+    root, extension = os.path.splitext(os.path.basename(path))
+    pattern = re.compile(re.escape(root) + r"\.(\d+)" + re.escape(extension) + "$")
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return []
+    indexes = sorted(int(match.group(1)) for match in map(pattern.match, names) if match)
+    return [os.path.join(os.path.dirname(path), f"{root}.{index}{extension}")
+            for index in indexes if index >= max(1, worker_count)]
+
+
+def _backend_url() -> Optional[Text]:
+    backend_url = os.getenv("BACKEND_URL")
+    if not backend_url:
+        return None
+    if not backend_url.startswith(('http://', 'https://')):
+        backend_url = f"https://{backend_url}"
+    return backend_url.rstrip("/")
+
+
+class LeadQueue:
+    """
+    Buffers leads in memory and in an append-only journal until the backend
+    confirms a bulk insert. The journal holds {"op": "add", "id", "lead"}
+    records for queued leads and {"op": "ack", "ids"} records for sent or
+    dead-lettered ones. Unsent leads in the adopt journals are moved into
+    this one on startup.
+    """
+
+    def __init__(self,
+                 journal_path: Text = LEAD_JOURNAL_PATH,
+                 batch_size: int = LEAD_BATCH_SIZE,
+                 window_seconds: float = LEAD_BATCH_WINDOW_SECONDS,
+                 dead_letter_path: Text = LEAD_DEAD_LETTER_PATH,
+                 adopt: Sequence[Text] = ()):
+        self.journal_path = journal_path
+        self.dead_letter_path = dead_letter_path or journal_path + ".dead"
+        self.batch_size = max(1, batch_size)
+        self.window_seconds = window_seconds
+        self._pending: List[Dict[Text, Any]] = []
+        self._acked_since_compact = 0
+        self._wakeup: Optional[asyncio.Event] = None
+        self._flusher: Optional[asyncio.Task] = None
+
+        self._replay(adopt)
+        self._journal = open(journal_path, "a", encoding="utf-8")
+
+    @staticmethod
+    def _read_journal(path: Text) -> Dict[Text, Dict[Text, Any]]:
+        """Leads journaled in path but never acknowledged there, by id."""
+        pending: Dict[Text, Dict[Text, Any]] = {}
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue  # Torn final line from a crash mid-write
+                if record.get("op") == "add":
+                    pending[record["id"]] = record
+                elif record.get("op") == "ack":
+                    for lead_id in record.get("ids", []):
+                        pending.pop(lead_id, None)
+        return pending
+
+    def _replay(self, adopt: Sequence[Text] = ()) -> None:
+        """
+        Load leads that were journaled but never acknowledged, here and in
+        the adopt journals. Adopted files are deleted only once their leads
+        are in this journal; ids keep a lead from being queued twice if that
+        is interrupted.
+        """
+        adopted = [path for path in adopt if os.path.exists(path) and path != self.journal_path]
+        if not adopted and not os.path.exists(self.journal_path):
+            return
+
+        pending: Dict[Text, Dict[Text, Any]] = {}
+        for path in [self.journal_path, *adopted]:
+            if not os.path.exists(path):
+                continue
+            found = self._read_journal(path)
+            if found and path != self.journal_path:
+                logger.info("Adopting %d unsent leads from %s", len(found), path)
+            for lead_id, record in found.items():
+                pending.setdefault(lead_id, record)
+
+        self._pending = list(pending.values())
+        self._compact()
+        for path in adopted:
+            os.remove(path)
+        if self._pending:
+            logger.info("Replaying %d unsent leads from %s", len(self._pending), self.journal_path)
+
+    def _compact(self) -> None:
+        """Rewrite the journal so it only holds unacknowledged leads."""
+        tmp_path = self.journal_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for record in self._pending:
+                f.write(json.dumps(record) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.journal_path)
+        self._acked_since_compact = 0
+
+    def _append(self, record: Dict[Text, Any]) -> None:
+        self._journal.write(json.dumps(record) + "\n")
+        self._journal.flush()
+        os.fsync(self._journal.fileno())
+
+    def start(self) -> None:
+        """Start sending replayed leads without waiting for a new one; needs a running loop."""
+        if self._pending:
+            self._ensure_flusher()
+
+    def _ensure_flusher(self) -> None:
+        if self._flusher is None or self._flusher.done():
+            self._wakeup = asyncio.Event()
+            self._flusher = asyncio.get_running_loop().create_task(self._run())
+
+    async def enqueue(self, lead: Dict[Text, Any]) -> Text:
+        """Journal a lead and schedule it for the next bulk request."""
+        record = {"op": "add", "id": uuid.uuid4().hex, "lead": lead}
+        self._append(record)
+        self._pending.append(record)
+
+        self._ensure_flusher()
+        if len(self._pending) >= self.batch_size:
+            self._wakeup.set()
+        return record["id"]
+
+    async def _run(self) -> None:
+        attempt = 0
+        while True:
+            if len(self._pending) < self.batch_size:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.window_seconds)
+                except asyncio.TimeoutError:
+                    pass
+            self._wakeup.clear()
+
+            if not self._pending:
+                continue
+
+            batch = self._pending[:self.batch_size]
+            try:
+                await self._deliver(batch)
+            except Exception as e:
+                delay = min(LEAD_BACKOFF_MAX_SECONDS, LEAD_BACKOFF_SECONDS * 2 ** attempt)
+                delay *= random.uniform(0.5, 1.0)
+                attempt += 1
+                logger.warning("Failed to send %d leads (attempt %d), retrying in %.1fs: %s",
+                               len(batch), attempt, delay, str(e) or type(e).__name__)
+                await asyncio.sleep(delay)
+                continue
+
+            attempt = 0
+
+    async def _deliver(self, batch: List[Dict[Text, Any]]) -> None:
+        """
+        Send batch and acknowledge it. If the backend rejects it, send each
+        half separately, down to single leads, which are dead-lettered.
+        Transient errors propagate; halves delivered by then stay acknowledged.
+        """
+        try:
+            await self._send(batch)
+        except LeadRejected as e:
+            if len(batch) == 1:
+                self._dead_letter(batch[0], e)
+                return
+            logger.warning("Backend rejected a batch of %d leads (%s), splitting it", len(batch), str(e))
+            middle = len(batch) // 2
+            await self._deliver(batch[:middle])
+            await self._deliver(batch[middle:])
+            return
+        self._acknowledge(batch)
+
+    def _dead_letter(self, record: Dict[Text, Any], error: LeadRejected) -> None:
+        """Move a lead the backend will never accept out of the queue, keeping it for inspection."""
+        with open(self.dead_letter_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"id": record["id"], "lead": record["lead"], "status": error.status,
+                                "error": error.detail, "rejected_at": time.time()}) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        logger.error("Backend rejected lead %s, moved it to %s: %s",
+                     record["id"], self.dead_letter_path, str(error))
+        self._acknowledge([record])
+
+    async def _send(self, batch: List[Dict[Text, Any]]) -> None:
+        backend_url = _backend_url()
+        if not backend_url:
+            raise RuntimeError("BACKEND_URL environment variable not set")
+
+        session = await get_session()
+        async with session.post(
+            f"{backend_url}/api/leads/bulk",
+            json={"leads": [{**record["lead"], "id": record["id"]} for record in batch]},
+            timeout=aiohttp.ClientTimeout(total=LEAD_REQUEST_TIMEOUT_SECONDS)
+        ) as response:
+            if 400 <= response.status < 500 and response.status not in RETRYABLE_CLIENT_STATUSES:
+                raise LeadRejected(response.status, (await response.text())[:500])
+            response.raise_for_status()
+        logger.info("Sent batch of %d leads to backend", len(batch))
+
+    def _acknowledge(self, batch: List[Dict[Text, Any]]) -> None:
+        sent = {record["id"] for record in batch}
+        self._append({"op": "ack", "ids": sorted(sent)})
+        self._pending = [record for record in self._pending if record["id"] not in sent]
+
+        self._acked_since_compact += len(sent)
+        if not self._pending or self._acked_since_compact >= JOURNAL_COMPACT_THRESHOLD:
+            self._journal.close()
+            self._compact()
+            self._journal = open(self.journal_path, "a", encoding="utf-8")
+
+    async def flush(self) -> bool:
+        """Try to send everything queued right now; returns True when drained."""
+        if self._flusher is not None:
+            self._flusher.cancel()
+            self._flusher = None
+
+        while self._pending:
+            batch = self._pending[:self.batch_size]
+            try:
+                await self._deliver(batch)
+            except Exception as e:
+                logger.error("Could not flush %d leads, keeping them journaled: %s",
+                             len(self._pending), str(e) or type(e).__name__)
+                return False
+        return True
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+
+_lead_queue: Optional[LeadQueue] = None
+
+
+def get_lead_queue() -> LeadQueue:
+    """
+    Return the process-wide lead queue, replaying its journal on first use.
+    Worker 0 (or a single-process server) also adopts orphaned worker journals.
+    """
+    global _lead_queue
+    if _lead_queue is None:
+        adopt = orphaned_journals(LEAD_JOURNAL_PATH, ACTION_WORKER_COUNT) if not worker_index() else []
+        _lead_queue = LeadQueue(adopt=adopt)
+    return _lead_queue
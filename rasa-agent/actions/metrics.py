@@ -0,0 +1,301 @@
+"""
+Latency instrumentation for the action server
+
+Records action wall time, per-phase timings and payload sizes for outbound
+HTTP calls, and TTS cache outcomes into log-linear (HDR-style) histograms,
+rendered in Prometheus text format on GET /metrics of the audio server.
+"""
+
+import bisect
+import functools
+import logging
+import os
+import time
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List, Sequence, Text, Tuple
+
+import aiohttp
+from aiohttp import web
+
+from .shared_state import worker_index
+
+logger = logging.getLogger(__name__)
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+
+# Linear sub-buckets per power of two; 4 keeps bucket error under 25%
+SUB_BUCKETS = 4
+
+# Series from action_workers.py workers carry the worker index
+_WORKER_LABEL = f'worker="{worker_index()}"' if worker_index() is not None else ""
+
+
+def log_linear_bounds(lowest: float, highest: float, sub_buckets: int = SUB_BUCKETS) -> List[float]:
+    """Bucket upper bounds that double every sub_buckets steps, HDR-histogram style."""
+    bounds = [lowest]
+    base = lowest
+    while base < highest:
+        step = base / sub_buckets
+        bounds.extend(base + step * i for i in range(1, sub_buckets + 1))
+        base *= 2
+    return bounds
+
+
+SECONDS_BOUNDS = log_linear_bounds(0.0005, 120.0)
+BYTES_BOUNDS = log_linear_bounds(64, 64 * 1024 * 1024)
+
+
+def _format_labels(names: Sequence[Text], values: Sequence[Text], extra: Text = "") -> Text:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if _WORKER_LABEL:
+        pairs.append(_WORKER_LABEL)
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: Text) -> Text:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_number(value: float) -> Text:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Counter:
+    """Monotonic counter family keyed by label values."""
+
+    def __init__(self, name: Text, documentation: Text, label_names: Sequence[Text] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._values: Dict[Tuple[Text, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: Text) -> None:
+        key = tuple(str(labels[name]) for name in self.label_names)
+        self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> List[Text]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        for key, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_format_labels(self.label_names, key)} {_format_number(value)}")
+        return lines
+
+
+class Histogram:
+    """
+    Histogram family with fixed log-linear buckets. Observing is a bisect
+    and an increment, so it is cheap enough for every request.
+    """
+
+    def __init__(self,
+                 name: Text,
+                 documentation: Text,
+                 label_names: Sequence[Text] = (),
+                 bounds: Sequence[float] = SECONDS_BOUNDS):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self.bounds = list(bounds)
+        # Per label set: [bucket counts..., +Inf count], sum
+        self._series: Dict[Tuple[Text, ...], List[Any]] = {}
+
+    def observe(self, value: float, **labels: Text) -> None:
+        key = tuple(str(labels[name]) for name in self.label_names)
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = [[0] * (len(self.bounds) + 1), 0.0]
+        series[0][bisect.bisect_left(self.bounds, value)] += 1
+        series[1] += value
+
+    def render(self) -> List[Text]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for key, (counts, total) in sorted(self._series.items()):
+            cumulative = 0
+            for bound, count in zip(self.bounds, counts):
+                cumulative += count
+                labels = _format_labels(self.label_names, key, f'le="{_format_number(bound)}"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            cumulative += counts[-1]
+            labels = _format_labels(self.label_names, key, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.label_names, key)} {_format_number(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.label_names, key)} {cumulative}")
+        return lines
+
+
+ACTION_DURATION = Histogram(
+    "rasa_action_duration_seconds", "Wall time of custom action runs", ("action", "outcome"))
+HTTP_PHASE_DURATION = Histogram(
+    "rasa_action_http_phase_seconds",
+    "Outbound HTTP call time by phase (dns, connect, ttfb, body, total)", ("host", "phase"))
+HTTP_PAYLOAD_BYTES = Histogram(
+    "rasa_action_http_payload_bytes", "Outbound HTTP body sizes", ("host", "direction"), BYTES_BOUNDS)
+HTTP_ERRORS = Counter(
+    "rasa_action_http_errors_total", "Outbound HTTP calls that raised", ("host", "error"))
+CACHE_LOOKUPS = Counter(
+    "rasa_action_cache_lookups_total", "Cache lookups by cache and result", ("cache", "result"))
+SCHEDULER_REQUESTS = Counter(
+    "rasa_action_minimax_scheduler_total", "MiniMax requests by priority and scheduling outcome",
+    ("priority", "outcome"))
+SCHEDULER_WAIT = Histogram(
+    "rasa_action_minimax_queue_wait_seconds", "Time MiniMax requests waited for a rate-limit token",
+    ("priority",))
+TTS_AUDIO_REJECTED = Counter(
+    "rasa_action_tts_audio_rejected_total", "Synthesized audio rejected as malformed MP3", ("mode",))
+
+REGISTRY = [ACTION_DURATION, HTTP_PHASE_DURATION, HTTP_PAYLOAD_BYTES, HTTP_ERRORS, CACHE_LOOKUPS,
+            SCHEDULER_REQUESTS, SCHEDULER_WAIT, TTS_AUDIO_REJECTED]
+
+
+def record_cache(cache: Text, result: Text) -> None:
+    """Count a cache lookup, e.g. record_cache("tts", "hit")."""
+    CACHE_LOOKUPS.inc(cache=cache, result=result)
+
+
+def render_metrics() -> Text:
+    lines: List[Text] = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+def merge_expositions(texts: Sequence[Text]) -> Text:
+    """Combine the expositions of several workers, keeping one HELP/TYPE header per family."""
+    families: Dict[Text, Tuple[List[Text], List[Text]]] = {}
+    samples: List[Text] = []
+    for text in texts:
+        for line in text.splitlines():
+            if line.startswith("# HELP "):
+                header, samples = families.setdefault(line.split(" ", 3)[2], ([], []))
+                if not header:
+                    header.append(line)
+            elif line.startswith("# TYPE "):
+                if len(header) < 2:
+                    header.append(line)
+            elif line:
+                samples.append(line)
+    lines: List[Text] = []
+    for header, family_samples in families.values():
+        lines.extend(header)
+        lines.extend(family_samples)
+    return "\n".join(lines) + "\n"
+
+
+def metrics_response(text: Text) -> web.Response:
+    return web.Response(text=text, content_type="text/plain",
+                        headers={"X-Content-Type-Options": "nosniff"})
+
+
+_exporter_failed = False
+
+
+async def _ensure_exporter() -> None:
+    global _exporter_failed
+    if _exporter_failed:
+        return
+    # Imported here: the audio server imports this module for its /metrics route
+    from .audio_server import ensure_started
+    try:
+        await ensure_started()
+    except OSError as e:
+        _exporter_failed = True
+        logger.error("Could not start metrics endpoint: %s", str(e))
+
+
+def timed_action(run: Callable) -> Callable:
+    """Decorate Action.run to record its wall time under the action's name."""
+
+    @functools.wraps(run)
+    async def wrapper(self, dispatcher, tracker, domain):
+        if not METRICS_ENABLED:
+            return await run(self, dispatcher, tracker, domain)
+
+        await _ensure_exporter()
+        start = time.perf_counter()
+        outcome = "error"
+        try:
+            events = await run(self, dispatcher, tracker, domain)
+            outcome = "success"
+            return events
+        finally:
+            ACTION_DURATION.observe(time.perf_counter() - start, action=self.name(), outcome=outcome)
+
+    return wrapper
+
+
+# aiohttp tracing: each request gets its own SimpleNamespace context
+
+async def _on_request_start(session, ctx, params) -> None:
+    ctx.host = params.url.host or "unknown"
+    ctx.start = time.perf_counter()
+    ctx.connected = ctx.headers_sent = None
+    ctx.sent = 0
+
+
+async def _on_dns_start(session, ctx, params) -> None:
+    ctx.dns_start = time.perf_counter()
+
+
+async def _on_dns_end(session, ctx, params) -> None:
+    HTTP_PHASE_DURATION.observe(time.perf_counter() - ctx.dns_start, host=ctx.host, phase="dns")
+
+
+async def _on_connect_start(session, ctx, params) -> None:
+    ctx.connect_start = time.perf_counter()
+
+
+async def _on_connect_end(session, ctx, params) -> None:
+    ctx.connected = time.perf_counter()
+    # aiohttp has no separate TLS hook, so "connect" covers TCP plus TLS handshake
+    HTTP_PHASE_DURATION.observe(ctx.connected - ctx.connect_start, host=ctx.host, phase="connect")
+
+
+async def _on_connection_reused(session, ctx, params) -> None:
+    ctx.connected = time.perf_counter()
+
+
+async def _on_chunk_sent(session, ctx, params) -> None:
+    ctx.sent += len(params.chunk)
+
+
+async def _on_headers_sent(session, ctx, params) -> None:
+    ctx.headers_sent = time.perf_counter()
+
+
+async def _on_request_end(session, ctx, params) -> None:
+    now = time.perf_counter()
+    request_sent = ctx.headers_sent or ctx.connected or ctx.start
+    HTTP_PHASE_DURATION.observe(now - request_sent, host=ctx.host, phase="ttfb")
+    HTTP_PAYLOAD_BYTES.observe(ctx.sent, host=ctx.host, direction="request")
+
+    content = params.response.content
+
+    def on_body_read() -> None:
+        end = time.perf_counter()
+        HTTP_PHASE_DURATION.observe(end - now, host=ctx.host, phase="body")
+        HTTP_PHASE_DURATION.observe(end - ctx.start, host=ctx.host, phase="total")
+        HTTP_PAYLOAD_BYTES.observe(content.total_bytes, host=ctx.host, direction="response")
+
+    content.on_eof(on_body_read)
+
+
+async def _on_request_exception(session, ctx, params) -> None:
+    HTTP_ERRORS.inc(host=getattr(ctx, "host", "unknown"), error=type(params.exception).__name__)
+
+
+def trace_config() -> aiohttp.TraceConfig:
+    """TraceConfig that feeds outbound request timings into the histograms."""
+    config = aiohttp.TraceConfig(trace_config_ctx_factory=lambda **kwargs: SimpleNamespace())
+    config.on_request_start.append(_on_request_start)
+    config.on_dns_resolvehost_start.append(_on_dns_start)
+    config.on_dns_resolvehost_end.append(_on_dns_end)
+    config.on_connection_create_start.append(_on_connect_start)
+    config.on_connection_create_end.append(_on_connect_end)
+    config.on_connection_reuseconn.append(_on_connection_reused)
+    config.on_request_chunk_sent.append(_on_chunk_sent)
+    if hasattr(config, "on_request_headers_sent"):
+        config.on_request_headers_sent.append(_on_headers_sent)
+    config.on_request_end.append(_on_request_end)
+    config.on_request_exception.append(_on_request_exception)
+    return config
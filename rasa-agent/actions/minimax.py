@@ -0,0 +1,550 @@
+"""
+MiniMax TTS client for the action server
+Builds t2a_v2 requests, decodes the returned audio and serves repeats from the TTS cache
+"""
+
+import asyncio
+import functools
+import json
+import logging
+import os
+import time
+from typing import Any, AsyncIterator, Dict, NamedTuple, Optional, Text, Tuple, Union
+
+import aiohttp
+
+from .audio_decoder import IncrementalHexDecoder
+from .http_client import get_session
+from .metrics import TTS_AUDIO_REJECTED, record_cache
+from .mp3_frames import Mp3FormatError, Mp3FrameParser, parse_mp3
+from .prerendered import get_prerendered
+from .resilience import CircuitBreaker, CircuitOpenError, RetryBudget, hedged_call
+from .scheduler import PRIORITY_LIVE, RequestDropped, get_scheduler
+from .shared_state import get_shared_state
+from .single_flight import KeyLock, SingleFlight, open_key_lock
+from .tts_cache import TTSCache, cache_key_template, get_tts_cache, make_cache_key
+from .voices import RequestTemplate
+
+logger = logging.getLogger(__name__)
+
+MINIMAX_TIMEOUT_SECONDS = float(os.getenv("MINIMAX_TIMEOUT_SECONDS", "15"))
+MINIMAX_STREAM = os.getenv("MINIMAX_STREAM", "false").lower() == "true"
+DEFAULT_MODEL = "speech-02-hd"
+
+# Hedging: a second request goes to the fallback endpoint once the primary has
+# taken longer than its recent p95 (MINIMAX_HEDGE_DELAY_SECONDS until known)
+MINIMAX_HEDGE_ENABLED = os.getenv("MINIMAX_HEDGE_ENABLED", "true").lower() == "true"
+MINIMAX_HEDGE_PERCENTILE = float(os.getenv("MINIMAX_HEDGE_PERCENTILE", "95"))
+MINIMAX_HEDGE_DELAY_SECONDS = float(os.getenv("MINIMAX_HEDGE_DELAY_SECONDS", "3"))
+MINIMAX_HEDGE_MIN_DELAY_SECONDS = float(os.getenv("MINIMAX_HEDGE_MIN_DELAY_SECONDS", "0.3"))
+
+# Identical concurrent requests share one synthesis; across processes too via
+# a lock file next to the disk cache, which hands the audio over
+TTS_COALESCE_ACROSS_PROCESSES = os.getenv("TTS_COALESCE_ACROSS_PROCESSES", "true").lower() == "true"
+TTS_COALESCE_POLL_SECONDS = float(os.getenv("TTS_COALESCE_POLL_SECONDS", "0.05"))
+
+# Walk every frame header of new audio before it is cached or served
+TTS_VALIDATE_AUDIO = os.getenv("TTS_VALIDATE_AUDIO", "true").lower() == "true"
+
+# SSE status of the closing event in streamed t2a_v2 responses
+STREAM_STATUS_FINAL = 2
+
+# base_resp codes for exceeded rate limits (RPM / TPM)
+RATE_LIMIT_CODES = {1002, 1039}
+# base_resp codes for faults on MiniMax's side (unknown error, timeout, internal error);
+# the rest (auth, balance, invalid parameters, content) are the request's own
+SERVER_ERROR_CODES = {1000, 1001, 1013}
+
+# Fixed output format so cache keys stay stable across callers
+DEFAULT_AUDIO_SETTING = {
+    "sample_rate": 32000,
+    "bitrate": 128000,
+    "format": "mp3"
+}
+
+
+class MiniMaxError(Exception):
+    """Raised when MiniMax is misconfigured or returns no usable audio."""
+
+    def __init__(self, message: Text, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class MiniMaxUnavailableError(MiniMaxError):
+    """
+    Raised without calling MiniMax while every endpoint's circuit is open,
+    or when the request scheduler drops the request.
+    """
+
+
+class MiniMaxAudioError(MiniMaxError):
+    """Raised when MiniMax returns audio that is not a well-formed MP3."""
+
+
+class TTSResult(NamedTuple):
+    audio: Union[bytes, memoryview]
+    cache_key: Text
+    cache_hit: bool
+
+
+def load_config() -> Dict[Text, Text]:
+    """Read MiniMax configuration from the environment."""
+    config = {
+        "url": os.getenv("MINIMAX_API_URL"),
+        "api_key": os.getenv("MINIMAX_API_KEY"),
+        "group_id": os.getenv("MINIMAX_GROUP_ID"),
+        "model": os.getenv("MINIMAX_MODEL", DEFAULT_MODEL),
+    }
+    # The v1 endpoint takes the same body and is used for hedges and fallbacks
+    config["fallback_url"] = os.getenv("MINIMAX_FALLBACK_URL") or (
+        config["url"].replace("/t2a_v2", "/t2a") if config["url"] and "/t2a_v2" in config["url"] else None)
+    if not all([config["url"], config["api_key"], config["group_id"]]):
+        raise MiniMaxError(
+            "Missing MiniMax configuration - URL: %s, API Key: %s, Group ID: %s" % (
+                bool(config["url"]), bool(config["api_key"]), bool(config["group_id"])))
+    return config
+
+
+async def _fetch_audio_url(audio_url: Text, timeout: float = MINIMAX_TIMEOUT_SECONDS) -> bytes:
+    session = await get_session()
+    async with session.get(
+        audio_url,
+        timeout=aiohttp.ClientTimeout(total=timeout)
+    ) as response:
+        response.raise_for_status()
+        return await response.read()
+
+
+async def decode_audio(response_data: Dict[Text, Any], timeout: float = MINIMAX_TIMEOUT_SECONDS) -> bytes:
+    """
+    Extract audio bytes from a MiniMax response.
+    t2a_v2 returns hex in data.audio; URL-style responses (audio_url,
+    or audio_file from v1 t2a) are downloaded within timeout seconds.
+    """
+    status_code = (response_data.get("base_resp") or {}).get("status_code", 0)
+    if status_code != 0:
+        status_msg = response_data["base_resp"].get("status_msg", "TTS request failed")
+        raise MiniMaxError(f"MiniMax TTS API error ({status_code}): {status_msg}", status_code)
+
+    data = response_data.get("data") or {}
+    audio = data.get("audio") if isinstance(data, dict) else None
+    audio_url = response_data.get("audio_url") or response_data.get("audio_file") or (
+        data.get("audio_url") if isinstance(data, dict) else None)
+
+    if audio and audio.startswith(("http://", "https://")):
+        audio_url = audio
+    elif audio:
+        return bytes.fromhex(audio)
+
+    if audio_url:
+        return await _fetch_audio_url(audio_url, timeout)
+
+    raise MiniMaxError("No audio data in MiniMax response")
+
+
+def _lookup_cached(cache_key: Text, cache: Optional[TTSCache] = None) -> Optional[Union[bytes, memoryview]]:
+    """Return pre-rendered or cached audio for cache_key, counting the outcome."""
+    audio = get_prerendered().get(cache_key)
+    if audio is not None:
+        record_cache("tts", "prerendered")
+        return audio
+    audio = (cache or get_tts_cache()).get(cache_key)
+    record_cache("tts", "miss" if audio is None else "hit")
+    return audio
+
+
+async def synthesize(text: Text,
+                     voice_setting: Dict[Text, Any],
+                     config: Optional[Dict[Text, Text]] = None,
+                     cache_key: Optional[Text] = None,
+                     priority: int = PRIORITY_LIVE,
+                     cache: Optional[TTSCache] = None,
+                     timeout: float = MINIMAX_TIMEOUT_SECONDS) -> TTSResult:
+    """
+    Synthesize text with MiniMax, returning pre-rendered or cached audio
+    when available. cache_key may be passed when it was computed up front
+    (e.g. for a canned route) to skip hashing the text again. cache replaces
+    the shared TTS cache, so bulk jobs do not evict the live entries, and
+    timeout the per-request limit, so bulk jobs can wait for long texts.
+
+    Concurrent calls for the same audio share one request (see
+    _synthesize_once), which waits for the rate limiter in the priority
+    class of the first caller (see actions/scheduler.py). Slow or failed
+    requests are retried on the v1 fallback endpoint, and slow live ones
+    hedged to it; see _post_hedged.
+
+    Raises MiniMaxError, aiohttp.ClientError, asyncio.TimeoutError or
+    ValueError (invalid JSON/hex); callers decide how to surface them.
+    """
+    config = config or load_config()
+    cache_key = cache_key or make_cache_key(text, voice_setting, config["model"], DEFAULT_AUDIO_SETTING)
+
+    cached = _lookup_cached(cache_key, cache)
+    if cached is not None:
+        return TTSResult(cached, cache_key, True)
+
+    if _single_flight.joined(cache_key):
+        record_cache("tts", "coalesced")
+    audio = await _single_flight.do(cache_key, functools.partial(
+        _synthesize_once, text, voice_setting, config, cache_key, priority, cache, timeout))
+    return TTSResult(audio, cache_key, False)
+
+
+_single_flight = SingleFlight()
+_key_lock: Optional[KeyLock] = None
+
+
+def _get_key_lock() -> Optional[KeyLock]:
+    """Lock file shared with other processes using the same disk cache, if enabled."""
+    global _key_lock
+    cache = get_tts_cache()
+    if _key_lock is None and TTS_COALESCE_ACROSS_PROCESSES and cache.disk_bytes > 0:
+        _key_lock = open_key_lock(os.path.join(cache.cache_dir, ".inflight.lock"))
+    return _key_lock
+
+
+async def _synthesize_once(text: Text,
+                           voice_setting: Dict[Text, Any],
+                           config: Dict[Text, Text],
+                           cache_key: Text,
+                           priority: int,
+                           cache: Optional[TTSCache] = None,
+                           timeout: float = MINIMAX_TIMEOUT_SECONDS) -> Union[bytes, memoryview]:
+    """
+    Synthesize and cache the audio for cache_key. While another process
+    holds the key's lock it is synthesizing the same audio, so this waits
+    for it and reads the result from the disk cache instead. The lock only
+    covers the shared cache; a private one is filled without it.
+    """
+    key_lock = _get_key_lock() if cache is None else None
+    cache = cache or get_tts_cache()
+    locked = False
+    if key_lock is not None:
+        contended = not key_lock.try_acquire(cache_key)
+        # On timeout the other process is presumed stuck and this one synthesizes unlocked
+        locked = not contended or await key_lock.acquire(
+            cache_key, 2 * timeout, TTS_COALESCE_POLL_SECONDS)
+        if contended and locked:
+            audio = cache.get(cache_key)
+            if audio is not None:
+                key_lock.release(cache_key)
+                record_cache("tts", "coalesced_process")
+                return audio
+
+    try:
+        request_body = _request_body(text, voice_setting, config)
+        audio = await _post_hedged(request_body, config, priority, timeout)
+        cache.put(cache_key, audio)
+        return audio
+    finally:
+        if locked:
+            key_lock.release(cache_key)
+
+
+_breakers: Dict[Text, CircuitBreaker] = {}
+_retry_budget: Optional[RetryBudget] = None
+
+
+def _get_retry_budget() -> RetryBudget:
+    """Retry budget shared with the other workers; created on first use, not at import."""
+    global _retry_budget
+    if _retry_budget is None:
+        _retry_budget = RetryBudget(counters=get_shared_state())
+    return _retry_budget
+
+
+def get_breaker(url: Text) -> CircuitBreaker:
+    """Return the circuit breaker for a MiniMax endpoint URL."""
+    breaker = _breakers.get(url)
+    if breaker is None:
+        breaker = _breakers[url] = CircuitBreaker(url)
+    return breaker
+
+
+def _hedge_delay(breaker: CircuitBreaker) -> Optional[float]:
+    if not MINIMAX_HEDGE_ENABLED:
+        return None
+    delay = breaker.latency_percentile(MINIMAX_HEDGE_PERCENTILE)
+    if delay is None:
+        delay = MINIMAX_HEDGE_DELAY_SECONDS
+    return min(max(delay, MINIMAX_HEDGE_MIN_DELAY_SECONDS), MINIMAX_TIMEOUT_SECONDS)
+
+
+async def _acquire_slot(priority: int) -> None:
+    """Wait for the rate limiter; dropped requests surface as MiniMaxUnavailableError."""
+    try:
+        await get_scheduler().acquire(priority)
+    except RequestDropped as e:
+        raise MiniMaxUnavailableError(f"MiniMax request dropped: {e}") from e
+
+
+def _check_rate_limited(status: int = 200, status_code: Optional[int] = None) -> None:
+    """Tell the scheduler when MiniMax rejected a request for exceeding the account's limits."""
+    if status == 429 or status_code in RATE_LIMIT_CODES:
+        logger.warning("MiniMax rate limit hit, pausing requests until the limiter refills")
+        get_scheduler().throttle()
+
+
+async def _post_audio(url: Text,
+                      request_body: bytes,
+                      config: Dict[Text, Text],
+                      timeout: float = MINIMAX_TIMEOUT_SECONDS) -> bytes:
+    """POST a synthesis request to one endpoint and decode its audio."""
+    session = await get_session()
+    async with session.post(
+        url,
+        headers=_headers(config),
+        data=request_body,
+        timeout=aiohttp.ClientTimeout(total=timeout)
+    ) as response:
+        _check_rate_limited(response.status)
+        response.raise_for_status()
+        response_data = await response.json(content_type=None)
+    try:
+        audio = await decode_audio(response_data, timeout)
+    except MiniMaxError as e:
+        _check_rate_limited(status_code=e.status_code)
+        raise
+    _validate_audio(audio)
+    return audio
+
+
+def is_endpoint_failure(error: BaseException) -> bool:
+    """
+    Whether error says the endpoint is unhealthy: a timeout, a connection
+    error, a 5xx or server-side base_resp code, or malformed audio. Only
+    these count against its circuit or are retried on the fallback; 4xx
+    answers and invalid-request codes would fail on any endpoint.
+    """
+    if isinstance(error, (asyncio.TimeoutError, aiohttp.ClientConnectionError, aiohttp.ClientPayloadError)):
+        return True
+    if isinstance(error, aiohttp.ClientResponseError):
+        return error.status >= 500
+    if isinstance(error, MiniMaxAudioError):
+        return True
+    if isinstance(error, MiniMaxError):
+        return error.status_code in SERVER_ERROR_CODES
+    return False
+
+
+def _validate_audio(audio: bytes) -> None:
+    """
+    Reject malformed MP3 before it is cached. Raised from _post_audio, the
+    error counts as a failed call, so the fallback endpoint is tried.
+    """
+    if not TTS_VALIDATE_AUDIO or DEFAULT_AUDIO_SETTING["format"] != "mp3":
+        return
+    try:
+        parse_mp3(audio)
+    except Mp3FormatError as e:
+        TTS_AUDIO_REJECTED.inc(mode="full")
+        raise MiniMaxAudioError(f"MiniMax returned malformed MP3: {e}") from e
+
+
+async def _post_hedged(request_body: bytes,
+                       config: Dict[Text, Text],
+                       priority: int = PRIORITY_LIVE,
+                       timeout: float = MINIMAX_TIMEOUT_SECONDS) -> bytes:
+    """
+    POST to the primary endpoint, hedging to the fallback endpoint when the
+    primary is slow and retrying there when it fails, within the retry budget.
+    The first request waits for the rate limiter before any circuit is
+    consulted, so a dropped request never counts against an endpoint, and
+    its token is used by whichever endpoint is called first. A hedge or
+    retry waits for its own token before its latency is timed. Errors that
+    are not endpoint failures (see is_endpoint_failure) are raised as they
+    are, without a retry. Only live requests are hedged: a batch request is
+    expected to take long, and a hedge would bill it twice.
+    """
+    urls = [config["url"]]
+    if config.get("fallback_url") and config["fallback_url"] != config["url"]:
+        urls.append(config["fallback_url"])
+    candidates = [(get_breaker(url), functools.partial(_post_audio, url, request_body, config, timeout))
+                  for url in urls]
+    hedge_delay = _hedge_delay(candidates[0][0]) if priority == PRIORITY_LIVE else None
+    await _acquire_slot(priority)
+    try:
+        return await hedged_call(candidates, hedge_delay, _get_retry_budget(),
+                                 functools.partial(_acquire_slot, priority), is_endpoint_failure)
+    except CircuitOpenError as e:
+        raise MiniMaxUnavailableError(f"MiniMax unavailable: {e}") from e
+
+
+@functools.lru_cache(maxsize=256)
+def _request_template(voice_items: Tuple[Tuple[Text, Any], ...],
+                      model: Text,
+                      group_id: Optional[Text],
+                      stream: bool) -> RequestTemplate:
+    fields: Dict[Text, Any] = {"group_id": group_id, "model": model} if group_id else {"model": model}
+    if stream:
+        fields["stream"] = True
+    fields["voice_setting"] = dict(voice_items)
+    fields["audio_setting"] = DEFAULT_AUDIO_SETTING
+    return RequestTemplate(fields)
+
+
+def _request_body(text: Text,
+                  voice_setting: Dict[Text, Any],
+                  config: Dict[Text, Text],
+                  stream: bool = False) -> bytes:
+    """Serialized t2a_v2 body; the JSON around the text is built once per voice."""
+    template = _request_template(tuple(sorted(voice_setting.items())), config["model"],
+                                 config["group_id"], stream)
+    return template.render(text)
+
+
+def backend_templates(voice_setting: Dict[Text, Any], model: Text) -> Dict[Text, Any]:
+    """
+    Request and cache-key templates for a voice, exported with the voice
+    registry. The request carries no group_id: the backend puts it in the
+    URL. Filled with the same text, they give the body this client sends and
+    its cache key.
+    """
+    request = _request_template(tuple(sorted(voice_setting.items())), model, None, False)
+    return {
+        "request": request.to_json(),
+        "cache_key": cache_key_template(voice_setting, model, DEFAULT_AUDIO_SETTING).to_json(),
+    }
+
+
+def _headers(config: Dict[Text, Text]) -> Dict[Text, Text]:
+    return {
+        "Authorization": f"Bearer {config['api_key']}",
+        "Content-Type": "application/json"
+    }
+
+
+async def _iter_sse_events(response: aiohttp.ClientResponse) -> AsyncIterator[Dict[Text, Any]]:
+    """
+    Yield parsed JSON payloads of "data:" lines from an SSE body.
+    Lines are split by hand because audio events can exceed aiohttp's
+    readline limit. Blocks are appended to one bytearray and consumed lines
+    are deleted from its front, so a long event costs time linear in its size.
+    """
+    buffer = bytearray()
+    async for block in response.content.iter_any():
+        # Only the new block can hold the next newline
+        search_from = len(buffer)
+        buffer += block
+        start = 0
+        newline = buffer.find(b"\n", search_from)
+        while newline >= 0:
+            line = bytes(buffer[start:newline]).strip()
+            if line.startswith(b"data:"):
+                yield json.loads(line[5:])
+            start = newline + 1
+            newline = buffer.find(b"\n", start)
+        del buffer[:start]
+    line = bytes(buffer).strip()
+    if line.startswith(b"data:"):
+        yield json.loads(line[5:])
+
+
+def _check_stream_chunk(frames: Optional[Mp3FrameParser], chunk: Optional[bytes]) -> None:
+    """Feed a streamed chunk to the frame parser (None: the stream ended)."""
+    if frames is None:
+        return
+    try:
+        if chunk is None:
+            frames.finish()
+        else:
+            frames.feed(chunk)
+    except Mp3FormatError as e:
+        TTS_AUDIO_REJECTED.inc(mode="stream")
+        raise MiniMaxAudioError(f"MiniMax streamed malformed MP3: {e}") from e
+
+
+async def stream_synthesize(text: Text,
+                            voice_setting: Dict[Text, Any],
+                            config: Optional[Dict[Text, Text]] = None,
+                            cache_key: Optional[Text] = None,
+                            priority: int = PRIORITY_LIVE) -> AsyncIterator[bytes]:
+    """
+    Synthesize text with MiniMax streaming output, yielding MP3 bytes as
+    each SSE chunk arrives. Cached or pre-rendered audio is yielded as a
+    single chunk; freshly streamed audio is cached once complete. The
+    request goes through the primary endpoint's circuit breaker and counts
+    towards the retry budget; raises MiniMaxUnavailableError while the
+    circuit is open.
+    """
+    config = config or load_config()
+    cache = get_tts_cache()
+    cache_key = cache_key or make_cache_key(text, voice_setting, config["model"], DEFAULT_AUDIO_SETTING)
+
+    cached = _lookup_cached(cache_key)
+    if cached is not None:
+        yield cached
+        return
+    if _single_flight.joined(cache_key):
+        # The same audio is already being synthesized in one piece; share it
+        record_cache("tts", "coalesced")
+        yield await _single_flight.do(cache_key, functools.partial(
+            _synthesize_once, text, voice_setting, config, cache_key, priority))
+        return
+
+    request_body = _request_body(text, voice_setting, config, stream=True)
+
+    decoder = IncrementalHexDecoder()
+    chunks = []
+    # Headers are checked chunk by chunk, so a bad stream stops before more of it is played
+    frames = Mp3FrameParser() if TTS_VALIDATE_AUDIO and DEFAULT_AUDIO_SETTING["format"] == "mp3" else None
+
+    # Like _post_hedged: the circuit is consulted once the token is held, and the
+    # endpoint is judged by how its first chunk arrives (there is no fallback to hedge to)
+    await _acquire_slot(priority)
+    breaker = get_breaker(config["url"])
+    if not breaker.allow():
+        raise MiniMaxUnavailableError(f"MiniMax unavailable: circuit open for {config['url']}")
+    _get_retry_budget().record_request()
+    started = time.monotonic()
+    recorded = False
+    try:
+        session = await get_session()
+        async with session.post(
+            config["url"],
+            headers=_headers(config),
+            data=request_body,
+            # No total limit: long clips stream for longer than a single request would take
+            timeout=aiohttp.ClientTimeout(total=None, sock_connect=MINIMAX_TIMEOUT_SECONDS,
+                                          sock_read=MINIMAX_TIMEOUT_SECONDS)
+        ) as response:
+            _check_rate_limited(response.status)
+            response.raise_for_status()
+            async for event in _iter_sse_events(response):
+                status_code = (event.get("base_resp") or {}).get("status_code", 0)
+                if status_code != 0:
+                    _check_rate_limited(status_code=status_code)
+                    status_msg = event["base_resp"].get("status_msg", "TTS request failed")
+                    raise MiniMaxError(f"MiniMax TTS API error ({status_code}): {status_msg}", status_code)
+
+                data = event.get("data") or {}
+                # The final event repeats the whole clip; everything was already streamed
+                if data.get("status") == STREAM_STATUS_FINAL:
+                    continue
+
+                chunk = decoder.decode(data.get("audio") or "")
+                if chunk:
+                    _check_stream_chunk(frames, chunk)
+                    chunks.append(chunk)
+                    if not recorded:
+                        breaker.record(True, time.monotonic() - started)
+                        recorded = True
+                    yield chunk
+    except BaseException as e:
+        if not recorded:
+            recorded = True
+            if isinstance(e, Exception) and is_endpoint_failure(e):
+                breaker.record(False, time.monotonic() - started)
+            else:
+                breaker.release()  # Cancelled, or the request's own error
+        raise
+    finally:
+        if not recorded:
+            breaker.release()  # Stream ended without audio
+
+    decoder.finish()
+    if not chunks:
+        raise MiniMaxError("No audio data in MiniMax stream")
+    _check_stream_chunk(frames, None)
+    cache.put(cache_key, b"".join(chunks))
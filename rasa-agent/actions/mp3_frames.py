@@ -0,0 +1,276 @@
+"""
+MPEG audio frame parser
+Walks an MP3 byte stream frame by frame without decoding any audio:
+every frame header is checked (sync, version, layer, bitrate, sample rate,
+and that the format matches the first frame), ID3v2 tags are skipped
+wherever they sit between frames and an ID3v1 tag is accepted at the end.
+The result has the exact frame count and duration and the offset of every
+frame, so a time can be mapped to the byte where a player can start.
+
+The parser is incremental (feed chunks as they arrive, then finish) and
+reads headers straight from a memoryview, so checking a whole clip costs a
+dictionary lookup per frame and no copies.
+"""
+
+import mmap
+from array import array
+from typing import Dict, NamedTuple, Optional, Text, Tuple, Union
+
+Buffer = Union[bytes, bytearray, memoryview, mmap.mmap]
+
+# Bits identifying the stream format: sync, version, layer, sample rate
+_FORMAT_MASK = 0xFFFE0C00
+
+_VERSION_1, _VERSION_2, _VERSION_2_5 = 3, 2, 0
+_LAYER_1, _LAYER_2, _LAYER_3 = 3, 2, 1
+
+# kbit/s by (version 1?, layer) and bitrate index 1-14
+_BITRATES = {
+    (True, _LAYER_1): (32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448),
+    (True, _LAYER_2): (32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384),
+    (True, _LAYER_3): (32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    (False, _LAYER_1): (32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256),
+    (False, _LAYER_2): (8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+    (False, _LAYER_3): (8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+_SAMPLE_RATES = {
+    _VERSION_1: (44100, 48000, 32000),
+    _VERSION_2: (22050, 24000, 16000),
+    _VERSION_2_5: (11025, 12000, 8000),
+}
+
+ID3V2_HEADER_SIZE = 10
+ID3V1_SIZE = 128
+# Bytes of the first frame needed to look for a Xing/Info/VBRI header
+_INFO_PROBE_SIZE = 40
+
+
+class Mp3FormatError(ValueError):
+    """Raised when the bytes are not a well-formed MPEG audio stream."""
+
+
+class FrameFormat(NamedTuple):
+    length: int
+    samples: int
+    sample_rate: int
+    bitrate: int
+
+
+def _frame_format(header: int) -> Optional[FrameFormat]:
+    """Decode the parts of a frame header that fix its size, or None if it is invalid."""
+    if header >> 21 != 0x7FF:
+        return None
+    version = (header >> 19) & 3
+    layer = (header >> 17) & 3
+    bitrate_index = (header >> 12) & 15
+    rate_index = (header >> 10) & 3
+    # Reserved version/layer/sample rate, free-format and "bad" bitrates
+    if version == 1 or layer == 0 or rate_index == 3 or bitrate_index in (0, 15):
+        return None
+
+    bitrate = _BITRATES[version == _VERSION_1, layer][bitrate_index - 1] * 1000
+    sample_rate = _SAMPLE_RATES[version][rate_index]
+    padding = (header >> 9) & 1
+    if layer == _LAYER_1:
+        return FrameFormat((12 * bitrate // sample_rate + padding) * 4, 384, sample_rate, bitrate)
+    if layer == _LAYER_3 and version != _VERSION_1:
+        return FrameFormat(72 * bitrate // sample_rate + padding, 576, sample_rate, bitrate)
+    return FrameFormat(144 * bitrate // sample_rate + padding, 1152, sample_rate, bitrate)
+
+
+# Frame formats by header >> 9 (everything above the channel mode); filled on first sight
+_formats: Dict[int, Optional[FrameFormat]] = {}
+
+
+def _info_offset(header: int) -> int:
+    """Offset of a Xing/Info header in a layer III frame: after the header and side info."""
+    mono = (header >> 6) & 3 == 3
+    if (header >> 19) & 3 == _VERSION_1:
+        return 4 + (17 if mono else 32)
+    return 4 + (9 if mono else 17)
+
+
+def id3v2_size(data: Buffer, pos: int = 0) -> int:
+    """Total size of the ID3v2 tag at pos (header, body and footer)."""
+    header = data[pos:pos + ID3V2_HEADER_SIZE]
+    if len(header) < ID3V2_HEADER_SIZE or bytes(header[:3]) != b"ID3" or header[3] == 0xFF:
+        raise Mp3FormatError(f"Malformed ID3v2 tag at byte {pos}")
+    if any(byte & 0x80 for byte in header[6:10]):
+        raise Mp3FormatError(f"ID3v2 tag at byte {pos} has an invalid size")
+    size = (header[6] << 21) | (header[7] << 14) | (header[8] << 7) | header[9]
+    footer = ID3V2_HEADER_SIZE if header[5] & 0x10 else 0
+    return ID3V2_HEADER_SIZE + size + footer
+
+
+class Mp3Info(NamedTuple):
+    sample_rate: int
+    channels: int
+    samples_per_frame: int
+    # Audio frames only; a leading Xing/Info/VBRI frame is not counted
+    frames: int
+    duration: float
+    # Average over the audio frames, bit/s
+    bitrate: int
+    audio_start: int
+    audio_end: int
+    frame_offsets: array
+
+    def seek(self, seconds: float) -> Tuple[int, float]:
+        """
+        Byte offset of the frame playing at seconds, and that frame's start
+        time. Frames are independently decodable, so playback can begin
+        there (layer III may take a frame to settle its bit reservoir).
+        """
+        frame = int(max(0.0, seconds) * self.sample_rate / self.samples_per_frame)
+        frame = min(frame, self.frames - 1)
+        return self.frame_offsets[frame], frame * self.samples_per_frame / self.sample_rate
+
+
+class Mp3FrameParser:
+    """
+    Incremental frame walker: feed() chunks as they arrive and finish() once
+    the stream ends. Raises Mp3FormatError as soon as a bad header is seen,
+    so a corrupt stream is caught at the chunk where it goes wrong.
+    """
+
+    def __init__(self):
+        self.offset = 0  # Absolute offset of the next unparsed byte
+        self._pending = b""  # Start of a header or tag split across chunks
+        self._skip = 0  # Rest of the current frame or tag still to arrive
+        self._format_bits: Optional[int] = None
+        self._first: Optional[FrameFormat] = None
+        self._channels = 0
+        self._frame_offsets = array("Q")
+        self._audio_bytes = 0
+        self._audio_end = 0
+        self._after_id3v1 = False
+
+    @property
+    def frames(self) -> int:
+        return len(self._frame_offsets)
+
+    def feed(self, chunk: Buffer) -> None:
+        view = memoryview(chunk).cast("B") if not isinstance(chunk, memoryview) else chunk
+        if self._skip:
+            step = min(self._skip, len(view))
+            self._skip -= step
+            self.offset += step
+            view = view[step:]
+        if self._pending:
+            view = memoryview(self._pending + bytes(view))
+            self._pending = b""
+        if not view:
+            return
+        if self._after_id3v1:
+            raise Mp3FormatError(f"Data after the ID3v1 tag at byte {self.offset}")
+
+        base = self.offset
+        end = len(view)
+        pos = 0
+        offsets = self._frame_offsets
+        formats = _formats
+        format_bits = self._format_bits
+        while pos + 4 <= end:
+            header = int.from_bytes(view[pos:pos + 4], "big")
+            if header >> 24 == 0xFF:
+                if format_bits is not None and header & _FORMAT_MASK == format_bits:
+                    frame = formats.get(header >> 9)
+                    if frame is None:
+                        frame = formats[header >> 9] = _frame_format(header)
+                    if frame is not None and header & 3 != 2:
+                        offsets.append(base + pos)
+                        self._audio_bytes += frame.length
+                        pos += frame.length
+                        self._audio_end = base + pos
+                        continue
+                elif format_bits is None:
+                    if end - pos < _INFO_PROBE_SIZE:
+                        break  # Wait for enough of the first frame to check for an info header
+                    pos += self._first_frame(view, pos, header)
+                    format_bits = self._format_bits
+                    continue
+                raise Mp3FormatError(self._describe(header, base + pos))
+            if header >> 8 == 0x494433:  # "ID3"
+                if end - pos < ID3V2_HEADER_SIZE:
+                    break
+                pos += id3v2_size(view, pos)
+                continue
+            if header >> 8 == 0x544147:  # "TAG"
+                self._after_id3v1 = True
+                pos += ID3V1_SIZE
+                if pos < end:
+                    raise Mp3FormatError(f"Data after the ID3v1 tag at byte {base + pos}")
+                break
+            raise Mp3FormatError(f"Lost frame sync at byte {base + pos}")
+
+        if pos > end:
+            self._skip = pos - end
+            pos = end
+        else:
+            self._pending = bytes(view[pos:])
+        self.offset = base + end - len(self._pending)
+
+    def _first_frame(self, view: memoryview, pos: int, header: int) -> int:
+        frame = _frame_format(header)
+        if frame is None or header & 3 == 2:
+            raise Mp3FormatError(self._describe(header, self.offset + pos))
+        self._format_bits = header & _FORMAT_MASK
+        self._first = frame
+        self._channels = 1 if (header >> 6) & 3 == 3 else 2
+        info = _info_offset(header)
+        tag = bytes(view[pos + info:pos + info + 4])
+        if tag not in (b"Xing", b"Info") and bytes(view[pos + 36:pos + 40]) != b"VBRI":
+            self._frame_offsets.append(self.offset + pos)
+            self._audio_bytes += frame.length
+            self._audio_end = self.offset + pos + frame.length
+        return frame.length
+
+    @staticmethod
+    def _describe(header: int, offset: int) -> Text:
+        return f"Invalid MPEG frame header {header:08x} at byte {offset}"
+
+    def finish(self) -> Mp3Info:
+        """Check the stream ended on a frame boundary and return its summary."""
+        if self._skip:
+            raise Mp3FormatError(f"Stream ends {self._skip} bytes into a frame or tag")
+        if self._pending:
+            raise Mp3FormatError(f"{len(self._pending)} trailing bytes at byte {self.offset}")
+        if not self._frame_offsets:
+            raise Mp3FormatError("No MPEG audio frames found")
+
+        first = self._first
+        frames = len(self._frame_offsets)
+        duration = frames * first.samples / first.sample_rate
+        return Mp3Info(
+            sample_rate=first.sample_rate,
+            channels=self._channels,
+            samples_per_frame=first.samples,
+            frames=frames,
+            duration=duration,
+            bitrate=round(self._audio_bytes * 8 / duration),
+            audio_start=self._frame_offsets[0],
+            audio_end=self._audio_end,
+            frame_offsets=self._frame_offsets,
+        )
+
+
+def parse_mp3(data: Buffer) -> Mp3Info:
+    """Validate a complete MP3 and index its frames. Raises Mp3FormatError."""
+    parser = Mp3FrameParser()
+    parser.feed(data)
+    return parser.finish()
+
+
+def audio_frames(data: Buffer, keep_tag: bool = False) -> bytes:
+    """
+    Cut a complete MP3 down to its audio frames so clips can be joined into
+    one stream: the Xing/Info/VBRI frame (whose frame count and duration
+    only describe this clip) and the ID3 tags go, except a leading ID3v2 tag
+    when keep_tag is set. Raises Mp3FormatError.
+    """
+    info = parse_mp3(data)
+    view = memoryview(data)
+    frames = view[info.audio_start:info.audio_end]
+    if keep_tag and bytes(view[:3]) == b"ID3":
+        return bytes(view[:id3v2_size(view)]) + frames
+    return bytes(frames)
@@ -0,0 +1,162 @@
+"""
+Pre-rendered audio for static domain responses
+Loads the manifest written by actions.presynth and memory-maps its audio files.
+Bot replies are matched back to the domain template they were rendered from,
+so the backend's TTS requests (POST /audio/tts) reuse the clips too.
+"""
+
+import json
+import logging
+import mmap
+import os
+import re
+from typing import Any, Dict, List, NamedTuple, Optional, Pattern, Text, Tuple
+
+logger = logging.getLogger(__name__)
+
+PRERENDER_DIR = os.getenv("PRERENDER_DIR", "prerendered")
+MANIFEST_FILE = "manifest.json"
+
+SLOT_PATTERN = re.compile(r"\{(\w+)\}")
+# Punctuation left dangling at the edge of a static segment once a slot is cut out
+_EDGE_PUNCTUATION = " \t\n,;:"
+_SENTENCE_END = ".!?"
+
+
+def split_template(template: Text) -> List[Dict[Text, Text]]:
+    """
+    Split a response template into static and slot segments.
+    "Thanks {name}. What's your business name?" becomes
+    [static "Thanks", slot "name", static "What's your business name?"].
+    """
+    segments = []
+    position = 0
+    for match in SLOT_PATTERN.finditer(template):
+        static = template[position:match.start()].strip(_EDGE_PUNCTUATION)
+        if position:
+            static = static.lstrip(_SENTENCE_END + _EDGE_PUNCTUATION)
+        if static:
+            segments.append({"type": "static", "text": static})
+        segments.append({"type": "slot", "name": match.group(1)})
+        position = match.end()
+
+    static = template[position:].strip(_EDGE_PUNCTUATION)
+    if position:
+        static = static.lstrip(_SENTENCE_END + _EDGE_PUNCTUATION)
+    if static:
+        segments.append({"type": "static", "text": static})
+    return segments
+
+
+def normalize_text(text: Text) -> Text:
+    return " ".join(text.split())
+
+
+def template_pattern(template: Text) -> Pattern:
+    """
+    Regex that matches the text a template renders to, capturing each slot
+    value ("Thanks {name}." matches "Thanks Ada." with name "Ada").
+    Whitespace is compared collapsed, as normalize_text leaves it.
+    """
+    parts = []
+    seen = set()
+    position = 0
+    template = normalize_text(template)
+    for match in SLOT_PATTERN.finditer(template):
+        parts.append(re.escape(template[position:match.start()]))
+        name = match.group(1)
+        # A slot used twice must render the same value both times
+        parts.append(f"(?P={name})" if name in seen else f"(?P<{name}>.+?)")
+        seen.add(name)
+        position = match.end()
+    parts.append(re.escape(template[position:]))
+    return re.compile("".join(parts), re.DOTALL)
+
+
+class ResponseMatch(NamedTuple):
+    response: Text
+    variation: int
+    slots: Dict[Text, Text]
+
+
+class PrerenderedAudio:
+    """
+    Read-only view over a pre-render output directory.
+    Audio files are memory-mapped once, so lookups are zero-copy and the
+    pages are shared between processes serving the same directory.
+    """
+
+    def __init__(self, directory: Text = PRERENDER_DIR):
+        self.directory = directory
+        self.manifest: Dict[Text, Any] = {}
+        self._clips: Dict[Text, mmap.mmap] = {}
+        self._exact: Dict[Text, Tuple[Text, int]] = {}
+        self._patterns: List[Tuple[Pattern, Text, int]] = []
+
+        manifest_path = os.path.join(directory, MANIFEST_FILE)
+        if not os.path.exists(manifest_path):
+            return
+
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            self.manifest = json.load(f)
+
+        for key, filename in self.manifest.get("clips", {}).items():
+            path = os.path.join(directory, filename)
+            try:
+                with open(path, "rb") as f:
+                    self._clips[key] = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except (OSError, ValueError) as e:
+                logger.warning("Skipping pre-rendered clip %s: %s", filename, str(e))
+
+        self._index_templates(self.manifest.get("templates", {}))
+        logger.info("Loaded %d pre-rendered clips from %s", len(self._clips), directory)
+
+    def _index_templates(self, templates: Dict[Text, List[Text]]) -> None:
+        slotted = []
+        for response, variations in templates.items():
+            for variation, template in enumerate(variations):
+                if SLOT_PATTERN.search(template):
+                    slotted.append((template, response, variation))
+                else:
+                    self._exact.setdefault(normalize_text(template), (response, variation))
+        # The template with the most literal text wins when several match
+        slotted.sort(key=lambda entry: -len(SLOT_PATTERN.sub("", entry[0])))
+        self._patterns = [(template_pattern(template), response, variation)
+                          for template, response, variation in slotted]
+
+    def __len__(self) -> int:
+        return len(self._clips)
+
+    def get(self, key: Text) -> Optional[memoryview]:
+        """Return the clip for a TTS cache key, or None if it was not pre-rendered."""
+        clip = self._clips.get(key)
+        return memoryview(clip) if clip is not None else None
+
+    def segments(self, response: Text, voice: Text, variation: int = 0) -> Optional[List[Dict[Text, Text]]]:
+        """Return the rendered segments for a response/voice pair from the manifest."""
+        variations = self.manifest.get("responses", {}).get(response, {}).get(voice)
+        if not variations or variation >= len(variations):
+            return None
+        return variations[variation]
+
+    def match(self, text: Text) -> Optional[ResponseMatch]:
+        """Find the domain response and slot values a bot reply was rendered from."""
+        text = normalize_text(text)
+        if text in self._exact:
+            return ResponseMatch(*self._exact[text], {})
+        for pattern, response, variation in self._patterns:
+            found = pattern.fullmatch(text)
+            if found:
+                return ResponseMatch(response, variation, found.groupdict())
+        return None
+
+
+_prerendered: Optional[PrerenderedAudio] = None
+
+
+def get_prerendered() -> PrerenderedAudio:
+    """Return the process-wide pre-rendered audio store."""
+    global _prerendered
+    if _prerendered is None:
+        _prerendered = PrerenderedAudio()
+    return _prerendered
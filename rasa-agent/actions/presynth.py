@@ -0,0 +1,197 @@
+"""
+Offline pre-synthesis of static domain responses
+
+Renders every utter_* template in domain.yml (plus Marcy's closing line) for
+every configured voice, writing one MP3 per unique clip and a manifest the
+action server memory-maps at startup. Slot templates are split so only the
+slot value has to be synthesized live. The manifest keeps the templates, so
+the backend's replies (POST /audio/tts on the audio server) are matched back
+to them and voiced from the clips as well.
+
+Usage:
+    python -m actions.presynth --domain domain.yml --output prerendered
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+from typing import Any, Dict, List, Optional, Text
+
+import yaml
+
+from .http_client import close_session
+from .minimax import DEFAULT_AUDIO_SETTING, load_config, synthesize
+from .mp3_frames import Mp3FormatError, audio_frames
+from .prerendered import MANIFEST_FILE, PRERENDER_DIR, get_prerendered, split_template
+from .response_formatter import get_marcy_closing
+from .scheduler import PRIORITY_BATCH, PRIORITY_LIVE
+from .voices import VOICE_SETTINGS
+
+logger = logging.getLogger(__name__)
+
+PRERENDER_CONCURRENCY = int(os.getenv("PRERENDER_CONCURRENCY", "4"))
+# Voices static responses are spoken with: the actions' and the backend's default
+PRERENDER_VOICES = [v.strip() for v in os.getenv("PRERENDER_VOICES", "soft,calm,odia").split(",") if v.strip()]
+CLOSING_RESPONSE = "marcy_closing"
+
+
+def load_static_responses(domain_path: Text) -> Dict[Text, List[Text]]:
+    """Return every text response variation in the domain, keyed by response name."""
+    with open(domain_path, "r", encoding="utf-8") as f:
+        domain = yaml.safe_load(f) or {}
+
+    responses = {}
+    for name, variations in (domain.get("responses") or {}).items():
+        texts = [v["text"] for v in variations or [] if isinstance(v, dict) and v.get("text")]
+        if texts:
+            responses[name] = texts
+
+    responses[CLOSING_RESPONSE] = [get_marcy_closing()]
+    return responses
+
+
+async def prerender(domain_path: Text,
+                    output_dir: Text,
+                    voices: Optional[List[Text]] = None,
+                    concurrency: int = PRERENDER_CONCURRENCY) -> Dict[Text, Any]:
+    """
+    Synthesize all static segments with a bounded worker pool and write
+    the audio files plus manifest.json to output_dir.
+    """
+    config = load_config()
+    voices = voices or PRERENDER_VOICES
+    responses = load_static_responses(domain_path)
+    os.makedirs(output_dir, exist_ok=True)
+
+    manifest = {
+        "version": 2,
+        "model": config["model"],
+        "audio_setting": DEFAULT_AUDIO_SETTING,
+        "voices": {voice: dict(VOICE_SETTINGS[voice]) for voice in voices},
+        "templates": responses,
+        "responses": {},
+        "clips": {}
+    }
+
+    # Collect unique (text, voice) jobs; shared segments are rendered once
+    jobs: Dict[tuple, List[Dict[Text, Text]]] = {}
+    for name, variations in responses.items():
+        manifest["responses"][name] = {}
+        for voice in voices:
+            rendered = []
+            for template in variations:
+                segments = split_template(template)
+                for segment in segments:
+                    if segment["type"] == "static":
+                        jobs.setdefault((segment["text"], voice), []).append(segment)
+                rendered.append(segments)
+            manifest["responses"][name][voice] = rendered
+
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    failures = 0
+
+    async def render(text: Text, voice: Text) -> None:
+        nonlocal failures
+        async with semaphore:
+            try:
+                result = await synthesize(text, VOICE_SETTINGS[voice], config, priority=PRIORITY_BATCH)
+            except Exception as e:
+                failures += 1
+                logger.error("Failed to pre-render %r (%s): %s", text[:50], voice, str(e))
+                return
+
+        # Clips are content-addressed, so an existing file already holds this audio
+        filename = f"{result.cache_key}.mp3"
+        path = os.path.join(output_dir, filename)
+        if not os.path.exists(path):
+            with open(path, "wb") as f:
+                f.write(result.audio)
+
+        manifest["clips"][result.cache_key] = filename
+        for segment in jobs[(text, voice)]:
+            segment["key"] = result.cache_key
+
+    await asyncio.gather(*(render(text, voice) for text, voice in jobs))
+
+    with open(os.path.join(output_dir, MANIFEST_FILE), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+
+    logger.info("Pre-rendered %d clips for %d responses (%d failed)",
+                len(manifest["clips"]), len(responses), failures)
+    return manifest
+
+
+async def synthesize_response(response: Text,
+                              voice: Text,
+                              slots: Dict[Text, Any],
+                              variation: int = 0,
+                              priority: int = PRIORITY_LIVE) -> Optional[bytes]:
+    """
+    Assemble audio for a domain response from pre-rendered static segments,
+    synthesizing only the slot values live. Returns None if the response was
+    not pre-rendered for this voice.
+    """
+    prerendered = get_prerendered()
+    segments = prerendered.segments(response, voice, variation)
+    if segments is None:
+        return None
+
+    parts = []
+    for segment in segments:
+        if segment["type"] == "slot":
+            value = slots.get(segment["name"])
+            if value:
+                result = await synthesize(str(value), VOICE_SETTINGS[voice], priority=priority)
+                parts.append(result.audio)
+            continue
+
+        clip = prerendered.get(segment.get("key", ""))
+        if clip is None:
+            result = await synthesize(segment["text"], VOICE_SETTINGS[voice], priority=priority)
+            clip = result.audio
+        parts.append(clip)
+
+    # Each part is a whole MP3; keep only the first one's tag so they join into one stream
+    try:
+        return b"".join(audio_frames(part, keep_tag=index == 0) for index, part in enumerate(parts))
+    except Mp3FormatError as e:
+        logger.warning("Segments of %s are not clean MP3, joining them as is: %s", response, str(e))
+        return b"".join(parts)
+
+
+async def synthesize_reply(text: Text, voice: Text, priority: int = PRIORITY_LIVE) -> Optional[bytes]:
+    """
+    Voice a rendered bot reply from the clips of the domain response it came
+    from. Returns None if it matches no pre-rendered response for this voice.
+    """
+    match = get_prerendered().match(text)
+    if match is None:
+        return None
+    return await synthesize_response(match.response, voice, match.slots, match.variation, priority)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Pre-render static domain responses with MiniMax TTS")
+    parser.add_argument("--domain", default="domain.yml", help="Path to the Rasa domain file")
+    parser.add_argument("--output", default=PRERENDER_DIR, help="Directory for audio files and manifest")
+    parser.add_argument("--voice", action="append", choices=sorted(VOICE_SETTINGS),
+                        help="Voice profile to render (repeatable, default: PRERENDER_VOICES)")
+    parser.add_argument("--concurrency", type=int, default=PRERENDER_CONCURRENCY,
+                        help="Maximum concurrent synthesis requests")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    async def run() -> None:
+        try:
+            await prerender(args.domain, args.output, args.voice, args.concurrency)
+        finally:
+            await close_session()
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
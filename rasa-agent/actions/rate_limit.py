@@ -0,0 +1,27 @@
+"""
+Fixed-rate pacing of request starts
+Used by the batch TTS script and the load-test runner, which both need an
+even request rate across many concurrent workers within one process.
+"""
+
+import asyncio
+import time
+
+
+class RateLimiter:
+    """Spaces request starts evenly at a fixed rate across all workers."""
+
+    def __init__(self, rate_per_second: float):
+        self.interval = 1.0 / rate_per_second if rate_per_second > 0 else 0.0
+        self._next_slot = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        if not self.interval:
+            return
+        async with self._lock:
+            now = time.monotonic()
+            wait = self._next_slot - now
+            self._next_slot = max(now, self._next_slot) + self.interval
+        if wait > 0:
+            await asyncio.sleep(wait)
@@ -0,0 +1,249 @@
+"""
+Circuit breakers, retry budgets and hedged requests for upstream calls
+
+Each upstream endpoint gets a CircuitBreaker that watches its recent error
+rate and latency. hedged_call sends a request to the preferred endpoint and,
+if no answer has arrived by the hedge delay (the endpoint's recent p95),
+sends a second one to the next endpoint and takes whichever answers first.
+Hedges and retries come out of a shared RetryBudget, so a struggling
+provider sees a bounded fraction of extra load rather than doubled traffic.
+"""
+
+import asyncio
+import logging
+import math
+import os
+import time
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, List, Optional, Sequence, Text, Tuple, TypeVar
+
+from .shared_state import SharedCounters
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+CIRCUIT_WINDOW_SECONDS = float(os.getenv("CIRCUIT_WINDOW_SECONDS", "60"))
+CIRCUIT_MIN_CALLS = int(os.getenv("CIRCUIT_MIN_CALLS", "10"))
+# Open when this share of recent calls failed or were slower than CIRCUIT_SLOW_CALL_SECONDS
+CIRCUIT_FAILURE_RATE = float(os.getenv("CIRCUIT_FAILURE_RATE", "0.5"))
+CIRCUIT_SLOW_CALL_SECONDS = float(os.getenv("CIRCUIT_SLOW_CALL_SECONDS", "8"))
+CIRCUIT_OPEN_SECONDS = float(os.getenv("CIRCUIT_OPEN_SECONDS", "30"))
+# Hedges and retries allowed per request, plus a floor for quiet periods
+RETRY_BUDGET_RATIO = float(os.getenv("RETRY_BUDGET_RATIO", "0.2"))
+RETRY_BUDGET_MIN_PER_SECOND = float(os.getenv("RETRY_BUDGET_MIN_PER_SECOND", "0.5"))
+RETRY_BUDGET_WINDOW_SECONDS = float(os.getenv("RETRY_BUDGET_WINDOW_SECONDS", "10"))
+
+BUDGET_REQUESTS = "retry_budget.requests"
+BUDGET_RETRIES = "retry_budget.retries"
+
+
+class CircuitOpenError(Exception):
+    """Raised when every endpoint's circuit is open."""
+
+
+class CircuitBreaker:
+    """
+    Rolling-window breaker for one endpoint. Closed lets everything through;
+    open rejects calls until open_seconds have passed; half-open then lets
+    a single probe through, whose outcome closes or re-opens the circuit.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self,
+                 name: Text,
+                 window_seconds: float = CIRCUIT_WINDOW_SECONDS,
+                 min_calls: int = CIRCUIT_MIN_CALLS,
+                 failure_rate: float = CIRCUIT_FAILURE_RATE,
+                 slow_call_seconds: float = CIRCUIT_SLOW_CALL_SECONDS,
+                 open_seconds: float = CIRCUIT_OPEN_SECONDS):
+        self.name = name
+        self.window_seconds = window_seconds
+        self.min_calls = max(1, min_calls)
+        self.failure_rate = failure_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.open_seconds = open_seconds
+        self.state = self.CLOSED
+        # (finished at, succeeded, latency seconds)
+        self._calls: Deque[Tuple[float, bool, float]] = deque()
+        self._opened_at = 0.0
+        self._probing = False
+
+    def allow(self) -> bool:
+        """Whether a call may be sent now; in half-open this claims the probe."""
+        if self.state == self.OPEN:
+            if time.monotonic() - self._opened_at < self.open_seconds:
+                return False
+            self.state = self.HALF_OPEN
+            self._probing = False
+        if self.state == self.HALF_OPEN:
+            if self._probing:
+                return False
+            self._probing = True
+        return True
+
+    def record(self, succeeded: bool, latency: float) -> None:
+        now = time.monotonic()
+        self._calls.append((now, succeeded, latency))
+        self._trim(now)
+
+        if self.state == self.HALF_OPEN:
+            self._probing = False
+            if succeeded and latency < self.slow_call_seconds:
+                logger.info("Circuit %s closed", self.name)
+                self.state = self.CLOSED
+                self._calls.clear()
+            else:
+                self._open(now)
+        elif self.state == self.CLOSED and len(self._calls) >= self.min_calls:
+            bad = sum(1 for _, ok, took in self._calls if not ok or took >= self.slow_call_seconds)
+            if bad >= self.failure_rate * len(self._calls):
+                self._open(now)
+
+    def release(self) -> None:
+        """Give back a claimed probe whose call was abandoned (e.g. cancelled)."""
+        if self.state == self.HALF_OPEN:
+            self._probing = False
+
+    def latency_percentile(self, percentile: float) -> Optional[float]:
+        """Latency of recent successful calls at percentile, or None with too few samples."""
+        self._trim(time.monotonic())
+        latencies = sorted(took for _, ok, took in self._calls if ok)
+        if len(latencies) < self.min_calls:
+            return None
+        index = min(len(latencies) - 1, math.ceil(percentile / 100.0 * len(latencies)) - 1)
+        return latencies[max(0, index)]
+
+    def _open(self, now: float) -> None:
+        if self.state != self.OPEN:
+            logger.warning("Circuit %s opened for %.0fs", self.name, self.open_seconds)
+        self.state = self.OPEN
+        self._opened_at = now
+
+    def _trim(self, now: float) -> None:
+        while self._calls and now - self._calls[0][0] > self.window_seconds:
+            self._calls.popleft()
+
+
+class RetryBudget:
+    """
+    Caps hedges and retries at ratio of the recent requests, plus
+    min_per_second so occasional traffic can still retry. Requests and
+    retries are counted with exponential decay over window_seconds in
+    SharedCounters, so action server workers share one budget.
+    """
+
+    def __init__(self,
+                 ratio: float = RETRY_BUDGET_RATIO,
+                 min_per_second: float = RETRY_BUDGET_MIN_PER_SECOND,
+                 window_seconds: float = RETRY_BUDGET_WINDOW_SECONDS,
+                 counters: Optional[SharedCounters] = None):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.window_seconds = window_seconds
+        self._counters = counters or SharedCounters()
+
+    def record_request(self) -> None:
+        self._counters.decayed(BUDGET_REQUESTS, self.window_seconds, 1.0)
+
+    def try_spend(self) -> bool:
+        with self._counters.locked():
+            requests = self._counters.decayed(BUDGET_REQUESTS, self.window_seconds)
+            retries = self._counters.decayed(BUDGET_RETRIES, self.window_seconds)
+            allowed = self.min_per_second * self.window_seconds + self.ratio * requests
+            if retries >= allowed:
+                return False
+            self._counters.decayed(BUDGET_RETRIES, self.window_seconds, 1.0)
+            return True
+
+
+async def hedged_call(candidates: Sequence[Tuple[CircuitBreaker, Callable[[], Awaitable[T]]]],
+                      hedge_delay: Optional[float],
+                      budget: RetryBudget,
+                      acquire: Optional[Callable[[], Awaitable[None]]] = None,
+                      is_failure: Callable[[BaseException], bool] = lambda error: True) -> T:
+    """
+    Call the first candidate whose circuit allows it. If it has not answered
+    within hedge_delay (None disables hedging), or fails, the next allowed
+    candidate is called too, budget permitting. The first success wins; the
+    other call is cancelled and, if it was sent first, counted as a failure
+    so a consistently slow endpoint trips its circuit. Raises the last error
+    if every call fails, or CircuitOpenError if no circuit allowed a call.
+
+    acquire, if given, is awaited before every call but the first (whose
+    rate-limit token the caller already holds). An endpoint's latency is
+    timed from when its call is sent, so waiting for a token never counts
+    against it, and a call that fails to get one is not recorded at all.
+
+    is_failure tells endpoint faults (timeouts, 5xx) from errors that are
+    the request's own (e.g. invalid parameters). The latter are raised at
+    once, without a retry, and are not recorded against the endpoint.
+    """
+    remaining = list(candidates)
+    # Task -> (breaker, [time the call was sent, or None while it waits for a token])
+    pending: Dict[asyncio.Task, Tuple[CircuitBreaker, List[Optional[float]]]] = {}
+    errors: List[BaseException] = []
+    hedged = False
+
+    async def send(call: Callable[[], Awaitable[T]], sent: List[Optional[float]], wait: bool) -> T:
+        if wait:
+            await acquire()
+        sent[0] = time.monotonic()
+        return await call()
+
+    def launch_next() -> bool:
+        while remaining:
+            breaker, call = remaining.pop(0)
+            if breaker.allow():
+                sent: List[Optional[float]] = [None]
+                wait = acquire is not None and bool(pending or errors)
+                pending[asyncio.ensure_future(send(call, sent, wait))] = (breaker, sent)
+                return True
+        return False
+
+    budget.record_request()
+    if not launch_next():
+        raise CircuitOpenError("All circuits open: " + ", ".join(b.name for b, _ in candidates))
+
+    try:
+        while pending:
+            timeout = hedge_delay if not hedged and remaining else None
+            done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                hedged = True
+                if budget.try_spend() and launch_next():
+                    logger.info("Hedging slow request after %.2fs", hedge_delay)
+                continue
+
+            for task in done:
+                breaker, (started,) = pending.pop(task)
+                error = task.exception()
+                if started is None:
+                    breaker.release()  # Never sent: no token
+                elif error is not None and not is_failure(error):
+                    breaker.release()
+                    raise error  # Every endpoint would reject the same request
+                else:
+                    breaker.record(error is None, time.monotonic() - started)
+                if error is None:
+                    # Calls this one overtook count against their endpoint as too slow
+                    for loser, (loser_breaker, (loser_started,)) in pending.items():
+                        if loser_started is not None and loser_started < started:
+                            loser_breaker.record(False, time.monotonic() - loser_started)
+                    return task.result()
+                errors.append(error)
+
+            # Everything in flight failed: retry on the next endpoint if affordable
+            if not pending and remaining and budget.try_spend():
+                launch_next()
+    finally:
+        for task, (breaker, _) in pending.items():
+            task.cancel()
+            breaker.release()
+
+    if errors:
+        raise errors[-1]
+    raise CircuitOpenError("All circuits open: " + ", ".join(b.name for b, _ in candidates))
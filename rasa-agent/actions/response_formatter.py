@@ -3,43 +3,77 @@ Response formatter for Marcy personality
 Ensures responses are warm, professional, and max 25 words
 """
 
-def format_marcy_response(text: str, max_words: int = 25) -> str:
+from typing import Iterable, List, NamedTuple
+
+MAX_WORDS = 25
+FALLBACK_RESPONSE = "I'm sorry, could you repeat that?"
+FALLBACK_WORDS = len(FALLBACK_RESPONSE.split())
+
+_SENTENCE_END = ".!?"
+
+
+class FormattedResponse(NamedTuple):
+    """A formatted response with the counts used for TTS cost estimates."""
+    text: str
+    words: int
+    characters: int  # MiniMax bills TTS per character
+
+
+def _truncate(words: List[str], max_words: int) -> str:
+    """
+    Join the first max_words words, cut back to the last complete sentence,
+    or failing that drop the word the limit cut through.
+    """
+    # Words are joined by single spaces, so the string searches below stand
+    # in for per-word loops
+    text = " ".join(words[:max_words])
+    if text[-1] not in _SENTENCE_END:
+        cut = max(text.rfind(". "), text.rfind("! "), text.rfind("? "))
+        if cut < 0:
+            cut = text.rfind(" ")
+            cut = len(text) if cut < 0 else cut
+            text = text[:cut] + "."
+        else:
+            text = text[:cut + 1]
+    return text[0].upper() + text[1:]
+
+
+def format_marcy_response(text: str, max_words: int = MAX_WORDS) -> str:
     """
     Format response to match Marcy's personality:
     - Warm, professional, efficient
-    - Max 25 words
+    - Max 25 words, cut at the last full sentence that fits
     - Clear English only
     """
-    if not text:
-        return "I'm sorry, could you repeat that?"
-    
-    # Count words
-    words = text.split()
-    
-    # Truncate if too long
-    if len(words) > max_words:
-        # Try to find a natural break point
-        truncated = words[:max_words]
-        # Remove incomplete sentences
-        if truncated[-1][-1] not in '.!?':
-            # Remove last word if it doesn't end sentence
-            truncated = truncated[:-1]
-        text = ' '.join(truncated)
-        # Ensure it ends with punctuation
-        if text[-1] not in '.!?':
-            text += '.'
-    
-    # Ensure professional tone
-    text = text.strip()
-    
-    # Capitalize first letter
-    if text:
-        text = text[0].upper() + text[1:]
-    
-    return text
+    # Splitting stops after max_words words, so a monologue is not split in full
+    words = text.split(None, max_words) if text and max_words > 0 else None
+    if not words:
+        return FALLBACK_RESPONSE
+    if len(words) <= max_words:
+        text = text.strip()
+        return text[0].upper() + text[1:]
+    return _truncate(words, max_words)
+
+
+def format_marcy_responses(texts: Iterable[str], max_words: int = MAX_WORDS) -> List[FormattedResponse]:
+    """Format a batch of responses, returning each with its word and character counts."""
+    results = []
+    for text in texts:
+        words = text.split(None, max_words) if text and max_words > 0 else None
+        if not words:
+            results.append(FormattedResponse(FALLBACK_RESPONSE, FALLBACK_WORDS, len(FALLBACK_RESPONSE)))
+            continue
+        if len(words) <= max_words:
+            text = text.strip()
+            text = text[0].upper() + text[1:]
+            count = len(words)
+        else:
+            text = _truncate(words, max_words)
+            count = text.count(" ") + 1
+        results.append(FormattedResponse(text, count, len(text)))
+    return results
 
 
 def get_marcy_closing() -> str:
     """Return Marcy's standard closing line."""
     return "Thank you for calling CallWaitingAI. Have a wonderful day."
-
@@ -0,0 +1,150 @@
+"""
+Keyword routing for canned TTS responses
+
+Routes from tts_routes.yml are compiled into a single case-insensitive regex,
+so matching an utterance is one pass over the text however many routes are
+configured. The file is re-read when its modification time changes.
+"""
+
+import logging
+import os
+import re
+import threading
+import time
+from typing import Any, Dict, List, Mapping, NamedTuple, Optional, Pattern, Text
+
+import yaml
+
+from .minimax import DEFAULT_AUDIO_SETTING, DEFAULT_MODEL
+from .tts_cache import make_cache_key
+from .voices import DEFAULT_VOICE, VOICE_SETTINGS, VOICES
+
+logger = logging.getLogger(__name__)
+
+TTS_ROUTES_PATH = os.getenv("TTS_ROUTES_PATH", "tts_routes.yml")
+# How often the routes file is checked for changes
+TTS_ROUTES_RELOAD_SECONDS = float(os.getenv("TTS_ROUTES_RELOAD_SECONDS", "5"))
+
+
+class Route(NamedTuple):
+    """What to say and how: the text, its voice profile and its TTS cache key."""
+    name: Text
+    text: Text
+    voice: Text
+    voice_setting: Mapping[Text, Any]
+    cache_key: Optional[Text]
+
+
+class RoutingTable:
+    """Compiled routes; immutable once built, replaced wholesale on reload."""
+
+    def __init__(self, routes: List[Route], pattern: Optional[Pattern], default_voice: Text):
+        self.routes = routes
+        self.pattern = pattern
+        self.default_voice = default_voice
+
+    @classmethod
+    def from_config(cls, config: Dict[Text, Any]) -> "RoutingTable":
+        """Validate a parsed routes file and compile its triggers."""
+        model = os.getenv("MINIMAX_MODEL", DEFAULT_MODEL)
+        default_voice = config.get("default_voice") or DEFAULT_VOICE
+        if default_voice not in VOICES:
+            raise ValueError(f"Unknown default_voice: {default_voice}")
+        default_voice = VOICES[default_voice].name
+
+        routes: List[Route] = []
+        alternatives: List[Text] = []
+        for index, entry in enumerate(config.get("routes") or []):
+            name = entry.get("name") or f"route_{index}"
+            voice = entry.get("voice") or default_voice
+            if voice not in VOICES:
+                raise ValueError(f"Route {name}: unknown voice {voice}")
+            voice = VOICES[voice].name
+            triggers = [str(trigger).strip() for trigger in entry.get("triggers") or [] if str(trigger).strip()]
+            if not triggers:
+                raise ValueError(f"Route {name}: no triggers")
+            text = (entry.get("text") or "").strip()
+            if not text:
+                raise ValueError(f"Route {name}: no text")
+
+            voice_setting = VOICE_SETTINGS[voice]
+            cache_key = make_cache_key(text, voice_setting, model, DEFAULT_AUDIO_SETTING)
+            routes.append(Route(name, text, voice, voice_setting, cache_key))
+
+            # Longest phrase first so "true love" wins over "love" at the same position
+            phrases = "|".join(re.escape(trigger) for trigger in sorted(triggers, key=len, reverse=True))
+            alternatives.append(f"(?P<r{index}>{phrases})")
+
+        pattern = re.compile("|".join(alternatives), re.IGNORECASE) if alternatives else None
+        return cls(routes, pattern, default_voice)
+
+    def match(self, utterance: Text) -> Optional[Route]:
+        """Return the route whose trigger appears first in the utterance, if any."""
+        if self.pattern is None:
+            return None
+        found = self.pattern.search(utterance)
+        if found is None:
+            return None
+        return self.routes[int(found.lastgroup[1:])]
+
+    def resolve(self, utterance: Text) -> Route:
+        """Return the matching route, or the utterance itself in the default voice."""
+        route = self.match(utterance)
+        if route is not None:
+            return route
+        return Route("default", utterance, self.default_voice, VOICE_SETTINGS[self.default_voice], None)
+
+
+class RouteLoader:
+    """Serves the current RoutingTable, recompiling it when the file changes."""
+
+    def __init__(self, path: Text = TTS_ROUTES_PATH, reload_seconds: float = TTS_ROUTES_RELOAD_SECONDS):
+        self.path = path
+        self.reload_seconds = reload_seconds
+        self.table = RoutingTable([], None, DEFAULT_VOICE)
+        self._mtime: Optional[float] = None
+        self._lock = threading.Lock()
+        self._reload()
+        self._checked_at = time.monotonic()
+
+    def _reload(self) -> None:
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            if self._mtime is None:
+                logger.warning("TTS routes file %s not found, speaking utterances as-is", self.path)
+            self._mtime = -1.0
+            return
+        if mtime == self._mtime:
+            return
+
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                table = RoutingTable.from_config(yaml.safe_load(f) or {})
+        except (OSError, ValueError, yaml.YAMLError) as e:
+            # Keep serving the last good table rather than dropping every route
+            logger.error("Invalid TTS routes file %s, keeping previous routes: %s", self.path, str(e))
+        else:
+            self.table = table
+            logger.info("Loaded %d TTS routes from %s", len(table.routes), self.path)
+        self._mtime = mtime
+
+    def get(self) -> RoutingTable:
+        now = time.monotonic()
+        if now - self._checked_at >= self.reload_seconds:
+            with self._lock:
+                if now - self._checked_at >= self.reload_seconds:
+                    self._checked_at = now
+                    self._reload()
+        return self.table
+
+
+_loader: Optional[RouteLoader] = None
+
+
+def get_routes() -> RoutingTable:
+    """Return the current routing table, loading tts_routes.yml on first use."""
+    global _loader
+    if _loader is None:
+        _loader = RouteLoader()
+    return _loader.get()
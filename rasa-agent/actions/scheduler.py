@@ -0,0 +1,198 @@
+"""
+Rate limiting and prioritisation of MiniMax requests
+
+MiniMax limits requests per account, so every Python caller (live actions,
+pre-rendering and batch scripts) takes a token from one bucket kept in the
+shared state file before each request. Within a process, callers queue by
+priority class: a live call is granted the next token ahead of any batch
+request. Across processes, batch requests may not drain the bucket below
+a reserve kept for live calls, so a batch job running next to the action
+server cannot starve it.
+
+Requests that could not be granted before their deadline are dropped
+instead of queued, and each class has a queue-depth limit.
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+
+from .metrics import SCHEDULER_REQUESTS, SCHEDULER_WAIT
+from .shared_state import SharedCounters, get_shared_state
+
+logger = logging.getLogger(__name__)
+
+# Account-wide request rate, and how many requests may go out back to back
+MINIMAX_RATE_PER_SECOND = float(os.getenv("MINIMAX_RATE_PER_SECOND", "5"))
+MINIMAX_BURST = float(os.getenv("MINIMAX_BURST", "10"))
+# Share of the burst that only live calls may use
+MINIMAX_LIVE_RESERVE = float(os.getenv("MINIMAX_LIVE_RESERVE", "0.5"))
+# How long a request may wait for a token before it is dropped (0 = no deadline)
+MINIMAX_LIVE_DEADLINE_SECONDS = float(os.getenv("MINIMAX_LIVE_DEADLINE_SECONDS", "3"))
+MINIMAX_BATCH_DEADLINE_SECONDS = float(os.getenv("MINIMAX_BATCH_DEADLINE_SECONDS", "0"))
+# Requests waiting per class in this process before new ones are dropped
+MINIMAX_QUEUE_LIMIT_LIVE = int(os.getenv("MINIMAX_QUEUE_LIMIT_LIVE", "100"))
+MINIMAX_QUEUE_LIMIT_BATCH = int(os.getenv("MINIMAX_QUEUE_LIMIT_BATCH", "50"))
+
+# Priority classes, most urgent first
+PRIORITY_LIVE = 0
+PRIORITY_BATCH = 1
+PRIORITY_NAMES = {PRIORITY_LIVE: "live", PRIORITY_BATCH: "batch"}
+
+BUCKET_TOKENS = "minimax.tokens"
+
+
+class RequestDropped(Exception):
+    """Raised when a request is refused a token (queue full or deadline missed)."""
+
+
+class TokenBucket:
+    """Token bucket whose level lives in SharedCounters, so every process draws from it."""
+
+    def __init__(self,
+                 rate: float = MINIMAX_RATE_PER_SECOND,
+                 burst: float = MINIMAX_BURST,
+                 counters: Optional[SharedCounters] = None):
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self._counters = counters or SharedCounters()
+
+    def try_take(self, floor: float = 0.0) -> float:
+        """
+        Take a token if that leaves at least floor tokens. Returns 0 on
+        success, otherwise the seconds until enough tokens have refilled.
+        """
+        if self.rate <= 0:
+            return 0.0
+        with self._counters.locked():
+            now = time.monotonic()
+            elapsed = max(0.0, now - self._counters.get(BUCKET_TOKENS + "@"))
+            tokens = min(self.burst, self._counters.get(BUCKET_TOKENS) + elapsed * self.rate)
+            taken = tokens - 1 >= floor
+            if taken:
+                tokens -= 1
+            self._counters.set(BUCKET_TOKENS, tokens)
+            self._counters.set(BUCKET_TOKENS + "@", now)
+        return 0.0 if taken else (floor + 1 - tokens) / self.rate
+
+    def drain(self) -> None:
+        """Empty the bucket, e.g. after MiniMax answered with a rate-limit error."""
+        with self._counters.locked():
+            self._counters.set(BUCKET_TOKENS, 0.0)
+            self._counters.set(BUCKET_TOKENS + "@", time.monotonic())
+
+
+class RequestScheduler:
+    """
+    Grants bucket tokens to waiting requests in (priority, arrival) order.
+    A dispatcher task runs while requests are waiting; when the bucket is
+    empty it sleeps until the next token is due or a more urgent request
+    arrives.
+    """
+
+    def __init__(self,
+                 bucket: TokenBucket,
+                 live_reserve: float = MINIMAX_LIVE_RESERVE,
+                 deadlines: Optional[Dict[int, float]] = None,
+                 queue_limits: Optional[Dict[int, int]] = None):
+        self.bucket = bucket
+        reserve = max(0.0, min(1.0, live_reserve)) * bucket.burst
+        self.floors = {PRIORITY_LIVE: 0.0, PRIORITY_BATCH: reserve}
+        self.deadlines = deadlines or {
+            PRIORITY_LIVE: MINIMAX_LIVE_DEADLINE_SECONDS,
+            PRIORITY_BATCH: MINIMAX_BATCH_DEADLINE_SECONDS,
+        }
+        self.queue_limits = queue_limits or {
+            PRIORITY_LIVE: MINIMAX_QUEUE_LIMIT_LIVE,
+            PRIORITY_BATCH: MINIMAX_QUEUE_LIMIT_BATCH,
+        }
+        self._waiting: List[Tuple[int, int, asyncio.Future]] = []
+        self._depth = {priority: 0 for priority in PRIORITY_NAMES}
+        self._arrivals = itertools.count()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._dispatcher: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    async def acquire(self, priority: int = PRIORITY_LIVE) -> None:
+        """Wait for a token. Raises RequestDropped if the request has to be shed."""
+        label = PRIORITY_NAMES[priority]
+        self._bind_loop()
+        if not self._waiting and self.bucket.try_take(self.floors[priority]) == 0:
+            SCHEDULER_REQUESTS.inc(priority=label, outcome="granted")
+            SCHEDULER_WAIT.observe(0.0, priority=label)
+            return
+
+        if self._depth[priority] >= self.queue_limits[priority]:
+            SCHEDULER_REQUESTS.inc(priority=label, outcome="dropped_queue_full")
+            raise RequestDropped(f"{label} queue is full ({self._depth[priority]} waiting)")
+
+        deadline = self.deadlines.get(priority) or None
+        ahead = sum(1 for waiting_priority, _, _ in self._waiting if waiting_priority <= priority)
+        if deadline is not None and self.bucket.rate > 0 and (ahead + 1) / self.bucket.rate > deadline:
+            SCHEDULER_REQUESTS.inc(priority=label, outcome="dropped_deadline")
+            raise RequestDropped(f"{label} request would wait longer than {deadline:.1f}s")
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiting, (priority, next(self._arrivals), future))
+        self._depth[priority] += 1
+        self._wakeup.set()
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.ensure_future(self._dispatch())
+
+        started = time.monotonic()
+        try:
+            # A timed-out or cancelled wait cancels the future, and the dispatcher skips it
+            await asyncio.wait_for(future, deadline)
+        except asyncio.TimeoutError:
+            SCHEDULER_REQUESTS.inc(priority=label, outcome="dropped_deadline")
+            raise RequestDropped(f"{label} request got no token within {deadline:.1f}s")
+        finally:
+            self._depth[priority] -= 1
+        SCHEDULER_REQUESTS.inc(priority=label, outcome="queued")
+        SCHEDULER_WAIT.observe(time.monotonic() - started, priority=label)
+
+    def throttle(self) -> None:
+        """MiniMax reported a rate limit: stop granting tokens until the bucket refills."""
+        self.bucket.drain()
+
+    def _bind_loop(self) -> None:
+        # Scripts may call asyncio.run more than once; loop-bound state is rebuilt
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._waiting = []
+            self._depth = {priority: 0 for priority in PRIORITY_NAMES}
+            self._wakeup = asyncio.Event()
+            self._dispatcher = None
+
+    async def _dispatch(self) -> None:
+        while self._waiting:
+            priority, _, future = self._waiting[0]
+            if future.done():
+                heapq.heappop(self._waiting)
+                continue
+            wait = self.bucket.try_take(self.floors[priority])
+            if wait == 0:
+                heapq.heappop(self._waiting)
+                future.set_result(None)
+                continue
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), wait)
+            except asyncio.TimeoutError:
+                pass
+
+
+_scheduler: Optional[RequestScheduler] = None
+
+
+def get_scheduler() -> RequestScheduler:
+    """Return the process-wide MiniMax request scheduler."""
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = RequestScheduler(TokenBucket(counters=get_shared_state()))
+    return _scheduler
@@ -0,0 +1,130 @@
+"""
+State shared by the worker processes of one action server
+action_workers.py runs several action server processes on one port. Each
+worker learns its index from the environment, and counters that must be
+global (cache sizes, retry budgets, the MiniMax rate limit) live in a small
+memory-mapped file that every worker, and any TTS script run from the same
+directory, maps.
+"""
+
+import contextlib
+import logging
+import math
+import mmap
+import os
+import struct
+import threading
+import time
+from typing import Dict, Iterator, Optional, Text
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process only
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Set by action_workers.py for each worker it starts
+ACTION_WORKER_INDEX = os.getenv("ACTION_WORKER_INDEX")
+ACTION_WORKER_COUNT = int(os.getenv("ACTION_WORKER_COUNT", "1"))
+# Every process started from the same directory shares this file (empty = process-local)
+ACTION_SHARED_STATE_PATH = os.getenv("ACTION_SHARED_STATE_PATH", ".shared_state")
+
+# Fixed slot layout; every worker must agree on it, so append only
+SLOTS = (
+    "tts_cache.disk_bytes",
+    "blob_store.bytes",
+    "retry_budget.requests",
+    "retry_budget.requests@",
+    "retry_budget.retries",
+    "retry_budget.retries@",
+    "minimax.tokens",
+    "minimax.tokens@",
+)
+_SLOT = struct.Struct("d")
+STATE_SIZE = _SLOT.size * len(SLOTS)
+
+
+def worker_index() -> Optional[int]:
+    """Index of this worker under action_workers.py, None in a single-process server."""
+    return int(ACTION_WORKER_INDEX) if ACTION_WORKER_INDEX is not None else None
+
+
+class SharedCounters:
+    """
+    Float counters in a memory-mapped file. Single operations are atomic
+    across processes; use locked() around read-modify-write sequences
+    that span several counters.
+    """
+
+    def __init__(self, path: Optional[Text] = None):
+        self.path = path
+        self._offsets: Dict[Text, int] = {name: i * _SLOT.size for i, name in enumerate(SLOTS)}
+        self._thread_lock = threading.RLock()
+        self._depth = 0
+        self._fd: Optional[int] = None
+        if not path or fcntl is None:
+            self._map = mmap.mmap(-1, STATE_SIZE)
+            return
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        if os.fstat(self._fd).st_size < STATE_SIZE:
+            os.ftruncate(self._fd, STATE_SIZE)
+        self._map = mmap.mmap(self._fd, STATE_SIZE)
+
+    @contextlib.contextmanager
+    def locked(self) -> Iterator["SharedCounters"]:
+        """Hold the cross-process lock (re-entrant within this process)."""
+        with self._thread_lock:
+            if self._fd is not None and self._depth == 0:
+                fcntl.flock(self._fd, fcntl.LOCK_EX)
+            self._depth += 1
+            try:
+                yield self
+            finally:
+                self._depth -= 1
+                if self._fd is not None and self._depth == 0:
+                    fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def get(self, name: Text) -> float:
+        return _SLOT.unpack_from(self._map, self._offsets[name])[0]
+
+    def set(self, name: Text, value: float) -> None:
+        with self.locked():
+            _SLOT.pack_into(self._map, self._offsets[name], value)
+
+    def add(self, name: Text, amount: float) -> float:
+        """Add amount to a counter and return the new value."""
+        with self.locked():
+            value = self.get(name) + amount
+            _SLOT.pack_into(self._map, self._offsets[name], value)
+            return value
+
+    def decayed(self, name: Text, time_constant: float, amount: float = 0.0) -> float:
+        """
+        Exponentially decaying count: the value fades with time_constant
+        seconds before amount is added. The "<name>@" slot holds the time
+        of the last update. Returns the new value.
+        """
+        with self.locked():
+            now = time.monotonic()
+            elapsed = max(0.0, now - self.get(name + "@"))
+            value = self.get(name) * math.exp(-elapsed / time_constant) + amount
+            _SLOT.pack_into(self._map, self._offsets[name], value)
+            _SLOT.pack_into(self._map, self._offsets[name + "@"], now)
+            return value
+
+
+_state: Optional[SharedCounters] = None
+
+
+def get_shared_state() -> SharedCounters:
+    """Return the counters shared with the other workers (process-local if there are none)."""
+    global _state
+    if _state is None:
+        try:
+            _state = SharedCounters(ACTION_SHARED_STATE_PATH)
+        except OSError as e:
+            logger.warning("Cannot map %s, keeping shared counters in this process: %s",
+                           ACTION_SHARED_STATE_PATH, str(e))
+            _state = SharedCounters()
+    return _state
@@ -0,0 +1,106 @@
+"""
+Single-flight deduplication of identical in-flight work
+Concurrent callers asking for the same key share one call and its result
+instead of each starting their own. SingleFlight does this for the tasks of
+one process; KeyLock extends it to other processes (action server workers,
+TTS scripts) through byte-range locks in one local file.
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+import time
+from typing import Awaitable, Callable, Dict, Optional, Text, TypeVar
+
+try:
+    import fcntl
+except ImportError:  # Windows: in-process coalescing only
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Lock offsets are hashes into this range, so unrelated keys practically never collide
+_LOCK_RANGE = 1 << 40
+
+
+class SingleFlight:
+    """
+    One call per key at a time. The call runs as its own task, so a caller
+    that gives up (e.g. a cancelled action) does not cancel it for the
+    others, and its result still lands wherever the call stores it.
+    """
+
+    def __init__(self):
+        self._calls: Dict[Text, asyncio.Future] = {}
+
+    async def do(self, key: Text, call: Callable[[], Awaitable[T]]) -> T:
+        """Run call() for key, or wait for the run already in flight. Returns its result."""
+        task = self._calls.get(key)
+        if task is None or task.get_loop() is not asyncio.get_running_loop():
+            task = asyncio.ensure_future(call())
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        return await asyncio.shield(task)
+
+    def joined(self, key: Text) -> bool:
+        """Whether a call for key is in flight, i.e. do() would wait on it."""
+        return key in self._calls
+
+    def _forget(self, key: Text, task: asyncio.Future) -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled():
+            task.exception()  # Retrieved here so callers that gave up don't log it as lost
+
+
+class KeyLock:
+    """
+    Exclusive per-key locks shared between processes: each key maps to one
+    byte of a lock file, locked with fcntl.lockf. Nothing is created per
+    key, and a lock is released by the kernel if its holder dies.
+    """
+
+    def __init__(self, path: Text):
+        self.path = path
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+
+    @staticmethod
+    def _offset(key: Text) -> int:
+        return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "big") % _LOCK_RANGE
+
+    def try_acquire(self, key: Text) -> bool:
+        try:
+            fcntl.lockf(self._fd, fcntl.LOCK_EX | fcntl.LOCK_NB, 1, self._offset(key))
+            return True
+        except OSError:
+            return False
+
+    async def acquire(self, key: Text, timeout: float, poll_seconds: float) -> bool:
+        """
+        Wait until key is not locked by another process, then hold it.
+        Returns whether the lock was held before timeout ran out, in which
+        case True means another process may just have finished the work.
+        """
+        deadline = time.monotonic() + timeout
+        while not self.try_acquire(key):
+            if time.monotonic() >= deadline:
+                return False
+            await asyncio.sleep(poll_seconds)
+        return True
+
+    def release(self, key: Text) -> None:
+        fcntl.lockf(self._fd, fcntl.LOCK_UN, 1, self._offset(key))
+
+
+def open_key_lock(path: Text) -> Optional[KeyLock]:
+    """A KeyLock on path, or None where file locks are unavailable."""
+    if fcntl is None:
+        return None
+    try:
+        return KeyLock(path)
+    except OSError as e:
+        logger.warning("Cannot open lock file %s, coalescing within this process only: %s", path, str(e))
+        return None
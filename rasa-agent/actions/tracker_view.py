@@ -0,0 +1,31 @@
+"""
+Light read-only accessors over a rasa_sdk Tracker
+Tracker.current_state() builds a dict of every tracker field and walks the
+events back to the latest user message (for latest_input_channel) on each
+call, however few of those fields an action uses. TrackerView reads only
+what actions need, once per request.
+"""
+
+from typing import Any, Dict, Optional, Text
+
+from rasa_sdk import Tracker
+
+
+class TrackerView:
+    """
+    Per-request snapshot of the tracker fields actions use. Build one at
+    the start of run(); every field is a constant-time read, so the cost
+    does not grow with the conversation.
+    """
+
+    __slots__ = ("sender_id", "slots", "latest_event_time")
+
+    def __init__(self, tracker: Tracker):
+        self.sender_id: Text = tracker.sender_id
+        self.slots: Dict[Text, Any] = tracker.slots
+        # Same value as current_state()["latest_event_time"]
+        self.latest_event_time: Optional[float] = tracker.events[-1].get("timestamp") if tracker.events else None
+
+    def slot(self, name: Text) -> Optional[Any]:
+        """Value of a slot, None if unset or not in the domain (without Tracker.get_slot's log line)."""
+        return self.slots.get(name)
@@ -0,0 +1,228 @@
+"""
+Content-addressed TTS audio cache
+In-memory LRU tier backed by an on-disk tier with TTL and size-based eviction
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Mapping, Optional, Text
+
+from .shared_state import SharedCounters, get_shared_state
+from .voices import RequestTemplate
+
+logger = logging.getLogger(__name__)
+
+# Cache configuration
+TTS_CACHE_DIR = os.getenv("TTS_CACHE_DIR", ".tts_cache")
+TTS_CACHE_MEMORY_MB = int(os.getenv("TTS_CACHE_MEMORY_MB", "64"))
+TTS_CACHE_DISK_MB = int(os.getenv("TTS_CACHE_DISK_MB", "512"))
+TTS_CACHE_TTL_SECONDS = int(os.getenv("TTS_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+
+AUDIO_SUFFIX = ".mp3"
+DISK_BYTES = "tts_cache.disk_bytes"
+
+
+def _key_material(voice_setting: Mapping[Text, Any],
+                  model: Text,
+                  audio_setting: Optional[Dict[Text, Any]] = None) -> Dict[Text, Any]:
+    return {
+        "voice_id": voice_setting.get("voice_id"),
+        "speed": voice_setting.get("speed"),
+        "vol": voice_setting.get("vol"),
+        "pitch": voice_setting.get("pitch"),
+        "model": model,
+        "audio_setting": audio_setting or {},
+    }
+
+
+# Canonical JSON encoding of the key material
+_KEY_JSON_OPTIONS = {"sort_keys": True, "separators": (",", ":"), "ensure_ascii": False}
+
+
+def make_cache_key(text: Text,
+                   voice_setting: Mapping[Text, Any],
+                   model: Text,
+                   audio_setting: Optional[Dict[Text, Any]] = None) -> Text:
+    """
+    Build a stable cache key from everything that changes the synthesized audio.
+    Keys are hex SHA-256 digests of a canonical JSON encoding.
+    """
+    material = {"text": text, **_key_material(voice_setting, model, audio_setting)}
+    encoded = json.dumps(material, **_KEY_JSON_OPTIONS)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+def cache_key_template(voice_setting: Mapping[Text, Any],
+                       model: Text,
+                       audio_setting: Optional[Dict[Text, Any]] = None) -> RequestTemplate:
+    """
+    The canonical key material around a slot for the text: the SHA-256 of
+    its rendering is make_cache_key(text, voice_setting, model, audio_setting).
+    """
+    return RequestTemplate(_key_material(voice_setting, model, audio_setting), **_KEY_JSON_OPTIONS)
+
+
+class TTSCache:
+    """
+    Two-tier audio cache keyed by make_cache_key().
+    Memory hits are served from an LRU bounded by total bytes; misses fall
+    back to disk, where entries expire after the TTL and the oldest files
+    are evicted once the tier grows past its size limit. The disk tier's
+    size is tracked in counters, which the process-wide cache shares with
+    the other action server workers using the same directory.
+    """
+
+    def __init__(self,
+                 cache_dir: Text = TTS_CACHE_DIR,
+                 memory_bytes: int = TTS_CACHE_MEMORY_MB * 1024 * 1024,
+                 disk_bytes: int = TTS_CACHE_DISK_MB * 1024 * 1024,
+                 ttl_seconds: int = TTS_CACHE_TTL_SECONDS,
+                 counters: Optional[SharedCounters] = None):
+        self.cache_dir = cache_dir
+        self.memory_bytes = memory_bytes
+        self.disk_bytes = disk_bytes
+        self.ttl_seconds = ttl_seconds
+
+        self._memory: "OrderedDict[Text, tuple]" = OrderedDict()
+        self._memory_used = 0
+        self._counters = counters or SharedCounters()
+        self._lock = threading.Lock()
+
+        if self.disk_bytes > 0:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            self._counters.set(DISK_BYTES, sum(size for _, _, size in self._scan_disk()))
+
+    def _path(self, key: Text) -> Text:
+        return os.path.join(self.cache_dir, key[:2], key + AUDIO_SUFFIX)
+
+    def _expired(self, stored_at: float) -> bool:
+        return self.ttl_seconds > 0 and time.time() - stored_at > self.ttl_seconds
+
+    def get(self, key: Text) -> Optional[bytes]:
+        """Return cached audio for key, or None on a miss."""
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                audio, stored_at = entry
+                if not self._expired(stored_at):
+                    self._memory.move_to_end(key)
+                    return audio
+                self._drop_memory(key)
+
+        if self.disk_bytes <= 0:
+            return None
+
+        path = self._path(key)
+        try:
+            stored_at = os.path.getmtime(path)
+            if self._expired(stored_at):
+                self._remove_file(path)
+                return None
+            with open(path, "rb") as f:
+                audio = f.read()
+        except FileNotFoundError:
+            return None
+        except OSError as e:
+            logger.warning("Failed to read TTS cache entry %s: %s", key, str(e))
+            return None
+
+        with self._lock:
+            self._store_memory(key, audio, stored_at)
+        return audio
+
+    def put(self, key: Text, audio: bytes) -> None:
+        """Store audio under key in both tiers."""
+        if not audio:
+            return
+
+        now = time.time()
+        with self._lock:
+            self._store_memory(key, audio, now)
+
+        if self.disk_bytes <= 0 or len(audio) > self.disk_bytes:
+            return
+
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            previous = os.path.getsize(path) if os.path.exists(path) else 0
+            with open(tmp_path, "wb") as f:
+                f.write(audio)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning("Failed to write TTS cache entry %s: %s", key, str(e))
+            self._remove_file(tmp_path)
+            return
+
+        if self._counters.add(DISK_BYTES, len(audio) - previous) > self.disk_bytes:
+            self._evict_disk()
+
+    def _store_memory(self, key: Text, audio: bytes, stored_at: float) -> None:
+        if len(audio) > self.memory_bytes:
+            return
+        self._drop_memory(key)
+        self._memory[key] = (audio, stored_at)
+        self._memory_used += len(audio)
+        while self._memory_used > self.memory_bytes and self._memory:
+            _, (evicted, _) = self._memory.popitem(last=False)
+            self._memory_used -= len(evicted)
+
+    def _drop_memory(self, key: Text) -> None:
+        entry = self._memory.pop(key, None)
+        if entry is not None:
+            self._memory_used -= len(entry[0])
+
+    def _scan_disk(self):
+        """Yield (path, mtime, size) for every audio file in the disk tier."""
+        for root, _, files in os.walk(self.cache_dir):
+            for filename in files:
+                if not filename.endswith(AUDIO_SUFFIX):
+                    continue
+                path = os.path.join(root, filename)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                yield path, stat.st_mtime, stat.st_size
+
+    def _evict_disk(self) -> None:
+        """Remove expired files, then the oldest ones until under the size limit."""
+        entries = sorted(self._scan_disk(), key=lambda entry: entry[1])
+        used = sum(size for _, _, size in entries)
+        evicted = 0
+
+        for path, mtime, size in entries:
+            if used <= self.disk_bytes and not self._expired(mtime):
+                continue
+            if self._remove_file(path):
+                used -= size
+                evicted += 1
+
+        self._counters.set(DISK_BYTES, used)
+        if evicted:
+            logger.info("Evicted %d TTS cache files (disk usage: %d bytes)", evicted, used)
+
+    @staticmethod
+    def _remove_file(path: Text) -> bool:
+        try:
+            os.remove(path)
+            return True
+        except OSError:
+            return False
+
+
+_cache: Optional[TTSCache] = None
+
+
+def get_tts_cache() -> TTSCache:
+    """Return the process-wide TTS cache."""
+    global _cache
+    if _cache is None:
+        _cache = TTSCache(counters=get_shared_state())
+    return _cache
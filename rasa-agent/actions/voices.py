@@ -0,0 +1,192 @@
+"""
+Voice profile registry
+
+The single list of MiniMax voices used by the action server and the backend.
+Profiles are validated when this module is imported, and their
+voice_setting mappings are read-only so they can be shared and hashed
+safely. The registry is exported to JSON for the Node backend, so both
+services pick the same voice_id, speed, volume and pitch for a profile.
+The export also carries, per profile, the t2a_v2 request body and the
+cache-key material serialized around a slot for the text (see
+RequestTemplate). The backend fills them in, so it sends the same request
+as the action server and computes the same TTS cache key for it.
+
+Usage:
+    python -m actions.voices --export ../backend/config/voices.json [--model speech-02-hd]
+"""
+
+import argparse
+import json
+import os
+from types import MappingProxyType
+from typing import Any, Callable, Dict, Iterable, Mapping, NamedTuple, Optional, Text, Tuple
+
+EXPORT_VERSION = 2
+
+# MiniMax t2a_v2 accepted ranges
+SPEED_RANGE = (0.5, 2.0)
+VOL_RANGE = (0.0, 10.0)
+PITCH_RANGE = (-12, 12)
+
+# Used by the actions when no route picks a voice
+DEFAULT_VOICE = "calm"
+# Used by the backend for unknown or missing voice names
+BACKEND_DEFAULT_VOICE = "odia"
+
+
+class VoiceProfile(NamedTuple):
+    name: Text
+    voice_id: Text
+    speed: float = 1.0
+    vol: float = 1.0
+    pitch: int = 0
+    description: Text = ""
+    aliases: Tuple[Text, ...] = ()
+
+    @property
+    def voice_setting(self) -> Mapping[Text, Any]:
+        return MappingProxyType({"voice_id": self.voice_id, "speed": self.speed,
+                                 "vol": self.vol, "pitch": self.pitch})
+
+
+PROFILES = (
+    VoiceProfile("soft", "female-soft", speed=0.9, vol=0.8,
+                 description="Soft female voice for gentle content"),
+    VoiceProfile("calm", "female_calm",
+                 description="Calm female voice, the actions default"),
+    VoiceProfile("odia", "moss_audio_4e6eb029-ab89-11f0-a74c-2a7a0b4baedc",
+                 description="African male", aliases=("odiamale", "alice")),
+    VoiceProfile("marcus", "moss_audio_a59cd561-ab87-11f0-a74c-2a7a0b4baedc",
+                 description="American male"),
+    VoiceProfile("marcy", "moss_audio_fdad4786-ab84-11f0-a816-023f15327f7a",
+                 description="American female"),
+    VoiceProfile("joslyn", "moss_audio_141d8c4c-a6f8-11f0-84c1-0ec6fa858d82",
+                 description="African female"),
+)
+
+
+class VoiceRegistry:
+    """Profiles by name and alias (case-insensitive)."""
+
+    def __init__(self, profiles: Iterable[VoiceProfile], default: Text = DEFAULT_VOICE):
+        self.profiles: Dict[Text, VoiceProfile] = {}
+        self._lookup: Dict[Text, VoiceProfile] = {}
+
+        for profile in profiles:
+            self._validate(profile)
+            self.profiles[profile.name] = profile
+            for name in (profile.name,) + tuple(profile.aliases):
+                key = name.lower()
+                if key in self._lookup:
+                    raise ValueError(f"Voice name {name} is defined twice")
+                self._lookup[key] = profile
+
+        if default.lower() not in self._lookup:
+            raise ValueError(f"Default voice {default} is not a registered profile")
+        self.default = self._lookup[default.lower()]
+
+    @staticmethod
+    def _validate(profile: VoiceProfile) -> None:
+        if not profile.name or not profile.voice_id:
+            raise ValueError(f"Voice profile {profile!r} needs a name and a voice_id")
+        for field, (low, high) in (("speed", SPEED_RANGE), ("vol", VOL_RANGE), ("pitch", PITCH_RANGE)):
+            value = getattr(profile, field)
+            if not low <= value <= high or (field == "vol" and value == 0):
+                raise ValueError(f"Voice {profile.name}: {field} {value} outside {low}..{high}")
+
+    def __contains__(self, name: Text) -> bool:
+        return isinstance(name, str) and name.lower() in self._lookup
+
+    def __iter__(self):
+        return iter(self.profiles)
+
+    def __getitem__(self, name: Text) -> VoiceProfile:
+        return self._lookup[name.lower()]
+
+    def get(self, name: Optional[Text], default: Optional[VoiceProfile] = None) -> Optional[VoiceProfile]:
+        if not name:
+            return default
+        return self._lookup.get(name.lower().strip(), default)
+
+    def to_json(self,
+                templates: Optional[Callable[[Mapping[Text, Any]], Dict[Text, Any]]] = None,
+                **extra: Any) -> Dict[Text, Any]:
+        """
+        Registry as plain data for the backend (backend/config/voices.json).
+        templates, if given, maps a voice_setting to the request and cache-key
+        templates stored with each profile; extra is added at the top level.
+        """
+        return {
+            "version": EXPORT_VERSION,
+            "default": BACKEND_DEFAULT_VOICE,
+            **extra,
+            "profiles": {
+                name: {
+                    **profile.voice_setting,
+                    "description": profile.description,
+                    "aliases": list(profile.aliases),
+                    **({"templates": templates(profile.voice_setting)} if templates else {}),
+                }
+                for name, profile in self.profiles.items()
+            },
+        }
+
+
+VOICES = VoiceRegistry(PROFILES)
+
+# voice_setting by profile name, for callers that only need the settings
+VOICE_SETTINGS: Mapping[Text, Mapping[Text, Any]] = MappingProxyType(
+    {name: profile.voice_setting for name, profile in VOICES.profiles.items()})
+
+
+class RequestTemplate:
+    """
+    A JSON object (e.g. a t2a_v2 request body) serialized once, with a slot
+    for the text. Rendering is two byte concatenations around the
+    JSON-encoded text. json_options are passed to json.dumps.
+    """
+
+    _SLOT = "\x00text\x00"
+
+    def __init__(self, fields: Mapping[Text, Any], **json_options: Any):
+        self._ensure_ascii = json_options.get("ensure_ascii", True)
+        encoded = json.dumps({"text": self._SLOT, **fields}, **json_options)
+        prefix, suffix = encoded.split(json.dumps(self._SLOT), 1)
+        self._prefix = prefix.encode("utf-8")
+        self._suffix = suffix.encode("utf-8")
+
+    def render(self, text: Text) -> bytes:
+        return self._prefix + json.dumps(text, ensure_ascii=self._ensure_ascii).encode("utf-8") + self._suffix
+
+    def to_json(self) -> Dict[Text, Text]:
+        """
+        Prefix and suffix for other services. JSON.stringify(text) in Node
+        matches json.dumps(text, ensure_ascii=False), so a template built
+        with ensure_ascii=False renders the same bytes there.
+        """
+        return {"prefix": self._prefix.decode("utf-8"), "suffix": self._suffix.decode("utf-8")}
+
+
+def main() -> None:
+    # The templates are built by the MiniMax client, which imports this module
+    from .minimax import DEFAULT_AUDIO_SETTING, DEFAULT_MODEL, backend_templates
+
+    parser = argparse.ArgumentParser(description="Export the voice profile registry as JSON")
+    parser.add_argument("--export", default="-", help="Output path ('-' for stdout)")
+    parser.add_argument("--model", default=os.getenv("MINIMAX_MODEL", DEFAULT_MODEL),
+                        help="MiniMax model the request and cache-key templates are built for")
+    args = parser.parse_args()
+
+    registry = VOICES.to_json(lambda voice_setting: backend_templates(voice_setting, args.model),
+                              model=args.model, audio_setting=DEFAULT_AUDIO_SETTING)
+    data = json.dumps(registry, indent=2) + "\n"
+    if args.export == "-":
+        print(data, end="")
+        return
+    os.makedirs(os.path.dirname(args.export) or ".", exist_ok=True)
+    with open(args.export, "w", encoding="utf-8") as f:
+        f.write(data)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Throughput of the multi-process action server by worker count
+
+Starts action_workers.py with an action package holding one action that
+blocks its worker for --work-ms of CPU time (standing in for synchronous
+work in our actions), drives /webhook with --concurrency parallel callers
+for --duration seconds per worker count, and reports requests per second
+and the scaling relative to one worker. Expect close to linear scaling up
+to the number of available CPUs and flat beyond it.
+
+Usage (from rasa-agent/):
+    python benchmarks/bench_action_workers.py --workers 1,2,4 --work-ms 5
+"""
+
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Text
+
+import aiohttp
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+from action_workers import available_cpus  # noqa: E402
+
+BENCH_ACTIONS = '''
+import time
+
+from rasa_sdk import Action
+
+
+class ActionBlockingWork(Action):
+    def name(self):
+        return "action_blocking_work"
+
+    def run(self, dispatcher, tracker, domain):
+        deadline = time.process_time() + {work_seconds}
+        while time.process_time() < deadline:
+            pass
+        return []
+'''
+
+
+def action_call(sender_id: Text) -> dict:
+    from rasa_sdk import __version__
+    return {
+        "next_action": "action_blocking_work",
+        "sender_id": sender_id,
+        "version": __version__,
+        "domain": {},
+        "tracker": {"sender_id": sender_id, "slots": {}, "latest_message": {}, "events": [],
+                    "paused": False, "followup_action": None, "active_loop": {},
+                    "latest_action_name": None},
+    }
+
+
+def wait_for_port(port: int, timeout: float = 60.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        with socket.socket() as sock:
+            if sock.connect_ex(("127.0.0.1", port)) == 0:
+                return
+        time.sleep(0.2)
+    raise RuntimeError(f"Action server did not come up on port {port}")
+
+
+async def drive(port: int, concurrency: int, duration: float) -> int:
+    url = f"http://127.0.0.1:{port}/webhook"
+    completed = 0
+    deadline = time.monotonic() + duration
+
+    async def caller(index: int) -> None:
+        nonlocal completed
+        # A connection per caller, so SO_REUSEPORT can spread them over the workers
+        async with aiohttp.ClientSession() as session:
+            while time.monotonic() < deadline:
+                async with session.post(url, json=action_call(f"bench-{index}")) as response:
+                    await response.read()
+                    if response.status == 200:
+                        completed += 1
+
+    await asyncio.gather(*(caller(index) for index in range(concurrency)))
+    return completed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark action server throughput by worker count")
+    parser.add_argument("--workers", default=f"1,{available_cpus()}", help="Comma-separated worker counts")
+    parser.add_argument("--work-ms", type=float, default=5.0, help="CPU time each action blocks for")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per worker count")
+    parser.add_argument("--port", type=int, default=5955)
+    args = parser.parse_args()
+
+    package_dir = tempfile.mkdtemp(prefix="bench_actions_")
+    with open(os.path.join(package_dir, "bench_actions.py"), "w") as f:
+        f.write(BENCH_ACTIONS.format(work_seconds=args.work_ms / 1000))
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([package_dir, os.environ.get("PYTHONPATH", "")]),
+               AUDIO_SERVER_PORT=str(args.port + 1), METRICS_ENABLED="false")
+
+    print(f"{available_cpus()} CPUs available, {args.work_ms} ms of CPU per action")
+    print(f"{'workers':>8} {'req/s':>10} {'scaling':>8}")
+    baseline = None
+    for count in (int(value) for value in args.workers.split(",")):
+        server = subprocess.Popen(
+            [sys.executable, os.path.join(ROOT, "action_workers.py"), "--port", str(args.port),
+             "--workers", str(count), "--actions", "bench_actions"],
+            cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            wait_for_port(args.port)
+            time.sleep(2)  # Let every worker finish importing and bind
+            completed = asyncio.run(drive(args.port, args.concurrency, args.duration))
+        finally:
+            server.terminate()
+            server.wait()
+        rate = completed / args.duration
+        baseline = baseline or rate
+        print(f"{count:>8} {rate:>10.1f} {rate / baseline:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
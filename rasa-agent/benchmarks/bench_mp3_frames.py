@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark for MP3 frame validation
+
+Times parse_mp3 over a whole clip, and the streaming parser over the same
+clip fed in SSE-sized chunks, and reports milliseconds per clip and per
+second of audio. Validation runs inline on every synthesized clip, so it
+should stay a small fraction of a MiniMax round trip. The clip is the
+audio in a generator JSON dump (the love meditation by default) or any
+MP3 file.
+
+Usage (from rasa-agent/):
+    python benchmarks/bench_mp3_frames.py
+    python benchmarks/bench_mp3_frames.py --mp3 clip.mp3 --chunk-size 8192
+"""
+
+import argparse
+import io
+import os
+import sys
+import timeit
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+from actions.audio_extract import extract_audio  # noqa: E402
+from actions.mp3_frames import Mp3FrameParser, parse_mp3  # noqa: E402
+
+DEFAULT_DUMP = os.path.join(ROOT, "..", "love_tts_fixed_20251031_072301.json")
+
+
+def load_clip(args: argparse.Namespace) -> bytes:
+    if args.mp3:
+        with open(args.mp3, "rb") as f:
+            return f.read()
+    sink = io.BytesIO()
+    with open(args.dump, "rb") as f:
+        extract_audio(f, sink)
+    return sink.getvalue()
+
+
+def parse_streamed(audio: bytes, chunk_size: int) -> None:
+    parser = Mp3FrameParser()
+    view = memoryview(audio)
+    for start in range(0, len(audio), chunk_size):
+        parser.feed(view[start:start + chunk_size])
+    parser.finish()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark MP3 frame validation")
+    parser.add_argument("--dump", default=DEFAULT_DUMP, help="Generator JSON dump holding the clip")
+    parser.add_argument("--mp3", help="MP3 file to use instead of a dump")
+    parser.add_argument("--chunk-size", type=int, default=4096, help="Chunk size for the streaming run")
+    parser.add_argument("--number", type=int, default=50)
+    args = parser.parse_args()
+
+    audio = load_clip(args)
+    info = parse_mp3(audio)
+    print(f"{len(audio):,} bytes, {info.frames:,} frames, {info.duration:.3f}s, "
+          f"{info.sample_rate} Hz, {info.bitrate // 1000} kbit/s")
+
+    for name, run in (("whole clip", lambda: parse_mp3(audio)),
+                      (f"{args.chunk_size} B chunks", lambda: parse_streamed(audio, args.chunk_size))):
+        seconds = min(timeit.repeat(run, number=args.number, repeat=3)) / args.number
+        print(f"{name:>16}: {seconds * 1000:7.2f} ms per clip, "
+              f"{seconds * 1e6 / info.duration:6.1f} us per second of audio")
+
+
+if __name__ == "__main__":
+    main()
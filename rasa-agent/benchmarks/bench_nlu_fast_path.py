@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Hit rate and lookup cost of the NLU fast path
+
+Builds the fast-path index from data/nlu.yml and replays messages through
+it, reporting how many would skip DIET, how often the fast-path intent is
+right (when the expected intent is known) and the lookup latency.
+
+Traffic comes from --traffic: a file of user messages, one per line, or
+JSONL with "text" and optionally "intent" (e.g. exported from the tracker
+store). Without it the NLU examples are replayed twice: as sent with
+different casing and punctuation (every one should hit), and leave-one-out
+with each example removed from the index first, as a stand-in for
+paraphrases the index has never seen.
+
+Pass --diet-ms with the DIET forward-pass time measured on the server to
+turn the hit rate into an estimated saving. With --models (needs Rasa) the
+same messages are parsed end to end by each trained model instead, e.g. one
+trained with DIETClassifier and one with FastPathDIETClassifier, and the
+parse latency of each is reported.
+
+Usage (from rasa-agent/):
+    python benchmarks/bench_nlu_fast_path.py
+    python benchmarks/bench_nlu_fast_path.py --traffic messages.jsonl --diet-ms 12
+    python benchmarks/bench_nlu_fast_path.py --models models/diet.tar.gz models/fast.tar.gz
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+from typing import List, Optional, Sequence, Text, Tuple
+
+import yaml
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from components.fast_path_index import (  # noqa: E402
+    DEFAULT_MARGIN, DEFAULT_THRESHOLD, FastPathIndex, TrainingExample)
+from loadtest.scenarios import ENTITY_ANNOTATION, strip_annotations  # noqa: E402
+
+
+def load_training_examples(nlu_path: Text) -> List[TrainingExample]:
+    with open(nlu_path, "r", encoding="utf-8") as f:
+        nlu = yaml.safe_load(f) or {}
+    examples = []
+    for entry in nlu.get("nlu") or []:
+        if "intent" not in entry:
+            continue
+        for line in (entry.get("examples") or "").splitlines():
+            line = line.strip()
+            if line.startswith("- "):
+                examples.append(TrainingExample(strip_annotations(line[2:]), entry["intent"],
+                                                bool(ENTITY_ANNOTATION.search(line))))
+    return examples
+
+
+def load_traffic(path: Text) -> List[Tuple[Text, Optional[Text]]]:
+    messages = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith("{"):
+                record = json.loads(line)
+                messages.append((record.get("text") or "", record.get("intent")))
+            else:
+                messages.append((line, None))
+    return messages
+
+
+def evaluate(label: Text, index_for, messages: Sequence[Tuple[Text, Optional[Text]]],
+             diet_ms: Optional[float]) -> None:
+    """Replay messages; index_for(position) returns the index to query for each one."""
+    hits = correct = labelled_hits = 0
+    latencies = []
+    for position, (text, intent) in enumerate(messages):
+        index = index_for(position)
+        started = time.perf_counter()
+        match = index.lookup(text)
+        latencies.append(time.perf_counter() - started)
+        if match is None:
+            continue
+        hits += 1
+        if intent is not None:
+            labelled_hits += 1
+            correct += match.intent == intent
+
+    latencies.sort()
+    total = len(messages)
+    print(f"\n{label}: {total} messages")
+    print(f"  hit rate          {hits / total:7.1%}  ({hits} skip DIET)")
+    if labelled_hits:
+        print(f"  precision         {correct / labelled_hits:7.1%}  ({labelled_hits - correct} wrong intents)")
+    print(f"  lookup mean       {sum(latencies) / total * 1e6:7.1f} us")
+    print(f"  lookup p99        {latencies[min(total - 1, int(total * 0.99))] * 1e6:7.1f} us")
+    if diet_ms is not None:
+        saved = hits * diet_ms - sum(latencies) * 1000
+        print(f"  est. saving       {saved / total:7.2f} ms/message (DIET at {diet_ms} ms)")
+
+
+async def _parse_all(agent, messages: Sequence[Tuple[Text, Optional[Text]]], repeat: int):
+    latencies = []
+    correct = labelled = 0
+    for _ in range(repeat):
+        for text, intent in messages:
+            started = time.perf_counter()
+            result = await agent.parse_message(text)
+            latencies.append(time.perf_counter() - started)
+            if intent is not None:
+                labelled += 1
+                correct += result["intent"]["name"] == intent
+    return latencies, correct, labelled
+
+
+def compare_models(model_paths: Sequence[Text], messages: Sequence[Tuple[Text, Optional[Text]]],
+                   repeat: int) -> None:
+    """Parse every message with each model (after one warm-up pass) and report the latency."""
+    from rasa.core.agent import Agent
+    from rasa.utils.log_utils import configure_structlog
+
+    configure_structlog(logging.WARNING)  # Otherwise every parse is logged
+    print(f"\nEnd-to-end parse of {len(messages)} messages x {repeat}")
+    for path in model_paths:
+        agent = Agent.load(path)
+        asyncio.run(_parse_all(agent, messages, 1))
+        latencies, correct, labelled = asyncio.run(_parse_all(agent, messages, repeat))
+        latencies.sort()
+        total = len(latencies)
+        accuracy = f", accuracy {correct / labelled:.1%}" if labelled else ""
+        print(f"  {os.path.basename(path):<24} mean {sum(latencies) / total * 1000:6.2f} ms, "
+              f"p50 {latencies[total // 2] * 1000:6.2f} ms, "
+              f"p99 {latencies[min(total - 1, int(total * 0.99))] * 1000:6.2f} ms{accuracy}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the NLU fast path")
+    parser.add_argument("--nlu", default="data/nlu.yml", help="NLU training data")
+    parser.add_argument("--traffic", help="Messages to replay (text lines or JSONL with text/intent)")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument("--margin", type=float, default=DEFAULT_MARGIN)
+    parser.add_argument("--diet-ms", type=float, help="DIET inference time per message, for savings")
+    parser.add_argument("--models", nargs="+", help="Trained model archives to compare end to end")
+    parser.add_argument("--repeat", type=int, default=5, help="Passes over the messages per model")
+    args = parser.parse_args()
+
+    examples = load_training_examples(args.nlu)
+    index = FastPathIndex.build(examples, args.threshold, args.margin)
+    print(f"Indexed {len(index.exact)} of {len(examples)} examples "
+          f"(intents with entities are left to DIET)")
+
+    if args.models:
+        messages = (load_traffic(args.traffic) if args.traffic
+                    else [(example.text.upper() + "!", example.intent) for example in examples])
+        compare_models(args.models, messages, args.repeat)
+        return
+
+    if args.traffic:
+        evaluate("Traffic", lambda _: index, load_traffic(args.traffic), args.diet_ms)
+        return
+
+    indexed = [example for example in examples if not example.has_entities]
+    variants = [(example.text.upper() + "!", example.intent) for example in indexed]
+    evaluate("Training examples, recased and re-punctuated", lambda _: index, variants, args.diet_ms)
+
+    held_out = [FastPathIndex.build(indexed[:i] + indexed[i + 1:], args.threshold, args.margin)
+                for i in range(len(indexed))]
+    evaluate("Leave-one-out (unseen phrasings)", held_out.__getitem__,
+             [(example.text, example.intent) for example in indexed], args.diet_ms)
+
+
+if __name__ == "__main__":
+    main()
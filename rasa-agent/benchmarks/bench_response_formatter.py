@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark for the Marcy response formatter
+
+Compares the formatter with the previous split/slice/join implementation
+on short, long, monologue-sized and batch inputs. The current version
+stops splitting after max_words words and takes word counts from the
+split instead of splitting its output again, so it matches the old one
+on short inputs and pulls ahead on long inputs and batches.
+
+Usage (from rasa-agent/):
+    python benchmarks/bench_response_formatter.py --number 20000
+"""
+
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from actions.response_formatter import FormattedResponse, format_marcy_response, format_marcy_responses  # noqa: E402
+
+SHORT = "Perfect! May I have your full name please?"
+LONG = ("Thanks for calling. CallWaitingAI answers every call for your business around the clock, "
+        "books appointments, captures leads and sends you a summary after each conversation so "
+        "that you never miss an opportunity again, even on holidays and weekends when nobody "
+        "is in the office to pick up the phone.")
+# Monologue-sized input: only the first max_words words should need scanning
+MONOLOGUE = " ".join([LONG] * 6)
+BATCH = [SHORT, LONG] * 50
+
+
+def legacy_format(text: str, max_words: int = 25) -> str:
+    """The formatter as it was before the bounded-split rewrite."""
+    if not text:
+        return "I'm sorry, could you repeat that?"
+    words = text.split()
+    if len(words) > max_words:
+        truncated = words[:max_words]
+        if truncated[-1][-1] not in '.!?':
+            truncated = truncated[:-1]
+        text = ' '.join(truncated)
+        if text[-1] not in '.!?':
+            text += '.'
+    text = text.strip()
+    if text:
+        text = text[0].upper() + text[1:]
+    return text
+
+
+def legacy_batch(texts):
+    """The legacy formatter plus the word and character counts the batch API returns."""
+    results = []
+    for text in texts:
+        formatted = legacy_format(text)
+        results.append(FormattedResponse(formatted, len(formatted.split()), len(formatted)))
+    return results
+
+
+def report(label: str, seconds: float, number: int) -> None:
+    print(f"{label:<32} {seconds / number * 1e6:8.2f} us/call")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the response formatter")
+    parser.add_argument("--number", type=int, default=20000, help="Calls per measurement")
+    parser.add_argument("--repeat", type=int, default=5, help="Measurements; the best is reported")
+    args = parser.parse_args()
+
+    cases = [
+        ("legacy short", lambda: legacy_format(SHORT)),
+        ("current short", lambda: format_marcy_response(SHORT)),
+        ("legacy long (truncated)", lambda: legacy_format(LONG)),
+        ("current long (truncated)", lambda: format_marcy_response(LONG)),
+        ("legacy monologue", lambda: legacy_format(MONOLOGUE)),
+        ("current monologue", lambda: format_marcy_response(MONOLOGUE)),
+        ("legacy batch of 100", lambda: legacy_batch(BATCH)),
+        ("current batch of 100", lambda: format_marcy_responses(BATCH)),
+    ]
+    for label, call in cases:
+        number = args.number // 100 if "batch" in label else args.number
+        best = min(timeit.repeat(call, number=number, repeat=args.repeat))
+        report(label, best, number)
+
+
+if __name__ == "__main__":
+    main()
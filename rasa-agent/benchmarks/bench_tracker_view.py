@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark for reading lead fields from the tracker
+
+Times what ActionLogToBackend reads (three slots, sender id and latest
+event time) through Tracker.current_state() and through TrackerView, on
+conversations of growing length. current_state() walks back from the last
+event to the latest user message, so it grows with the run of bot-side
+events (actions, slot sets, form steps) since the caller last spoke;
+TrackerView stays flat in both shapes.
+
+Usage (from rasa-agent/):
+    python benchmarks/bench_tracker_view.py --number 20000
+"""
+
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from rasa_sdk import Tracker  # noqa: E402
+
+from actions.tracker_view import TrackerView  # noqa: E402
+
+EVENT_COUNTS = (10, 100, 500, 2000)
+SLOTS = {"name": "Ada Lovelace", "business": "Analytical Engines", "phone": "+15550100"}
+
+
+def make_tracker(event_count: int, user_every: int = 3) -> Tracker:
+    """
+    A tracker with event_count events: a user message every user_every
+    events (or only the first one if user_every is 0), then action and bot
+    events.
+    """
+    events = []
+    for index in range(event_count):
+        timestamp = 1700000000.0 + index
+        kind = index % 3
+        if (index % user_every == 0) if user_every else index == 0:
+            events.append({"event": "user", "timestamp": timestamp, "text": "hello",
+                           "input_channel": "twilio", "parse_data": {"intent": {"name": "greet"}}})
+        elif kind != 2:
+            events.append({"event": "action", "timestamp": timestamp, "name": "utter_greet"})
+        else:
+            events.append({"event": "bot", "timestamp": timestamp, "text": "Hi there!"})
+    return Tracker("caller-1", dict(SLOTS), {"text": "hello", "intent": {"name": "greet"}},
+                   events, False, None, {}, "utter_greet")
+
+
+def read_with_current_state(tracker: Tracker) -> tuple:
+    return (tracker.get_slot("name"), tracker.get_slot("business"), tracker.get_slot("phone"),
+            tracker.sender_id, tracker.current_state().get("latest_event_time"))
+
+
+def read_with_view(tracker: Tracker) -> tuple:
+    view = TrackerView(tracker)
+    return (view.slot("name"), view.slot("business"), view.slot("phone"),
+            view.sender_id, view.latest_event_time)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark tracker field access")
+    parser.add_argument("--number", type=int, default=20000, help="Calls per measurement")
+    parser.add_argument("--repeat", type=int, default=5, help="Measurements; the best is reported")
+    args = parser.parse_args()
+
+    for title, user_every in (("caller speaks every 3 events", 3), ("one user message, then bot events", 0)):
+        print(f"\n{title}")
+        print(f"{'events':>8} {'current_state':>19} {'TrackerView':>19}")
+        for event_count in EVENT_COUNTS:
+            tracker = make_tracker(event_count, user_every)
+            assert read_with_current_state(tracker) == read_with_view(tracker)
+            timings = [min(timeit.repeat(lambda: read(tracker), number=args.number, repeat=args.repeat))
+                       for read in (read_with_current_state, read_with_view)]
+            print(f"{event_count:>8} " + " ".join(f"{t / args.number * 1e6:11.2f} us/call" for t in timings))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1 @@
+"""Custom Rasa NLU components, referenced from the pipeline configs by module path."""
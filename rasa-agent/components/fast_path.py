@@ -0,0 +1,178 @@
+"""
+DIETClassifier with an exact/near-exact match fast path
+
+Drop-in replacement for DIETClassifier (config-production.yml uses it):
+
+    - name: components.fast_path.FastPathDIETClassifier
+      fast_path_threshold: 0.9
+
+Training builds a FastPathIndex from the NLU examples next to the DIET
+model. At inference, messages the index matches get their intent at once
+and skip the DIET forward pass; every other message goes through DIET as
+before. Intents with entity annotations are never fast-pathed, so entity
+extraction is unaffected.
+
+With lazy_load, the DIET TensorFlow model (nearly all of the NLU load time)
+is built in a background thread and the server starts without it. Messages
+the index matches, such as the greeting that opens a call, are answered
+meanwhile; the first message that needs DIET waits for the load to finish.
+"""
+
+import json
+import logging
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Text
+
+from rasa.engine.graph import ExecutionContext
+from rasa.engine.recipes.default_recipe import DefaultV1Recipe
+from rasa.engine.storage.resource import Resource
+from rasa.engine.storage.storage import ModelStorage
+from rasa.nlu.classifiers.diet_classifier import DIETClassifier
+from rasa.utils import train_utils
+from rasa.utils.tensorflow.models import RasaModel
+from rasa.shared.nlu.constants import ENTITIES, INTENT, INTENT_RANKING_KEY, TEXT
+from rasa.shared.nlu.training_data.message import Message
+from rasa.shared.nlu.training_data.training_data import TrainingData
+
+from .fast_path_index import DEFAULT_MARGIN, DEFAULT_THRESHOLD, FastPathIndex, TrainingExample
+
+logger = logging.getLogger(__name__)
+
+INDEX_FILE = "fast_path_index.json"
+
+
+@DefaultV1Recipe.register(
+    [
+        DefaultV1Recipe.ComponentType.INTENT_CLASSIFIER,
+        DefaultV1Recipe.ComponentType.ENTITY_EXTRACTOR,
+    ],
+    is_trainable=True,
+)
+class FastPathDIETClassifier(DIETClassifier):
+    """DIET behind a lookup of the training examples."""
+
+    @staticmethod
+    def get_default_config() -> Dict[Text, Any]:
+        return {
+            **DIETClassifier.get_default_config(),
+            "fast_path_enabled": True,
+            # Minimum cosine similarity for a near-exact match
+            "fast_path_threshold": DEFAULT_THRESHOLD,
+            # How far ahead of the runner-up intent a near match must be
+            "fast_path_margin": DEFAULT_MARGIN,
+            # Build the DIET model in the background instead of before the server starts
+            "lazy_load": False,
+        }
+
+    def __init__(self, config: Dict[Text, Any], model_storage: ModelStorage, resource: Resource,
+                 execution_context: ExecutionContext, *args: Any,
+                 fast_path_index: Optional[FastPathIndex] = None, **kwargs: Any) -> None:
+        super().__init__(config, model_storage, resource, execution_context, *args, **kwargs)
+        self.fast_path_index = fast_path_index
+        self._pending_model: Optional["Future[RasaModel]"] = None
+
+    def train(self, training_data: TrainingData) -> Resource:
+        self.fast_path_index = FastPathIndex.build(
+            (TrainingExample(example.get(TEXT), example.get(INTENT), bool(example.get(ENTITIES)))
+             for example in training_data.intent_examples if example.get(TEXT)),
+            self.component_config["fast_path_threshold"],
+            self.component_config["fast_path_margin"],
+        )
+        return super().train(training_data)
+
+    def persist(self) -> None:
+        super().persist()
+        if self.fast_path_index is None:
+            return
+        with self._model_storage.write_to(self._resource) as model_path:
+            with open(model_path / INDEX_FILE, "w", encoding="utf-8") as f:
+                json.dump(self.fast_path_index.to_dict(), f)
+
+    @classmethod
+    def _load(cls, model_path: Path, config: Dict[Text, Any], model_storage: ModelStorage,
+              resource: Resource, execution_context: ExecutionContext) -> "FastPathDIETClassifier":
+        index = None
+        index_path = model_path / INDEX_FILE
+        if index_path.exists():
+            with open(index_path, "r", encoding="utf-8") as f:
+                # Thresholds come from the current config so they can be tuned without retraining
+                index = FastPathIndex.from_dict(json.load(f), config["fast_path_threshold"],
+                                                config["fast_path_margin"])
+
+        eager = not (config["lazy_load"] and config["fast_path_enabled"]) or execution_context.is_finetuning
+        if eager or index is None:
+            component = super()._load(model_path, config, model_storage, resource, execution_context)
+            component.fast_path_index = index
+            return component
+
+        (index_label_id_mapping, entity_tag_specs, label_data,
+         data_example, sparse_feature_sizes) = cls._load_from_files(model_path)
+        config = train_utils.update_similarity_type(train_utils.update_confidence_type(config))
+        component = cls(config, model_storage, resource, execution_context,
+                        index_label_id_mapping=index_label_id_mapping,
+                        entity_tag_specs=entity_tag_specs,
+                        sparse_feature_sizes=sparse_feature_sizes,
+                        fast_path_index=index)
+        component._pending_model = cls._load_model_in_background(
+            model_path, entity_tag_specs, label_data, config, data_example)
+        return component
+
+    @classmethod
+    def _load_model_in_background(cls, model_path: Path, *args: Any) -> "Future[RasaModel]":
+        """Build the TF model in a daemon thread from a private copy of the model files."""
+        # `rasa run` deletes the unpacked archive once the graph is loaded
+        copy = Path(tempfile.mkdtemp(prefix="fast_path_diet_"))
+        shutil.copytree(model_path, copy, dirs_exist_ok=True)
+        future: "Future[RasaModel]" = Future()
+
+        def load() -> None:
+            started = time.perf_counter()
+            try:
+                model = cls._load_model(*args, copy)
+            except BaseException as e:
+                logger.error("Loading the DIET model failed: %s", str(e))
+                future.set_exception(e)
+            else:
+                logger.info("DIET model loaded in the background in %.1fs", time.perf_counter() - started)
+                future.set_result(model)
+            finally:
+                shutil.rmtree(copy, ignore_errors=True)
+
+        threading.Thread(target=load, name="fast-path-diet-load", daemon=True).start()
+        return future
+
+    def _wait_for_model(self) -> None:
+        if self._pending_model is None:
+            return
+        if not self._pending_model.done():
+            logger.info("Waiting for the DIET model to finish loading")
+        self.model = self._pending_model.result()
+        self._pending_model = None
+
+    def process(self, messages: List[Message]) -> List[Message]:
+        if not self.component_config["fast_path_enabled"] or self.fast_path_index is None:
+            self._wait_for_model()
+            return super().process(messages)
+
+        misses = []
+        for message in messages:
+            match = self.fast_path_index.lookup(message.get(TEXT) or "")
+            if match is None:
+                misses.append(message)
+                continue
+            label = {"name": match.intent, "confidence": match.confidence}
+            message.set(INTENT, label, add_to_output=True)
+            message.set(INTENT_RANKING_KEY, [label], add_to_output=True)
+            # Entities from earlier extractors (e.g. regexes) are kept, as DIET would
+            message.set(ENTITIES, message.get(ENTITIES, []), add_to_output=True)
+            logger.debug("Fast path %s match for %r: %s", match.kind, message.get(TEXT), match.intent)
+
+        if misses:
+            self._wait_for_model()
+            super().process(misses)
+        return messages
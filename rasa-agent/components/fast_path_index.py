@@ -0,0 +1,130 @@
+"""
+Lookup index for the NLU fast path
+
+Maps normalized training examples to their intents, first by exact hash of
+the normalized text and then by cosine similarity of sparse word and
+word-bigram vectors through an inverted index. Only intents whose examples
+carry no entity annotations are indexed, so a fast-path hit never loses an
+entity DIET would have extracted. Pure Python, so it loads without
+TensorFlow and can be benchmarked on its own.
+"""
+
+import math
+import re
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Set, Text, Tuple
+
+# Minimum cosine similarity for a near-exact match
+DEFAULT_THRESHOLD = 0.9
+# The runner-up intent must score at least this much lower
+DEFAULT_MARGIN = 0.1
+INDEX_VERSION = 1
+
+_NON_WORD = re.compile(r"[^\w']+")
+
+
+def normalize(text: Text) -> Text:
+    """Lowercase, drop punctuation and collapse whitespace."""
+    return " ".join(_NON_WORD.sub(" ", text.lower()).split())
+
+
+def _terms(normalized: Text) -> Dict[Text, float]:
+    words = normalized.split()
+    counts: Dict[Text, float] = defaultdict(float)
+    for word in words:
+        counts[word] += 1.0
+    for first, second in zip(words, words[1:]):
+        counts[f"{first} {second}"] += 1.0
+    norm = math.sqrt(sum(count * count for count in counts.values()))
+    return {term: count / norm for term, count in counts.items()} if norm else {}
+
+
+class FastPathMatch(NamedTuple):
+    intent: Text
+    confidence: float
+    kind: Text  # "exact" or "near"
+
+
+class TrainingExample(NamedTuple):
+    text: Text
+    intent: Text
+    has_entities: bool = False
+
+
+class FastPathIndex:
+    def __init__(self,
+                 exact: Dict[Text, Text],
+                 examples: List[Tuple[Text, Dict[Text, float]]],
+                 threshold: float = DEFAULT_THRESHOLD,
+                 margin: float = DEFAULT_MARGIN):
+        self.exact = exact
+        self.examples = examples
+        self.threshold = threshold
+        self.margin = margin
+        self._postings: Dict[Text, List[Tuple[int, float]]] = defaultdict(list)
+        for example_id, (_, vector) in enumerate(examples):
+            for term, weight in vector.items():
+                self._postings[term].append((example_id, weight))
+
+    @classmethod
+    def build(cls,
+              training_examples: Iterable[TrainingExample],
+              threshold: float = DEFAULT_THRESHOLD,
+              margin: float = DEFAULT_MARGIN) -> "FastPathIndex":
+        training_examples = list(training_examples)
+        with_entities: Set[Text] = {example.intent for example in training_examples if example.has_entities}
+
+        by_text: Dict[Text, Set[Text]] = defaultdict(set)
+        for example in training_examples:
+            normalized = normalize(example.text)
+            if normalized and example.intent not in with_entities:
+                by_text[normalized].add(example.intent)
+
+        # Texts labelled with more than one intent are left to DIET
+        exact = {text: next(iter(intents)) for text, intents in by_text.items() if len(intents) == 1}
+        examples = [(intent, _terms(text)) for text, intent in sorted(exact.items())]
+        return cls(exact, examples, threshold, margin)
+
+    def lookup(self, text: Text) -> Optional[FastPathMatch]:
+        normalized = normalize(text)
+        if not normalized:
+            return None
+        intent = self.exact.get(normalized)
+        if intent is not None:
+            return FastPathMatch(intent, 1.0, "exact")
+
+        scores: Dict[int, float] = defaultdict(float)
+        for term, weight in _terms(normalized).items():
+            for example_id, example_weight in self._postings.get(term, ()):
+                scores[example_id] += weight * example_weight
+        if not scores:
+            return None
+
+        best: Dict[Text, float] = {}
+        for example_id, score in scores.items():
+            intent = self.examples[example_id][0]
+            if score > best.get(intent, 0.0):
+                best[intent] = score
+        ranked = sorted(best.items(), key=lambda item: -item[1])
+        intent, score = ranked[0]
+        runner_up = ranked[1][1] if len(ranked) > 1 else 0.0
+        if score < self.threshold or score - runner_up < self.margin:
+            return None
+        return FastPathMatch(intent, min(score, 1.0), "near")
+
+    def to_dict(self) -> Dict[Text, Any]:
+        return {"version": INDEX_VERSION, "threshold": self.threshold, "margin": self.margin,
+                "exact": self.exact}
+
+    @classmethod
+    def from_dict(cls, data: Dict[Text, Any],
+                  threshold: Optional[float] = None,
+                  margin: Optional[float] = None) -> "FastPathIndex":
+        """Rebuild an index; vectors are recomputed from the stored texts."""
+        if data.get("version") != INDEX_VERSION:
+            raise ValueError(f"Unsupported fast path index version: {data.get('version')}")
+        exact = data["exact"]
+        examples = [(intent, _terms(text)) for text, intent in sorted(exact.items())]
+        return cls(exact, examples,
+                   data["threshold"] if threshold is None else threshold,
+                   data["margin"] if margin is None else margin)
@@ -0,0 +1,248 @@
+"""
+Load generator for the Rasa REST webhook
+
+Simulates concurrent users playing scripted conversations from
+data/stories.yml against /webhooks/rest/webhook at a target request rate,
+then reports per-turn latency percentiles, error rate and throughput. Results
+are saved as JSON and can be compared against a baseline run.
+
+Usage:
+    python -m loadtest --users 50 --rps 20 --duration 60 --output results.json
+    python -m loadtest --story "book demo and capture info" --baseline baseline.json
+    python -m loadtest --stub-port 8090   # also serve the offline MiniMax/backend stub
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import random
+import sys
+import time
+import uuid
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Sequence, Text
+
+import aiohttp
+from aiohttp import web
+
+from actions.rate_limit import RateLimiter
+
+from .scenarios import Scenario, load_scenarios
+from .stub import add_profile_arguments, create_app as create_stub_app, profiles_from_args
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WEBHOOK_URL = "http://localhost:5005/webhooks/rest/webhook"
+PERCENTILES = (50, 90, 95, 99)
+# Latency metrics checked against the baseline
+COMPARED_METRICS = ("p50_ms", "p95_ms", "p99_ms")
+# Turns with fewer samples than this are too noisy to flag
+MIN_COMPARED_REQUESTS = 20
+
+
+def percentile(sorted_values: Sequence[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted sequence."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(pct / 100.0 * len(sorted_values) + 0.5)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def summarize(latencies: List[float], errors: int) -> Dict[Text, Any]:
+    latencies = sorted(latencies)
+    total = len(latencies) + errors
+    summary: Dict[Text, Any] = {
+        "requests": total,
+        "errors": errors,
+        "error_rate": round(errors / total, 4) if total else 0.0,
+    }
+    for pct in PERCENTILES:
+        summary[f"p{pct}_ms"] = round(percentile(latencies, pct) * 1000, 2)
+    summary["max_ms"] = round(latencies[-1] * 1000, 2) if latencies else 0.0
+    summary["mean_ms"] = round(sum(latencies) / len(latencies) * 1000, 2) if latencies else 0.0
+    return summary
+
+
+async def run_load(url: Text,
+                   scenarios: List[Scenario],
+                   users: int,
+                   rps: float,
+                   duration: float,
+                   think_time: float = 0.0,
+                   timeout: float = 30.0,
+                   seed: Optional[int] = None) -> Dict[Text, Any]:
+    """Drive the webhook for duration seconds and return the aggregated results."""
+    rng = random.Random(seed)
+    limiter = RateLimiter(rps)
+    run_id = uuid.uuid4().hex[:8]
+
+    latencies: Dict[Text, List[float]] = defaultdict(list)
+    errors: Dict[Text, int] = defaultdict(int)
+    error_kinds: Dict[Text, int] = defaultdict(int)
+    conversations = 0
+
+    started = time.monotonic()
+    deadline = started + duration
+    connector = aiohttp.TCPConnector(limit=max(1, users))
+    client_timeout = aiohttp.ClientTimeout(total=timeout)
+
+    async def user(index: int, session: aiohttp.ClientSession) -> None:
+        nonlocal conversations
+        number = 0
+        while time.monotonic() < deadline:
+            scenario = rng.choice(scenarios)
+            sender = f"loadtest-{run_id}-{index}-{number}"
+            number += 1
+            for turn_index, turn in enumerate(scenario.turns, 1):
+                await limiter.acquire()
+                if time.monotonic() >= deadline:
+                    return
+                key = f"{scenario.name} [{turn_index}] {turn.intent}"
+                payload = {"sender": sender, "message": rng.choice(turn.examples)}
+                request_start = time.perf_counter()
+                try:
+                    async with session.post(url, json=payload, timeout=client_timeout) as response:
+                        await response.read()
+                        if response.status != 200:
+                            raise aiohttp.ClientResponseError(
+                                response.request_info, response.history, status=response.status)
+                    latencies[key].append(time.perf_counter() - request_start)
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    errors[key] += 1
+                    kind = f"HTTP {e.status}" if isinstance(e, aiohttp.ClientResponseError) else type(e).__name__
+                    error_kinds[kind] += 1
+                    break  # The rest of this conversation would run against a broken tracker
+                if think_time:
+                    await asyncio.sleep(rng.uniform(0, 2 * think_time))
+            else:
+                conversations += 1
+
+    async with aiohttp.ClientSession(connector=connector) as session:
+        await asyncio.gather(*(user(index, session) for index in range(users)))
+    elapsed = time.monotonic() - started
+
+    turns = {key: summarize(latencies.get(key, []), errors.get(key, 0))
+             for key in sorted(set(latencies) | set(errors))}
+    overall = summarize([value for values in latencies.values() for value in values], sum(errors.values()))
+    overall["throughput_rps"] = round(overall["requests"] / elapsed, 2) if elapsed else 0.0
+    overall["conversations"] = conversations
+    overall["error_kinds"] = dict(error_kinds)
+
+    return {
+        "meta": {
+            "url": url,
+            "users": users,
+            "target_rps": rps,
+            "duration_seconds": round(elapsed, 2),
+            "scenarios": [scenario.name for scenario in scenarios],
+            "started_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        },
+        "overall": overall,
+        "turns": turns,
+    }
+
+
+def compare(results: Dict[Text, Any], baseline: Dict[Text, Any], threshold: float) -> List[Text]:
+    """Return a line per latency metric that regressed by more than threshold (a fraction)."""
+    regressions = []
+    sections = [("overall", results["overall"], baseline.get("overall") or {})]
+    sections += [(key, summary, (baseline.get("turns") or {}).get(key) or {})
+                 for key, summary in results["turns"].items()]
+
+    for name, current, previous in sections:
+        if min(current.get("requests", 0), previous.get("requests", 0)) < MIN_COMPARED_REQUESTS:
+            continue
+        for metric in COMPARED_METRICS:
+            before, after = previous.get(metric), current.get(metric)
+            if not before or after is None:
+                continue
+            change = (after - before) / before
+            if change > threshold:
+                regressions.append(f"{name}: {metric} {before:.1f} -> {after:.1f} ms (+{change:.0%})")
+
+    before, after = (baseline.get("overall") or {}).get("error_rate"), results["overall"]["error_rate"]
+    if before is not None and after > before + 0.01:
+        regressions.append(f"overall: error_rate {before:.2%} -> {after:.2%}")
+    return regressions
+
+
+def print_report(results: Dict[Text, Any]) -> None:
+    overall = results["overall"]
+    print(f"{'turn':<60} {'reqs':>6} {'err%':>6} {'p50':>8} {'p95':>8} {'p99':>8}")
+    for key, summary in results["turns"].items():
+        print(f"{key[:60]:<60} {summary['requests']:>6} {summary['error_rate'] * 100:>6.1f} "
+              f"{summary['p50_ms']:>8.1f} {summary['p95_ms']:>8.1f} {summary['p99_ms']:>8.1f}")
+    print(f"\n{overall['requests']} requests, {overall['conversations']} conversations in "
+          f"{results['meta']['duration_seconds']}s ({overall['throughput_rps']} req/s), "
+          f"error rate {overall['error_rate']:.2%}")
+    print(f"Latency ms: p50 {overall['p50_ms']}  p90 {overall['p90_ms']}  p95 {overall['p95_ms']}  "
+          f"p99 {overall['p99_ms']}  max {overall['max_ms']}")
+    if overall["error_kinds"]:
+        print("Errors: " + ", ".join(f"{kind} x{count}" for kind, count in overall["error_kinds"].items()))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Load test the Rasa REST webhook with scripted stories")
+    parser.add_argument("--url", default=DEFAULT_WEBHOOK_URL, help="Rasa REST webhook URL")
+    parser.add_argument("--stories", default="data/stories.yml")
+    parser.add_argument("--nlu", default="data/nlu.yml")
+    parser.add_argument("--story", action="append", help="Only run this story (repeatable)")
+    parser.add_argument("--users", type=int, default=10, help="Concurrent simulated senders")
+    parser.add_argument("--rps", type=float, default=10.0, help="Target requests per second (0 for no limit)")
+    parser.add_argument("--duration", type=float, default=30.0, help="Test length in seconds")
+    parser.add_argument("--think-time", type=float, default=0.0, help="Mean pause between turns in seconds")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Per-request timeout in seconds")
+    parser.add_argument("--seed", type=int, help="Seed for story and message selection")
+    parser.add_argument("--output", help="Write results JSON here")
+    parser.add_argument("--baseline", help="Compare against a previous results JSON")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="Allowed latency increase over the baseline (fraction)")
+    parser.add_argument("--stub-port", type=int, help="Also serve the offline MiniMax/backend stub on this port")
+    add_profile_arguments(parser, prefix="stub-")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    try:
+        stub_profile, stub_overrides = profiles_from_args(args, prefix="stub-")
+    except argparse.ArgumentTypeError as e:
+        parser.error(str(e))
+    scenarios = load_scenarios(args.stories, args.nlu, args.story)
+    if not scenarios:
+        parser.error("No runnable stories found")
+
+    async def run() -> Dict[Text, Any]:
+        runner = None
+        if args.stub_port:
+            runner = web.AppRunner(create_stub_app(profile=stub_profile, overrides=stub_overrides), access_log=None)
+            await runner.setup()
+            await web.TCPSite(runner, "127.0.0.1", args.stub_port).start()
+            logger.info("Stub listening on 127.0.0.1:%d", args.stub_port)
+        try:
+            return await run_load(args.url, scenarios, args.users, args.rps, args.duration,
+                                  args.think_time, args.timeout, args.seed)
+        finally:
+            if runner is not None:
+                await runner.cleanup()
+
+    results = asyncio.run(run())
+    print_report(results)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        logger.info("Results written to %s", args.output)
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        if regressions:
+            print("\nRegressions against baseline:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print("\nNo regressions against baseline")
+
+
+if __name__ == "__main__":
+    main()
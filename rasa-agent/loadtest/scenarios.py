@@ -0,0 +1,77 @@
+"""
+Conversation scenarios for load testing
+Turns the stories in data/stories.yml into scripted user turns, using the
+NLU training examples of each intent as the messages a user would send.
+"""
+
+import re
+from typing import Dict, List, NamedTuple, Optional, Sequence, Text
+
+import yaml
+
+# [John Doe](name) -> John Doe
+ENTITY_ANNOTATION = re.compile(r"\[([^\]]+)\]\([^)]*\)|\[([^\]]+)\]\{[^}]*\}")
+
+
+class Turn(NamedTuple):
+    intent: Text
+    examples: List[Text]
+
+
+class Scenario(NamedTuple):
+    name: Text
+    turns: List[Turn]
+
+
+def strip_annotations(example: Text) -> Text:
+    return ENTITY_ANNOTATION.sub(lambda m: m.group(1) or m.group(2), example).strip()
+
+
+def load_examples(nlu_path: Text) -> Dict[Text, List[Text]]:
+    """Map each intent in an NLU file to its plain-text examples."""
+    with open(nlu_path, "r", encoding="utf-8") as f:
+        nlu = yaml.safe_load(f) or {}
+
+    examples: Dict[Text, List[Text]] = {}
+    for entry in nlu.get("nlu") or []:
+        if "intent" not in entry:
+            continue
+        lines = [line.strip() for line in (entry.get("examples") or "").splitlines()]
+        examples[entry["intent"]] = [strip_annotations(line[2:]) for line in lines if line.startswith("- ")]
+    return examples
+
+
+def load_scenarios(stories_path: Text,
+                   nlu_path: Text,
+                   names: Optional[Sequence[Text]] = None) -> List[Scenario]:
+    """
+    Build one scenario per story (optionally only those named), skipping
+    stories whose intents have no NLU examples to send.
+    """
+    examples = load_examples(nlu_path)
+    with open(stories_path, "r", encoding="utf-8") as f:
+        stories = yaml.safe_load(f) or {}
+
+    scenarios = []
+    for story in stories.get("stories") or []:
+        if names and story["story"] not in names:
+            continue
+        turns = []
+        for step in story.get("steps") or []:
+            # "or" steps accept any of several intents; the first is enough
+            intent = step.get("intent") or next(
+                (option["intent"] for option in step.get("or") or [] if "intent" in option), None)
+            if intent is None:
+                continue
+            if not examples.get(intent):
+                turns = []
+                break
+            turns.append(Turn(intent, examples[intent]))
+        if turns:
+            scenarios.append(Scenario(story["story"], turns))
+
+    if names:
+        missing = set(names) - {scenario.name for scenario in scenarios}
+        if missing:
+            raise ValueError(f"Unknown or unusable stories: {', '.join(sorted(missing))}")
+    return scenarios
@@ -0,0 +1,359 @@
+"""
+Offline stand-ins for MiniMax and the backend
+
+Serves /v1/t2a_v2 (plain and SSE streaming) and the v1 /v1/t2a endpoint with
+silent MP3 audio sized like real speech, and accepts leads on /api/leads and
+/api/leads/bulk, so the action server, benchmarks and load tests run without
+network access or API credits.
+
+Latency follows a configurable distribution and faults can be injected per
+endpoint: HTTP errors, MiniMax API errors (HTTP 200 with a non-zero
+base_resp.status_code) and hung requests. Profiles can be changed while the
+stub runs with POST /stub/config, e.g. to slow one endpoint mid-test.
+
+Usage:
+    python -m loadtest.stub --port 8090 --latency-ms 300
+    python -m loadtest.stub --latency-dist lognormal --latency-ms 800 --sigma 0.6 \\
+        --error-rate 0.02 --override /v1/t2a_v2:latency_ms=4000
+    MINIMAX_API_URL=http://localhost:8090/v1/t2a_v2 BACKEND_URL=http://localhost:8090 \\
+        MINIMAX_API_KEY=stub MINIMAX_GROUP_ID=stub rasa run actions
+
+    curl -X POST localhost:8090/stub/config -d '{"path": "/v1/t2a_v2", "error_rate": 1}'
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import math
+import random
+from typing import Any, Dict, NamedTuple, Optional, Text
+
+from aiohttp import web
+
+logger = logging.getLogger(__name__)
+
+# One silent MPEG-1 Layer III frame: 128 kbps, 32 kHz, mono (576 bytes, 36 ms)
+SILENT_FRAME = bytes.fromhex("fffb98c4") + bytes(572)
+FRAME_SECONDS = 0.036
+# Rough speaking rate used to size the returned audio
+CHARS_PER_SECOND = 15.0
+STREAM_CHUNK_FRAMES = 28
+
+LATENCY_DISTRIBUTIONS = ("fixed", "uniform", "normal", "lognormal", "pareto")
+# MiniMax "rate limit exceeded"
+DEFAULT_API_ERROR_CODE = 1002
+# How long a hung request waits before answering; longer than any client timeout
+HANG_SECONDS = 300.0
+
+
+def silent_audio(text: str) -> bytes:
+    return SILENT_FRAME * _frame_count(text)
+
+
+def _frame_count(text: str) -> int:
+    return max(1, int(len(text) / CHARS_PER_SECOND / FRAME_SECONDS))
+
+
+class EndpointProfile(NamedTuple):
+    """
+    Latency and fault settings for one endpoint. latency_ms is the mean
+    (fixed, uniform, normal), the median (lognormal) or the minimum
+    (pareto); jitter_ms is the uniform half-width or normal standard
+    deviation; sigma is the lognormal shape or the pareto tail index.
+    """
+    distribution: Text = "uniform"
+    latency_ms: float = 0.0
+    jitter_ms: float = 0.0
+    sigma: float = 0.5
+    error_rate: float = 0.0
+    error_status: int = 503
+    api_error_rate: float = 0.0
+    api_error_code: int = DEFAULT_API_ERROR_CODE
+    hang_rate: float = 0.0
+    # Pause between SSE chunks, to pace streaming like real synthesis
+    stream_chunk_ms: float = 0.0
+
+    def sample_latency(self) -> float:
+        """Seconds to wait before answering."""
+        if self.distribution == "fixed":
+            latency = self.latency_ms
+        elif self.distribution == "normal":
+            latency = random.gauss(self.latency_ms, self.jitter_ms)
+        elif self.distribution == "lognormal":
+            latency = random.lognormvariate(math.log(max(self.latency_ms, 1e-3)), self.sigma)
+        elif self.distribution == "pareto":
+            latency = self.latency_ms * random.paretovariate(max(self.sigma, 1e-3))
+        else:
+            latency = self.latency_ms + random.uniform(-self.jitter_ms, self.jitter_ms)
+        return max(0.0, latency) / 1000
+
+    def pick_fault(self) -> Optional[Text]:
+        """None, "hang", "http" or "api", drawn from the configured rates."""
+        draw = random.random()
+        for fault, rate in (("hang", self.hang_rate), ("http", self.error_rate), ("api", self.api_error_rate)):
+            if draw < rate:
+                return fault
+            draw -= rate
+        return None
+
+    def updated(self, changes: Dict[Text, Any]) -> "EndpointProfile":
+        """A copy with changes applied, coerced to the field types; raises ValueError on bad input."""
+        unknown = set(changes) - set(self._fields)
+        if unknown:
+            raise ValueError(f"Unknown profile fields: {', '.join(sorted(unknown))}")
+        values = {name: type(getattr(self, name))(value) for name, value in changes.items()}
+        if values.get("distribution", self.distribution) not in LATENCY_DISTRIBUTIONS:
+            raise ValueError(f"Unknown latency distribution: {values['distribution']}")
+        return self._replace(**values)
+
+
+class StubState:
+    def __init__(self, profile: EndpointProfile, overrides: Optional[Dict[Text, EndpointProfile]] = None):
+        self.default = profile
+        self.overrides: Dict[Text, EndpointProfile] = dict(overrides or {})
+        self.leads = 0
+        self.tts_requests = 0
+        self.faults = 0
+
+    def profile(self, path: Text) -> EndpointProfile:
+        return self.overrides.get(path, self.default)
+
+    async def delay(self, profile: EndpointProfile) -> None:
+        latency = profile.sample_latency()
+        if latency > 0:
+            await asyncio.sleep(latency)
+
+    async def fault_response(self, profile: EndpointProfile) -> Optional[web.Response]:
+        """Wait out the sampled latency and return an injected failure, if one was drawn."""
+        fault = profile.pick_fault()
+        if fault == "hang":
+            self.faults += 1
+            await asyncio.sleep(HANG_SECONDS)
+        await self.delay(profile)
+        if fault == "http":
+            self.faults += 1
+            return web.json_response({"error": "injected failure"}, status=profile.error_status)
+        if fault == "api":
+            self.faults += 1
+            return web.json_response({"base_resp": {"status_code": profile.api_error_code,
+                                                    "status_msg": "injected API error"}})
+        return None
+
+
+def _base_resp() -> dict:
+    return {"status_code": 0, "status_msg": "success"}
+
+
+def _extra_info(text: str, audio_size: int) -> dict:
+    return {
+        "audio_length": int(audio_size / len(SILENT_FRAME) * FRAME_SECONDS * 1000),
+        "audio_size": audio_size,
+        "audio_format": "mp3",
+        "usage_characters": len(text),
+    }
+
+
+async def handle_t2a_v2(request: web.Request) -> web.StreamResponse:
+    state: StubState = request.app["state"]
+    profile = state.profile(request.path)
+    body = await request.json()
+    text = body.get("text") or ""
+    state.tts_requests += 1
+
+    failure = await state.fault_response(profile)
+    if failure is not None:
+        return failure
+
+    audio = silent_audio(text)
+    extra_info = _extra_info(text, len(audio))
+
+    if not body.get("stream"):
+        return web.json_response({
+            "data": {"audio": audio.hex(), "status": 2},
+            "extra_info": extra_info,
+            "trace_id": "stub",
+            "base_resp": _base_resp(),
+        })
+
+    response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+    await response.prepare(request)
+    step = len(SILENT_FRAME) * STREAM_CHUNK_FRAMES
+    for offset in range(0, len(audio), step):
+        event = {"data": {"audio": audio[offset:offset + step].hex(), "status": 1},
+                 "trace_id": "stub", "base_resp": _base_resp()}
+        await response.write(f"data: {json.dumps(event)}\n\n".encode())
+        await asyncio.sleep(profile.stream_chunk_ms / 1000)
+    final = {"data": {"audio": audio.hex(), "status": 2}, "extra_info": extra_info,
+             "trace_id": "stub", "base_resp": _base_resp()}
+    await response.write(f"data: {json.dumps(final)}\n\n".encode())
+    await response.write_eof()
+    return response
+
+
+async def handle_t2a(request: web.Request) -> web.Response:
+    """v1 endpoint: answers with a URL to download the audio from, like the real API."""
+    state: StubState = request.app["state"]
+    profile = state.profile(request.path)
+    body = await request.json()
+    text = body.get("text") or ""
+    state.tts_requests += 1
+
+    failure = await state.fault_response(profile)
+    if failure is not None:
+        return failure
+
+    frames = _frame_count(text)
+    return web.json_response({
+        "audio_file": str(request.url.with_path(f"/stub/audio/{frames}.mp3")),
+        "extra_info": _extra_info(text, frames * len(SILENT_FRAME)),
+        "trace_id": "stub",
+        "base_resp": _base_resp(),
+    })
+
+
+async def handle_audio_file(request: web.Request) -> web.Response:
+    frames = int(request.match_info["frames"])
+    return web.Response(body=SILENT_FRAME * frames, content_type="audio/mpeg")
+
+
+async def handle_lead(request: web.Request) -> web.Response:
+    state: StubState = request.app["state"]
+    await request.json()
+    failure = await state.fault_response(state.profile(request.path))
+    if failure is not None:
+        return failure
+    state.leads += 1
+    return web.json_response({"inserted": 1}, status=201)
+
+
+async def handle_lead_bulk(request: web.Request) -> web.Response:
+    state: StubState = request.app["state"]
+    body = await request.json()
+    failure = await state.fault_response(state.profile(request.path))
+    if failure is not None:
+        return failure
+    count = len(body.get("leads") or [])
+    state.leads += count
+    return web.json_response({"inserted": count}, status=201)
+
+
+async def handle_health(request: web.Request) -> web.Response:
+    state: StubState = request.app["state"]
+    return web.json_response({"status": "ok", "tts_requests": state.tts_requests,
+                              "leads": state.leads, "faults": state.faults})
+
+
+def _config_json(state: StubState) -> Dict[Text, Any]:
+    return {"default": state.default._asdict(),
+            "overrides": {path: profile._asdict() for path, profile in state.overrides.items()}}
+
+
+async def handle_get_config(request: web.Request) -> web.Response:
+    return web.json_response(_config_json(request.app["state"]))
+
+
+async def handle_set_config(request: web.Request) -> web.Response:
+    """
+    POST /stub/config - change a profile at runtime. With "path" the change
+    applies to that endpoint only ({"path": ..., "reset": true} removes its
+    override); without it the default profile changes.
+    """
+    state: StubState = request.app["state"]
+    changes = await request.json()
+    path = changes.pop("path", None)
+    try:
+        if path is None:
+            state.default = state.default.updated(changes)
+        elif changes.pop("reset", False):
+            state.overrides.pop(path, None)
+        else:
+            state.overrides[path] = state.profile(path).updated(changes)
+    except (TypeError, ValueError) as e:
+        return web.json_response({"error": str(e)}, status=400)
+    return web.json_response(_config_json(state))
+
+
+def create_app(latency_ms: float = 0.0,
+               jitter_ms: float = 0.0,
+               profile: Optional[EndpointProfile] = None,
+               overrides: Optional[Dict[Text, EndpointProfile]] = None) -> web.Application:
+    app = web.Application()
+    app["state"] = StubState(profile or EndpointProfile(latency_ms=latency_ms, jitter_ms=jitter_ms), overrides)
+    app.router.add_post("/v1/t2a_v2", handle_t2a_v2)
+    app.router.add_post("/v1/t2a", handle_t2a)
+    app.router.add_get("/stub/audio/{frames:\\d+}.mp3", handle_audio_file)
+    app.router.add_post("/api/leads", handle_lead)
+    app.router.add_post("/api/leads/bulk", handle_lead_bulk)
+    app.router.add_get("/health", handle_health)
+    app.router.add_get("/stub/config", handle_get_config)
+    app.router.add_post("/stub/config", handle_set_config)
+    return app
+
+
+def parse_override(value: Text, base: EndpointProfile) -> tuple:
+    """Parse PATH:field=value[,field=value...] into (path, profile)."""
+    path, _, assignments = value.partition(":")
+    if not path.startswith("/") or not assignments:
+        raise argparse.ArgumentTypeError(f"Expected PATH:field=value[,...], got {value!r}")
+    changes = dict(item.split("=", 1) for item in assignments.split(",") if "=" in item)
+    try:
+        return path, base.updated(changes)
+    except (TypeError, ValueError) as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def add_profile_arguments(parser: argparse.ArgumentParser, prefix: Text = "") -> None:
+    """Latency and fault flags shared by this CLI and the load test runner's embedded stub."""
+    parser.add_argument(f"--{prefix}latency-dist", choices=LATENCY_DISTRIBUTIONS, default="uniform",
+                        help="Latency distribution for every endpoint")
+    parser.add_argument(f"--{prefix}latency-ms", type=float, default=0.0,
+                        help="Mean (median for lognormal, minimum for pareto) latency per request")
+    parser.add_argument(f"--{prefix}jitter-ms", type=float, default=0.0,
+                        help="Uniform half-width or normal standard deviation")
+    parser.add_argument(f"--{prefix}sigma", type=float, default=0.5,
+                        help="Lognormal shape or pareto tail index")
+    parser.add_argument(f"--{prefix}error-rate", type=float, default=0.0, help="Share of requests answered with an HTTP error")
+    parser.add_argument(f"--{prefix}error-status", type=int, default=503)
+    parser.add_argument(f"--{prefix}api-error-rate", type=float, default=0.0,
+                        help="Share of requests answered with a MiniMax base_resp error")
+    parser.add_argument(f"--{prefix}api-error-code", type=int, default=DEFAULT_API_ERROR_CODE)
+    parser.add_argument(f"--{prefix}hang-rate", type=float, default=0.0, help="Share of requests that never answer")
+    parser.add_argument(f"--{prefix}stream-chunk-ms", type=float, default=0.0, help="Pause between streamed chunks")
+    parser.add_argument(f"--{prefix}override", action="append", default=[], metavar="PATH:FIELD=VALUE,...",
+                        help="Per-endpoint profile changes, e.g. /v1/t2a_v2:latency_ms=4000 (repeatable)")
+
+
+def profiles_from_args(args: argparse.Namespace, prefix: Text = "") -> tuple:
+    """Build (default profile, overrides) from add_profile_arguments flags."""
+    def arg(name: Text) -> Any:
+        return getattr(args, prefix.replace("-", "_") + name)
+
+    profile = EndpointProfile(arg("latency_dist"), arg("latency_ms"), arg("jitter_ms"), arg("sigma"),
+                              arg("error_rate"), arg("error_status"), arg("api_error_rate"),
+                              arg("api_error_code"), arg("hang_rate"), arg("stream_chunk_ms"))
+    overrides = dict(parse_override(value, profile) for value in arg("override"))
+    return profile, overrides
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Offline MiniMax and backend stub for load tests")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--seed", type=int, help="Seed latency and fault draws for repeatable runs")
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+
+    if args.seed is not None:
+        random.seed(args.seed)
+    try:
+        profile, overrides = profiles_from_args(args)
+    except argparse.ArgumentTypeError as e:
+        parser.error(str(e))
+
+    logging.basicConfig(level=logging.INFO)
+    web.run_app(create_app(profile=profile, overrides=overrides), host=args.host, port=args.port, access_log=None)
+
+
+if __name__ == "__main__":
+    main()
@@ -35,6 +35,10 @@ export RASA_TELEMETRY_ENABLED=false
 echo "🎯 Training ultra-lightweight model..."
 rasa train --config config-production.yml --fixed-model-name lightweight
 
+# Unpack the model once so server starts skip the archive extraction
+echo "🔥 Preparing warm-start model..."
+python warm_start.py prepare --model models/lightweight.tar.gz
+
 echo "✅ Ultra-lightweight build completed!"
 echo "📊 Model size:"
 ls -lh models/lightweight.tar.gz || echo "Model file not found"
\ No newline at end of file
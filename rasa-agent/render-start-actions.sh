@@ -19,7 +19,13 @@ export PYTHONHASHSEED=0
 export OMP_NUM_THREADS=1
 export OPENBLAS_NUM_THREADS=1
 
-# Start Rasa action server with memory optimization
-echo "Starting Rasa action server on port $PORT with memory optimization..."
-rasa run actions --port $PORT
+# Render routes only $PORT; the workers relay /audio/* from it to the audio server,
+# so audio URLs point at this service's public URL unless one is configured
+if [ -z "${AUDIO_PUBLIC_URL:-}" ] && [ -n "${RENDER_EXTERNAL_URL:-}" ]; then
+  export AUDIO_PUBLIC_URL="$RENDER_EXTERNAL_URL"
+fi
+
+# Start the action server as one supervised worker per CPU (ACTION_WORKERS overrides)
+echo "Starting Rasa action server workers on port $PORT..."
+exec python action_workers.py --port $PORT
 
@@ -36,10 +36,13 @@ if [ ! -f models/lightweight.tar.gz ]; then
     rasa train --config config-production.yml --fixed-model-name lightweight
 fi
 
+# Reuses the prepared model when it matches the archive, so this is cheap
+python warm_start.py prepare --model models/lightweight.tar.gz
+
 echo "🎯 Starting Rasa server with ultra-light configuration..."
 
-# Start with minimal resources
-exec rasa run \
+# Start with minimal resources; warm_start loads the prepared model and logs a startup breakdown
+exec python warm_start.py run \
     --enable-api \
     --cors "*" \
     --port "$PORT" \
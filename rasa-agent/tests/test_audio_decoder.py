@@ -0,0 +1,86 @@
+"""Incremental hex/base64 decoding and splitting MiniMax SSE bodies into events."""
+
+import asyncio
+import base64
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from actions.audio_decoder import detect_encoding, make_decoder
+from actions.minimax import _iter_sse_events
+
+AUDIO = b"ID3\x04" + bytes(range(256)) * 2
+
+
+def pieces(data, size):
+    return [data[start:start + size] for start in range(0, len(data), size)]
+
+
+@pytest.mark.parametrize("encoding, encoded", [
+    ("hex", AUDIO.hex().encode()),
+    ("base64", base64.b64encode(AUDIO)),
+])
+@pytest.mark.parametrize("size", [1, 3, 5, 1000])
+def test_decoding_in_pieces(encoding, encoded, size):
+    decoder = make_decoder(encoding)
+    decoded = b"".join(decoder.decode(piece) for piece in pieces(encoded, size))
+    assert decoded + decoder.finish() == AUDIO
+
+
+def test_text_pieces_and_whitespace():
+    assert make_decoder("hex").decode(" fffb ") == b"\xff\xfb"
+    decoder = make_decoder("base64")
+    assert decoder.decode("//uQ\nAA") + decoder.decode("==") == b"\xff\xfb\x90\x00"
+
+
+@pytest.mark.parametrize("encoding, data, message", [
+    ("hex", b"fffz", "Invalid hex"),
+    ("base64", b"//u!", "Invalid base64"),
+])
+def test_invalid_data(encoding, data, message):
+    with pytest.raises(ValueError, match=message):
+        make_decoder(encoding).decode(data)
+
+
+@pytest.mark.parametrize("encoding, data, message", [
+    ("hex", b"fffb9", "Odd-length"),
+    ("base64", b"//uQA", "Truncated"),
+])
+def test_truncated_data(encoding, data, message):
+    decoder = make_decoder(encoding)
+    decoder.decode(data)
+    with pytest.raises(ValueError, match=message):
+        decoder.finish()
+
+
+def test_detect_encoding():
+    assert detect_encoding(AUDIO[:32].hex()) == "hex"
+    assert detect_encoding(base64.b64encode(AUDIO[:30])) == "base64"
+    assert detect_encoding(b"//uQxAAA") == "base64"
+    with pytest.raises(ValueError, match="Unsupported"):
+        make_decoder("utf-8")
+
+
+def events(body, size):
+    async def iter_any():
+        for block in pieces(body, size):
+            yield block
+
+    async def collect():
+        response = SimpleNamespace(content=SimpleNamespace(iter_any=iter_any))
+        return [event async for event in _iter_sse_events(response)]
+    return asyncio.run(collect())
+
+
+@pytest.mark.parametrize("size", [1, 7, 100_000])
+def test_sse_events_are_split_on_newlines(size):
+    long_audio = "ff" * 100_000  # Longer than aiohttp's readline limit
+    body = (b"event: audio\r\n"
+            b"data: " + json.dumps({"data": {"audio": "fffb"}}).encode() + b"\r\n\r\n"
+            b": keep-alive\n"
+            b"data:" + json.dumps({"data": {"audio": long_audio}}).encode() + b"\n\n"
+            b"data: " + json.dumps({"data": {"status": 2}}).encode())  # No final newline
+
+    assert events(body, size) == [{"data": {"audio": "fffb"}}, {"data": {"audio": long_audio}},
+                                  {"data": {"status": 2}}]
@@ -0,0 +1,79 @@
+"""Streaming audio out of MiniMax JSON responses and generator dumps in small chunks."""
+
+import base64
+import io
+import json
+
+import pytest
+
+from actions.audio_extract import AudioExtractError, extract_audio
+
+AUDIO = bytes(range(256)) * 3
+
+
+def response(audio_string, **extra):
+    return {"data": {"audio": audio_string, "status": 2},
+            "extra_info": {"audio_length": 1234, "audio_format": "mp3"},
+            "base_resp": {"status_code": 0, "status_msg": "success"}, **extra}
+
+
+def extract(document, chunk_size=7, **kwargs):
+    sink = io.BytesIO()
+    source = io.BytesIO(json.dumps(document).encode("utf-8"))
+    result = extract_audio(source, sink, chunk_size=chunk_size, **kwargs)
+    return sink.getvalue(), result
+
+
+@pytest.mark.parametrize("audio_string, encoding", [
+    (AUDIO.hex(), "hex"),
+    (base64.b64encode(AUDIO).decode(), "base64"),
+    ("data:audio/mp3;base64," + base64.b64encode(AUDIO).decode(), "base64"),
+])
+@pytest.mark.parametrize("chunk_size", [1, 7, 64 * 1024])
+def test_audio_is_decoded_whatever_the_chunking(audio_string, encoding, chunk_size):
+    audio, result = extract(response(audio_string), chunk_size)
+    assert audio == AUDIO
+    assert (result["bytes"], result["encoding"]) == (len(AUDIO), encoding)
+    assert result["extra_info"] == {"audio_length": 1234, "audio_format": "mp3"}
+
+
+def test_dump_fields_are_collected_around_escapes():
+    dump = {"text": "say \"hi\" é中", "response": response(AUDIO.hex()),
+            "payload_used": {"voice_setting": {"voice_id": "v\\1", "speed": 0.9}, "model": "m"}}
+    audio, result = extract(dump, fields=[("payload_used",), ("response", "base_resp")])
+
+    assert audio == AUDIO
+    assert result["fields"] == {
+        ("payload_used", "voice_setting", "voice_id"): "v\\1",
+        ("payload_used", "voice_setting", "speed"): 0.9,
+        ("payload_used", "model"): "m",
+        ("response", "base_resp", "status_code"): 0,
+        ("response", "base_resp", "status_msg"): "success",
+    }
+
+
+def test_audio_into_a_buffer():
+    buffer = bytearray(len(AUDIO))
+    result = extract_audio(io.BytesIO(json.dumps(response(AUDIO.hex())).encode()), buffer, chunk_size=5)
+    assert (bytes(buffer), result["bytes"]) == (AUDIO, len(AUDIO))
+
+    with pytest.raises(AudioExtractError, match="does not fit"):
+        extract_audio(io.BytesIO(json.dumps(response(AUDIO.hex())).encode()), bytearray(10))
+
+
+def test_missing_audio_keeps_the_collected_fields():
+    failed = {"response": {"base_resp": {"status_code": 2013, "status_msg": "invalid params"}}}
+    with pytest.raises(AudioExtractError, match="No audio") as raised:
+        extract(failed, fields=[("response", "base_resp")])
+    assert raised.value.fields[("response", "base_resp", "status_code")] == 2013
+
+
+@pytest.mark.parametrize("document, message", [
+    (b'{"data": {"audio": ""}}', "empty"),
+    (b'{"data": {"audio": "fffb', "Unterminated string"),
+    (b'{"data": {"audio": "fffb"}}]', "Unbalanced"),
+    (b'{"text": "a\\', "Unterminated escape"),
+])
+def test_malformed_documents(document, message):
+    with pytest.raises(AudioExtractError, match=message):
+        extract_audio(io.BytesIO(document), io.BytesIO(), chunk_size=3)
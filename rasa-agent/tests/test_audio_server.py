@@ -0,0 +1,114 @@
+"""Serving stored blobs with ranges and seeking, and voicing the backend's replies through POST /audio/tts."""
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from aiohttp.test_utils import TestClient, TestServer
+
+from actions import audio_server
+from actions.blob_store import BlobStore
+from actions.minimax import MiniMaxUnavailableError
+
+HEADER = bytes.fromhex("fffb9000")  # MPEG-1 layer III, 128 kbit/s, 44.1 kHz: 417-byte frames of 26.12 ms
+KEY = "ab" * 32
+
+
+def frame(fill):
+    return HEADER + bytes([fill]) * 413
+
+
+def get(path, headers=None):
+    async def run():
+        async with TestClient(TestServer(audio_server.create_app())) as client:
+            response = await client.get(path, headers=headers)
+            return response.status, response.headers, await response.read()
+    return asyncio.run(run())
+
+
+@pytest.fixture
+def blob(tmp_path, monkeypatch):
+    store = BlobStore(str(tmp_path))
+    monkeypatch.setattr(audio_server, "get_blob_store", lambda: store)
+    audio = b"".join(frame(index) for index in range(10))
+    store.put(audio, KEY)
+    return audio
+
+
+def test_blob_is_served_whole_and_by_range(blob):
+    status, headers, body = get(f"/audio/blob/{KEY}")
+    assert (status, body, headers["Content-Type"]) == (200, blob, "audio/mpeg")
+    assert "immutable" in headers["Cache-Control"]
+
+    status, headers, body = get(f"/audio/blob/{KEY}", {"Range": "bytes=417-833"})
+    assert (status, body, headers["Content-Range"]) == (206, frame(1), f"bytes 417-833/{len(blob)}")
+
+
+def test_blob_is_served_from_the_frame_playing_at_t(blob):
+    status, headers, body = get(f"/audio/blob/{KEY}?t=0.1")
+    assert (status, body) == (200, blob[3 * 417:])
+    assert (headers["X-Audio-Start-Seconds"], headers["X-Audio-Duration-Seconds"]) == ("0.078", "0.261")
+
+
+@pytest.mark.parametrize("path, status", [
+    (f"/audio/blob/{KEY}?t=soon", 400),
+    ("/audio/blob/" + "cd" * 32, 404),
+])
+def test_bad_blob_requests(blob, path, status):
+    assert get(path)[0] == status
+
+
+@pytest.fixture
+def tts(monkeypatch):
+    monkeypatch.setattr(audio_server, "AUDIO_TTS_TOKEN", "secret")
+    calls = []
+
+    async def synthesize_reply(text, voice):
+        calls.append(("reply", text, voice))
+        return b"joined" if text.startswith("Thanks") else None
+
+    async def synthesize(text, voice_setting):
+        calls.append(("synthesize", text, voice_setting["voice_id"]))
+        if text == "fail":
+            raise MiniMaxUnavailableError("circuit open")
+        return SimpleNamespace(audio=memoryview(b"whole"), cache_key="key")
+
+    monkeypatch.setattr(audio_server, "synthesize_reply", synthesize_reply)
+    monkeypatch.setattr(audio_server, "synthesize", synthesize)
+    return calls
+
+
+def post(body, token="secret"):
+    async def run():
+        async with TestClient(TestServer(audio_server.create_app())) as client:
+            response = await client.post("/audio/tts", json=body, headers={"Authorization": f"Bearer {token}"})
+            return response.status, response.headers, await response.read()
+    return asyncio.run(run())
+
+
+def test_domain_response_is_voiced_from_clips(tts):
+    status, headers, audio = post({"text": " Thanks Ada. ", "voice": "Alice"})
+    assert (status, audio, headers["X-TTS-Source"]) == (200, b"joined", "prerendered")
+    assert tts == [("reply", "Thanks Ada.", "odia")]
+
+
+def test_other_text_is_synthesized_whole(tts):
+    status, headers, audio = post({"text": "Anything else", "voice": "unknown", "cache_key": "key"})
+    assert (status, audio) == (200, b"whole")
+    assert (headers["X-TTS-Source"], headers["X-TTS-Cache-Key"]) == ("synthesized", "key")
+    assert tts[-1][0] == "synthesize"
+
+
+@pytest.mark.parametrize("body, token, status", [
+    ({"text": "hello"}, "wrong", 401),
+    ({"text": "  "}, "secret", 400),
+    ({"voice": "odia"}, "secret", 400),
+    ({"text": "fail"}, "secret", 502),
+])
+def test_rejected_requests(tts, body, token, status):
+    assert post(body, token)[0] == status
+
+
+def test_endpoint_is_off_without_a_token(monkeypatch):
+    monkeypatch.setattr(audio_server, "AUDIO_TTS_TOKEN", "")
+    assert post({"text": "hello"}, "")[0] == 404
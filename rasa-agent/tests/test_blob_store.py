@@ -0,0 +1,68 @@
+"""Storing audio blobs by id, expiring them and evicting the oldest past the size limit."""
+
+import hashlib
+import os
+
+import pytest
+
+from actions.blob_store import STORE_BYTES, BlobStore
+from actions.shared_state import SharedCounters
+
+KEY = "ab" * 32
+
+
+def age(store, blob_id, seconds):
+    path = os.path.join(store.directory, blob_id + ".mp3")
+    stat = os.stat(path)
+    os.utime(path, (stat.st_atime - seconds, stat.st_mtime - seconds))
+
+
+def test_put_and_path(tmp_path):
+    store = BlobStore(str(tmp_path), max_bytes=1000, ttl_seconds=60)
+
+    assert store.put(b"audio", KEY) == KEY
+    content_id = store.put(b"other")
+    assert content_id == hashlib.sha256(b"other").hexdigest()
+    with open(store.path(KEY), "rb") as f:
+        assert f.read() == b"audio"
+    assert store.path("cd" * 32) is None
+    assert store.path("../etc/passwd") is None
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".tmp")]
+
+
+def test_invalid_id_is_refused(tmp_path):
+    with pytest.raises(ValueError, match="Invalid blob id"):
+        BlobStore(str(tmp_path)).put(b"audio", "not/an/id")
+
+
+def test_storing_again_refreshes_without_rewriting(tmp_path):
+    counters = SharedCounters()
+    store = BlobStore(str(tmp_path), max_bytes=1000, ttl_seconds=60, counters=counters)
+    store.put(b"audio", KEY)
+    age(store, KEY, 120)
+    assert store.path(KEY) is None  # Expired
+
+    store.put(b"ignored", KEY)
+    with open(store.path(KEY), "rb") as f:
+        assert f.read() == b"audio"
+    assert counters.get(STORE_BYTES) == 5
+
+
+def test_oldest_and_expired_blobs_are_evicted(tmp_path):
+    store = BlobStore(str(tmp_path), max_bytes=25, ttl_seconds=3600)
+    ids = [f"{index:064x}" for index in range(4)]
+    for index, blob_id in enumerate(ids[:3]):
+        store.put(b"x" * 10, blob_id)
+        age(store, blob_id, 100 - index)
+    age(store, ids[1], 4000)  # Expired, though not the oldest
+
+    store.put(b"x" * 10, ids[3])
+
+    assert [store.path(blob_id) is not None for blob_id in ids] == [False, False, True, True]
+    assert store._counters.get(STORE_BYTES) == 20
+
+
+def test_size_is_rebuilt_from_the_directory(tmp_path):
+    BlobStore(str(tmp_path)).put(b"audio", KEY)
+    (tmp_path / "notes.txt").write_bytes(b"not a blob")
+    assert BlobStore(str(tmp_path))._counters.get(STORE_BYTES) == 5
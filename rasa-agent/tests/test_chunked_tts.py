@@ -0,0 +1,96 @@
+"""Splitting long texts into sentences and reassembling their audio in order."""
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from actions import chunked_tts
+from actions.chunked_tts import iter_chunked_synthesis, split_text, synthesize_chunked
+
+HEADER = bytes.fromhex("fffb9000")  # MPEG-1 layer III, 128 kbit/s, 44.1 kHz: 417-byte frames
+TAG = b"ID3\x04\x00\x00\x00\x00\x00\x04" + b"\x00" * 4
+
+
+def frame(fill):
+    return HEADER + bytes([fill]) * 413
+
+
+def xing_frame():
+    body = bytearray(frame(0))
+    body[36:40] = b"Xing"
+    return bytes(body)
+
+
+@pytest.mark.parametrize("text, chunks", [
+    ("One. Two!  Three?\nFour", ["One.", "Two!", "Three?", "Four"]),
+    ('He said "stop." Then left.', ['He said "stop."', "Then left."]),
+    ("First paragraph\n\n  second\n paragraph", ["First paragraph", "second paragraph"]),
+    ("alpha beta, gamma delta, epsilon", ["alpha beta,", "gamma delta,", "epsilon"]),
+    ("abcdefghij klmnop qrstuvwxyz", ["abcdefghij", "klmnop", "qrstuvwxyz"]),
+    ("e.g. 3.5 units", ["e.g.", "3.5 units"]),
+    ("  \n\n ", []),
+])
+def test_split_text(text, chunks):
+    assert split_text(text, max_chars=16) == chunks
+
+
+@pytest.fixture
+def synthesized(monkeypatch):
+    """Fake synthesis: each chunk is a tagged MP3 whose frames carry its index; later chunks finish first."""
+    calls = SimpleNamespace(texts=[], active=0, peak=0)
+
+    async def synthesize(text, voice_setting, config):
+        index = len(calls.texts)
+        calls.texts.append(text)
+        calls.active += 1
+        calls.peak = max(calls.peak, calls.active)
+        await asyncio.sleep(0.01 * (5 - index))
+        calls.active -= 1
+        if text == "Raw.":
+            return SimpleNamespace(audio=b"not an mp3")
+        return SimpleNamespace(audio=TAG + xing_frame() + frame(index + 1) * 2)
+
+    monkeypatch.setattr(chunked_tts, "synthesize", synthesize)
+    return calls
+
+
+def test_chunks_join_into_one_stream_in_order(synthesized):
+    audio = asyncio.run(synthesize_chunked("One. Two. Three.", {"voice_id": "v"}, concurrency=2))
+
+    assert audio == TAG + frame(1) * 2 + frame(2) * 2 + frame(3) * 2
+    assert synthesized.texts == ["One.", "Two.", "Three."]
+    assert synthesized.peak == 2
+
+
+def test_chunk_that_is_not_mp3_passes_through(synthesized):
+    audio = asyncio.run(synthesize_chunked("One. Raw.", {"voice_id": "v"}))
+    assert audio == TAG + frame(1) * 2 + b"not an mp3"
+
+
+def test_failed_chunk_cancels_the_rest(monkeypatch):
+    started, cancelled = [], []
+
+    async def synthesize(text, voice_setting, config):
+        started.append(text)
+        if text == "One.":
+            raise ValueError("bad")
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(text)
+            raise
+
+    monkeypatch.setattr(chunked_tts, "synthesize", synthesize)
+
+    async def run():
+        with pytest.raises(ValueError):
+            async for _ in iter_chunked_synthesis("One. Two. Three.", {"voice_id": "v"}, concurrency=1):
+                pass
+        # Chunks still waiting for the semaphore would start here had they not been cancelled
+        await asyncio.sleep(0.05)
+
+    asyncio.run(asyncio.wait_for(run(), 1))
+    # The freed slot may let the next chunk start before the error is seen; it is cancelled too
+    assert started[0] == "One." and "Three." not in started
+    assert cancelled == started[1:]
@@ -0,0 +1,113 @@
+"""Writing, reading and recovering clip packs, and migrating generator dumps into them."""
+
+import json
+import os
+
+import pytest
+
+from actions.clip_pack import PACK_FILE, ClipPack, ClipPackError, ClipPackWriter, migrate, text_hash
+from actions.tts_cache import make_cache_key
+
+VOICE = {"voice_id": "v", "speed": 0.9, "vol": 0.8, "pitch": 0}
+AUDIO_SETTING = {"sample_rate": 32000, "bitrate": 128000, "format": "mp3"}
+
+
+def pack_with(directory, *clips):
+    with ClipPackWriter(str(directory)) as writer:
+        for text, audio in clips:
+            writer.add(text_hash(text), audio, text, duration_ms=len(audio))
+
+
+def write_dump(path, text="hello", audio=b"\xff\xfb\x90\x00" * 20, status_code=0):
+    payload = {"text": text, "voice_setting": VOICE, "audio_setting": AUDIO_SETTING, "model": "speech-02-hd"}
+    response = {"base_resp": {"status_code": status_code, "status_msg": "error" if status_code else "success"},
+                "trace_id": "trace", "extra_info": {"audio_size": len(audio), "audio_format": "mp3",
+                                                    "audio_sample_rate": 32000, "audio_length": 1234}}
+    if not status_code:
+        response["data"] = {"audio": audio.hex(), "status": 2}
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"text": text, "response": response, "generated_at": "20251031_072301",
+                   "payload_used": payload}, f, indent=2)
+    return str(path)
+
+
+def test_round_trip(tmp_path):
+    pack_with(tmp_path, ("one", b"audio-1"), ("two", b"audio-22"))
+    pack = ClipPack(str(tmp_path))
+
+    clip = pack.get(text_hash("two"), verify=True)
+    assert bytes(clip.audio) == b"audio-22"
+    assert clip.meta == {"text": "two"}
+    assert clip.duration_ms == 8
+    assert list(pack.keys()) == [text_hash("one"), text_hash("two")]
+    assert pack.get(text_hash("three")) is None
+    assert pack.get("not hex") is None
+
+
+def test_duplicate_keys_are_skipped(tmp_path):
+    pack_with(tmp_path, ("one", b"audio-1"))
+    with ClipPackWriter(str(tmp_path)) as writer:
+        assert text_hash("one") in writer
+        assert not writer.add(text_hash("one"), b"other", "one")
+    assert len(ClipPack(str(tmp_path))) == 1
+
+
+def test_empty_pack(tmp_path):
+    with ClipPackWriter(str(tmp_path)):
+        pass
+    pack = ClipPack(str(tmp_path))
+    assert len(pack) == 0
+    assert list(pack.keys()) == []
+
+
+def test_torn_record_is_cut_off_on_open(tmp_path):
+    pack_with(tmp_path, ("one", b"audio-1"))
+    path = tmp_path / PACK_FILE
+    intact = path.stat().st_size
+    with open(path, "ab") as f:
+        f.write(b"CLIP\x01")  # A writer died partway through a header
+
+    pack_with(tmp_path, ("two", b"audio-2"))
+
+    pack = ClipPack(str(tmp_path))
+    assert [bytes(pack.get(text_hash(text)).audio) for text in ("one", "two")] == [b"audio-1", b"audio-2"]
+    assert path.stat().st_size > intact
+
+
+def test_damaged_audio_fails_verification(tmp_path):
+    pack_with(tmp_path, ("one", b"audio-1"))
+    data = bytearray((tmp_path / PACK_FILE).read_bytes())
+    data[data.index(b"audio-1")] ^= 0xFF
+    (tmp_path / PACK_FILE).write_bytes(bytes(data))
+
+    with pytest.raises(ClipPackError, match="checksum"):
+        ClipPack(str(tmp_path)).get(text_hash("one"), verify=True)
+
+
+def test_missing_index_is_an_error(tmp_path):
+    (tmp_path / "clips.idx").write_bytes(b"")
+    (tmp_path / PACK_FILE).write_bytes(b"")
+    with pytest.raises(ClipPackError, match="truncated"):
+        ClipPack(str(tmp_path))
+
+
+def test_migrate_packs_dumps_under_their_cache_key(tmp_path):
+    audio = bytes(range(256)) * 4
+    dump = write_dump(tmp_path / "love_tts_1.json", "hello there", audio)
+    failed = write_dump(tmp_path / "love_tts_2.json", "broken", status_code=2013)
+    pack_dir = str(tmp_path / "pack")
+
+    stats = migrate([dump, failed], pack_dir, remove_source=True)
+
+    assert (stats["packed"], stats["skipped"]) == (1, 1)
+    key = make_cache_key("hello there", VOICE, "speech-02-hd", AUDIO_SETTING)
+    clip = ClipPack(pack_dir).get(key, verify=True)
+    assert bytes(clip.audio) == audio
+    assert (clip.sample_rate, clip.duration_ms) == (32000, 1234)
+    assert clip.meta == {"text": "hello there", "voice_setting": VOICE, "model": "speech-02-hd",
+                         "generated_at": "20251031_072301", "trace_id": "trace", "source": "love_tts_1.json"}
+    # Only the packed dump is removed
+    assert not os.path.exists(dump)
+    assert os.path.exists(failed)
+
+    assert migrate([write_dump(tmp_path / "again.json", "hello there", audio)], pack_dir)["duplicate"] == 1
@@ -0,0 +1,64 @@
+"""Exact and near-exact intent lookup of the NLU fast path index."""
+
+import pytest
+
+from components.fast_path_index import FastPathIndex, FastPathMatch, TrainingExample, normalize
+
+EXAMPLES = [
+    TrainingExample("Hello there!", "greet"),
+    TrainingExample("good morning marcy", "greet"),
+    TrainingExample("what do you offer", "inquire_services"),
+    TrainingExample("tell me about your services", "inquire_services"),
+    TrainingExample("tell me about your pricing", "pricing"),
+    TrainingExample("yes", "affirm"),
+    TrainingExample("yes", "confirm_booking"),
+    TrainingExample("my name is Ada", "provide_name", has_entities=True),
+    TrainingExample("call me back", "provide_name"),
+]
+
+
+@pytest.fixture(scope="module")
+def index():
+    return FastPathIndex.build(EXAMPLES, threshold=0.8, margin=0.1)
+
+
+def test_normalize():
+    assert normalize("  Hello,  THERE!! what's up? ") == "hello there what's up"
+    assert normalize("?!") == ""
+
+
+@pytest.mark.parametrize("text, match", [
+    ("HELLO there.", FastPathMatch("greet", 1.0, "exact")),
+    ("what do you offer?", FastPathMatch("inquire_services", 1.0, "exact")),
+    ("good morning marcy!!", FastPathMatch("greet", 1.0, "exact")),
+])
+def test_exact_hits(index, text, match):
+    assert index.lookup(text) == match
+
+
+def test_near_hit(index):
+    match = index.lookup("good morning, marcy.  good")
+    assert (match.intent, match.kind) == ("greet", "near")
+    assert 0.8 <= match.confidence < 1.0
+
+
+@pytest.mark.parametrize("text", [
+    "",
+    "something completely different",
+    "tell me about your",  # Services and pricing score the same: no margin
+    "yes",  # Labelled with two intents
+    "my name is Ada",  # provide_name has entities, so it is left to DIET
+    "call me back",
+])
+def test_misses_fall_through(index, text):
+    assert index.lookup(text) is None
+
+
+def test_round_trip(index):
+    restored = FastPathIndex.from_dict(index.to_dict())
+    assert (restored.threshold, restored.margin) == (0.8, 0.1)
+    assert restored.lookup("good morning, marcy.  good") == index.lookup("good morning, marcy.  good")
+    assert FastPathIndex.from_dict(index.to_dict(), threshold=0.99).lookup("good morning, marcy.  good") is None
+
+    with pytest.raises(ValueError, match="version"):
+        FastPathIndex.from_dict({**index.to_dict(), "version": 0})
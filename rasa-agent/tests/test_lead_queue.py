@@ -0,0 +1,181 @@
+"""Journal replay, orphan adoption and poison-batch handling of the lead queue."""
+
+import asyncio
+import json
+
+import pytest
+
+from actions import lead_queue
+from actions.lead_queue import LeadQueue, LeadRejected, orphaned_journals, worker_journal_path
+
+
+def write_journal(path, *records):
+    with open(path, "w", encoding="utf-8") as f:
+        for record in records:
+            f.write(json.dumps(record) + "\n")
+
+
+def add(lead_id, name):
+    return {"op": "add", "id": lead_id, "lead": {"name": name}}
+
+
+def read_records(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+class FakeBackend:
+    """Stands in for LeadQueue._send: rejects any batch holding a poison lead."""
+
+    def __init__(self, poison=(), failures=0):
+        self.poison = set(poison)
+        self.failures = failures
+        self.batches = []
+        self.delivered = []
+
+    async def send(self, batch):
+        ids = [record["id"] for record in batch]
+        self.batches.append(ids)
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("backend unreachable")
+        if self.poison.intersection(ids):
+            raise LeadRejected(422, "invalid phone number")
+        self.delivered.extend(ids)
+
+
+def make_queue(tmp_path, backend, **kwargs):
+    queue = LeadQueue(journal_path=str(tmp_path / "leads.jsonl"), **kwargs)
+    queue._send = backend.send
+    return queue
+
+
+def test_replay_keeps_only_unacknowledged_leads(tmp_path):
+    journal = tmp_path / "leads.jsonl"
+    write_journal(journal, add("a", "Ann"), add("b", "Bob"), add("c", "Cy"), {"op": "ack", "ids": ["b"]})
+    with open(journal, "a", encoding="utf-8") as f:
+        f.write('{"op": "add", "id": "d", "le')  # Torn final line
+
+    queue = LeadQueue(journal_path=str(journal))
+
+    assert [record["id"] for record in queue._pending] == ["a", "c"]
+    # Replay compacts the journal down to the pending leads
+    assert [record["id"] for record in read_records(journal)] == ["a", "c"]
+
+
+def test_replayed_leads_survive_a_second_restart(tmp_path):
+    journal = tmp_path / "leads.jsonl"
+    write_journal(journal, add("a", "Ann"))
+    LeadQueue(journal_path=str(journal))._journal.close()
+
+    assert len(LeadQueue(journal_path=str(journal))) == 1
+
+
+def test_flush_acknowledges_and_compacts(tmp_path):
+    backend = FakeBackend()
+    queue = make_queue(tmp_path, backend, batch_size=2)
+
+    async def run():
+        for name in ("Ann", "Bob", "Cy"):
+            await queue.enqueue({"name": name})
+        return await queue.flush()
+
+    assert asyncio.run(run())
+    assert len(backend.delivered) == 3
+    assert [len(batch) for batch in backend.batches] == [2, 1]
+    assert len(queue) == 0
+    assert read_records(tmp_path / "leads.jsonl") == []
+
+
+def test_failed_flush_keeps_leads_journaled(tmp_path):
+    backend = FakeBackend(failures=1)
+    queue = make_queue(tmp_path, backend)
+
+    async def run():
+        await queue.enqueue({"name": "Ann"})
+        return await queue.flush()
+
+    assert not asyncio.run(run())
+    queue._journal.close()
+    assert len(LeadQueue(journal_path=str(tmp_path / "leads.jsonl"))) == 1
+
+
+def test_poison_lead_is_dead_lettered_and_the_rest_delivered(tmp_path):
+    journal = tmp_path / "leads.jsonl"
+    write_journal(journal, *(add(lead_id, lead_id.upper()) for lead_id in "abcde"))
+    backend = FakeBackend(poison={"c"})
+    queue = make_queue(tmp_path, backend, batch_size=5)
+
+    assert asyncio.run(queue.flush())
+
+    assert sorted(backend.delivered) == ["a", "b", "d", "e"]
+    dead = read_records(str(journal) + ".dead")
+    assert [(entry["id"], entry["status"]) for entry in dead] == [("c", 422)]
+    assert dead[0]["lead"] == {"name": "C"}
+    assert len(queue) == 0
+    # Nothing is left to replay, so the poison lead cannot block the next start
+    queue._journal.close()
+    assert len(LeadQueue(journal_path=str(journal))) == 0
+
+
+def test_transient_error_while_splitting_keeps_undelivered_half(tmp_path):
+    journal = tmp_path / "leads.jsonl"
+    write_journal(journal, *(add(lead_id, lead_id) for lead_id in "abcd"))
+    backend = FakeBackend(poison={"a"})
+    queue = make_queue(tmp_path, backend, batch_size=4)
+
+    async def send(batch):
+        # The backend goes away once the first half has been sorted out
+        if batch[0]["id"] == "c":
+            raise ConnectionError("backend unreachable")
+        await backend.send(batch)
+
+    queue._send = send
+    assert not asyncio.run(queue.flush())
+
+    assert backend.delivered == ["b"]
+    assert [record["id"] for record in queue._pending] == ["c", "d"]
+
+
+def test_worker_journal_paths(tmp_path):
+    path = str(tmp_path / "leads.jsonl")
+    assert worker_journal_path(path, 0) == path
+    assert worker_journal_path(path, 3) == str(tmp_path / "leads.3.jsonl")
+
+
+def test_orphaned_journals_are_those_beyond_the_worker_count(tmp_path):
+    path = str(tmp_path / "leads.jsonl")
+    for index in (1, 2, 3, 10):
+        write_journal(worker_journal_path(path, index))
+    (tmp_path / "leads.x.jsonl").write_text("")
+
+    assert orphaned_journals(path, 2) == [worker_journal_path(path, index) for index in (2, 3, 10)]
+    assert orphaned_journals(str(tmp_path / "missing" / "leads.jsonl"), 1) == []
+
+
+def test_adopted_journals_are_merged_and_removed(tmp_path):
+    path = str(tmp_path / "leads.jsonl")
+    orphan = worker_journal_path(path, 2)
+    write_journal(path, add("a", "Ann"))
+    # "a" is also in the orphan, as if an earlier adoption was interrupted
+    write_journal(orphan, add("a", "Ann"), add("b", "Bob"), add("c", "Cy"), {"op": "ack", "ids": ["c"]})
+
+    queue = LeadQueue(journal_path=path, adopt=[orphan])
+
+    assert [record["id"] for record in queue._pending] == ["a", "b"]
+    assert [record["id"] for record in read_records(path)] == ["a", "b"]
+    assert not (tmp_path / "leads.2.jsonl").exists()
+
+
+@pytest.mark.parametrize("index, adopts", [(None, True), ("0", True), ("1", False)])
+def test_only_the_first_worker_adopts(tmp_path, monkeypatch, index, adopts):
+    path = str(tmp_path / "leads.jsonl")
+    orphan = worker_journal_path(path, 3)
+    write_journal(orphan, add("a", "Ann"))
+    monkeypatch.setattr(lead_queue, "LEAD_JOURNAL_PATH", path)
+    monkeypatch.setattr(lead_queue, "ACTION_WORKER_COUNT", 2)
+    monkeypatch.setattr("actions.shared_state.ACTION_WORKER_INDEX", index)
+    monkeypatch.setattr(lead_queue, "_lead_queue", None)
+    monkeypatch.setattr(lead_queue, "LeadQueue", lambda adopt: adopt)
+
+    assert lead_queue.get_lead_queue() == ([orphan] if adopts else [])
@@ -0,0 +1,180 @@
+"""Which MiniMax errors count against an endpoint, for full and streamed requests."""
+
+import asyncio
+import json
+
+import aiohttp
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from actions import minimax
+from actions.http_client import close_session
+from actions.minimax import MiniMaxAudioError, MiniMaxError, MiniMaxUnavailableError, is_endpoint_failure
+from actions.resilience import CircuitBreaker, RetryBudget
+from actions.scheduler import PRIORITY_BATCH, PRIORITY_LIVE
+from actions.shared_state import SharedCounters
+from actions.tts_cache import TTSCache
+
+VOICE = {"voice_id": "v", "speed": 1.0}
+
+
+@pytest.mark.parametrize("error, failure", [
+    (asyncio.TimeoutError(), True),
+    (aiohttp.ServerDisconnectedError(), True),
+    (aiohttp.ClientResponseError(None, (), status=503), True),
+    (aiohttp.ClientResponseError(None, (), status=400), False),
+    (aiohttp.ClientResponseError(None, (), status=429), False),
+    (MiniMaxError("internal error", 1013), True),
+    (MiniMaxError("invalid params", 2013), False),
+    (MiniMaxError("rate limited", 1002), False),
+    (MiniMaxAudioError("malformed MP3"), True),
+    (ValueError("bad hex"), False),
+])
+def test_endpoint_failures(error, failure):
+    assert is_endpoint_failure(error) is failure
+
+
+class FakeMiniMax:
+    """Local t2a_v2 (and v1 fallback) endpoint answering with canned replies."""
+
+    def __init__(self, primary, fallback=None, delay=0.0):
+        self.replies = {"/t2a_v2": primary, "/t2a": fallback}
+        self.delay = delay
+        self.calls = []
+
+    async def handle(self, request):
+        self.calls.append(request.path)
+        await asyncio.sleep(self.delay)
+        status, body = self.replies[request.path]
+        if isinstance(body, list):
+            response = web.StreamResponse(status=status)
+            await response.prepare(request)
+            for event in body:
+                await response.write(b"data: " + json.dumps(event).encode() + b"\n\n")
+            return response
+        return web.json_response(body, status=status)
+
+
+def audio(hex_audio="fffb", status=1):
+    return {"data": {"audio": hex_audio, "status": status}, "base_resp": {"status_code": 0}}
+
+
+def error(code):
+    return {"base_resp": {"status_code": code, "status_msg": "error"}}
+
+
+@pytest.fixture(autouse=True)
+def isolated(tmp_path, monkeypatch):
+    monkeypatch.setattr(minimax, "_breakers", {})
+    monkeypatch.setattr(minimax, "_retry_budget", RetryBudget(counters=SharedCounters()))
+    monkeypatch.setattr(minimax, "_lookup_cached", lambda cache_key, cache=None: None)
+    monkeypatch.setattr(minimax, "get_tts_cache", lambda: TTSCache(cache_dir=str(tmp_path), disk_bytes=0))
+    monkeypatch.setattr(minimax, "TTS_VALIDATE_AUDIO", False)
+    monkeypatch.setattr(minimax, "MINIMAX_HEDGE_ENABLED", False)
+
+
+def run_against(fake, request):
+    async def run():
+        app = web.Application()
+        app.router.add_post("/{path:.*}", fake.handle)
+        server = TestServer(app)
+        await server.start_server()
+        config = {"url": str(server.make_url("/t2a_v2")), "fallback_url": str(server.make_url("/t2a")),
+                  "api_key": "key", "group_id": "group", "model": "speech-02-hd"}
+        try:
+            return await request(config)
+        finally:
+            await close_session()
+            await server.close()
+    return asyncio.run(run())
+
+
+def synthesize(text="hello", **kwargs):
+    async def request(config):
+        return (await minimax.synthesize(text, VOICE, config, **kwargs)).audio
+    return request
+
+
+def stream(text="hello"):
+    async def request(config):
+        return [chunk async for chunk in minimax.stream_synthesize(text, VOICE, config)]
+    return request
+
+
+def outcomes(path="/t2a_v2"):
+    """Recorded call outcomes of the endpoint whose URL ends in path."""
+    return [ok for url, breaker in minimax._breakers.items() if url.endswith(path)
+            for _, ok, _ in breaker._calls]
+
+
+def test_server_error_falls_back_and_counts_against_the_primary():
+    fake = FakeMiniMax((500, {}), (200, audio()))
+    result = run_against(fake, synthesize())
+
+    assert result == b"\xff\xfb"
+    assert fake.calls == ["/t2a_v2", "/t2a"]
+    assert outcomes() == [False]
+
+
+@pytest.mark.parametrize("reply, raised", [
+    ((400, {}), aiohttp.ClientResponseError),
+    ((200, error(2013)), MiniMaxError),
+])
+def test_client_error_is_not_retried_or_counted(reply, raised):
+    fake = FakeMiniMax(reply, (200, audio()))
+    with pytest.raises(raised):
+        run_against(fake, synthesize())
+
+    assert fake.calls == ["/t2a_v2"]
+    assert outcomes() == []
+
+
+def test_stream_records_its_first_chunk():
+    fake = FakeMiniMax((200, [audio("fffb"), audio("9000"), audio("fffb9000", status=2)]))
+    chunks = run_against(fake, stream())
+
+    assert chunks == [b"\xff\xfb", b"\x90\x00"]
+    assert outcomes() == [True]
+
+
+def test_stream_server_error_counts_against_the_endpoint():
+    fake = FakeMiniMax((200, [error(1013)]))
+    with pytest.raises(MiniMaxError):
+        run_against(fake, stream())
+
+    assert outcomes() == [False]
+
+
+def test_stream_is_refused_while_the_circuit_is_open(monkeypatch):
+    breaker = CircuitBreaker("open")
+    breaker.state = CircuitBreaker.OPEN
+    breaker._opened_at = float("inf")
+    monkeypatch.setattr(minimax, "get_breaker", lambda url: breaker)
+    fake = FakeMiniMax((200, [audio()]))
+
+    with pytest.raises(MiniMaxUnavailableError):
+        run_against(fake, stream())
+    assert fake.calls == []
+
+
+@pytest.mark.parametrize("priority, calls", [
+    (PRIORITY_LIVE, ["/t2a_v2", "/t2a"]),
+    (PRIORITY_BATCH, ["/t2a_v2"]),
+])
+def test_only_live_requests_are_hedged(monkeypatch, priority, calls):
+    monkeypatch.setattr(minimax, "MINIMAX_HEDGE_ENABLED", True)
+    monkeypatch.setattr(minimax, "MINIMAX_HEDGE_DELAY_SECONDS", 0.05)
+    monkeypatch.setattr(minimax, "MINIMAX_HEDGE_MIN_DELAY_SECONDS", 0.01)
+    fake = FakeMiniMax((200, audio()), (200, audio()), delay=0.3)
+
+    assert run_against(fake, synthesize(priority=priority)) == b"\xff\xfb"
+    assert fake.calls == calls
+
+
+def test_timeout_is_per_call():
+    fake = FakeMiniMax((200, audio()), (200, audio()), delay=0.3)
+
+    assert run_against(fake, synthesize(priority=PRIORITY_BATCH, timeout=5)) == b"\xff\xfb"
+    with pytest.raises(asyncio.TimeoutError):
+        run_against(fake, synthesize("other", priority=PRIORITY_BATCH, timeout=0.1))
@@ -0,0 +1,115 @@
+"""MP3 frame parsing of complete, truncated and chunked streams."""
+
+import pytest
+
+from actions.mp3_frames import ID3V1_SIZE, Mp3FormatError, Mp3FrameParser, audio_frames, parse_mp3
+
+# MPEG-1 layer III, 128 kbit/s, 44.1 kHz, stereo: 417-byte frames of 1152 samples
+HEADER = bytes.fromhex("fffb9000")
+FRAME_LENGTH = 417
+
+
+def frame(fill=b"\x00"):
+    return HEADER + fill * (FRAME_LENGTH - len(HEADER))
+
+
+def xing_frame():
+    body = bytearray(frame())
+    body[36:40] = b"Xing"
+    return bytes(body)
+
+
+def id3v2(body_size=20):
+    size = bytes([(body_size >> shift) & 0x7F for shift in (21, 14, 7, 0)])
+    return b"ID3\x04\x00\x00" + size + b"\x00" * body_size
+
+
+def clip(frames=5):
+    return id3v2() + xing_frame() + frame() * frames
+
+
+def parse_chunked(data, chunk_size):
+    parser = Mp3FrameParser()
+    for start in range(0, len(data), chunk_size):
+        parser.feed(data[start:start + chunk_size])
+    return parser.finish()
+
+
+def test_complete_clip():
+    data = clip()
+    info = parse_mp3(data)
+
+    # The Xing frame only describes the clip, so it is not counted as audio
+    assert info.frames == 5
+    assert info.sample_rate == 44100
+    assert info.channels == 2
+    assert info.duration == pytest.approx(5 * 1152 / 44100)
+    assert info.audio_start == 30 + FRAME_LENGTH
+    assert info.audio_end == len(data)
+    assert list(info.frame_offsets) == [30 + FRAME_LENGTH * i for i in range(1, 6)]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 7, 64, FRAME_LENGTH, 4096])
+def test_chunked_parse_matches_whole_parse(chunk_size):
+    data = clip()
+    assert parse_chunked(data, chunk_size) == parse_mp3(data)
+
+
+@pytest.mark.parametrize("chunk_size", [1, 5, 4096])
+@pytest.mark.parametrize("cut, message", [
+    (FRAME_LENGTH * 3 + 100, "bytes into a frame or tag"),
+    (FRAME_LENGTH * 3 + 2, "trailing bytes"),
+    (FRAME_LENGTH * 3 + 4, "bytes into a frame or tag"),
+    (1, "trailing bytes"),
+    (20, "trailing bytes"),
+])
+def test_truncated_stream(chunk_size, cut, message):
+    data = (frame() * 4)[:cut]
+    with pytest.raises(Mp3FormatError, match=message):
+        parse_chunked(data, chunk_size)
+
+
+@pytest.mark.parametrize("data, message", [
+    (id3v2()[:5], "trailing bytes"),
+    (id3v2(100)[:60], "bytes into a frame or tag"),
+    (id3v2(), "No MPEG audio frames"),
+    (b"", "No MPEG audio frames"),
+])
+def test_truncated_or_missing_audio_after_tag(data, message):
+    with pytest.raises(Mp3FormatError, match=message):
+        parse_mp3(data)
+
+
+def test_truncated_clip_cannot_be_joined():
+    with pytest.raises(Mp3FormatError):
+        audio_frames(clip()[:-10])
+
+
+def test_lost_sync_reports_the_offset():
+    data = frame() * 2 + b"\x00" * 8 + frame()
+    with pytest.raises(Mp3FormatError, match=f"Lost frame sync at byte {FRAME_LENGTH * 2}"):
+        parse_mp3(data)
+
+
+def test_format_change_is_rejected():
+    other = bytes.fromhex("fffb9040") + b"\x00" * (FRAME_LENGTH - 4)  # Joint stereo is fine
+    parse_mp3(frame() + other)
+    resampled = bytes.fromhex("fffb9400") + b"\x00" * 400  # 48 kHz
+    with pytest.raises(Mp3FormatError, match="Invalid MPEG frame header fffb9400"):
+        parse_mp3(frame() + resampled)
+
+
+def test_id3v1_only_at_the_end():
+    tag = b"TAG" + b"\x00" * (ID3V1_SIZE - 3)
+    assert parse_mp3(frame() * 2 + tag).frames == 2
+    with pytest.raises(Mp3FormatError, match="after the ID3v1 tag"):
+        parse_mp3(frame() + tag + frame())
+    with pytest.raises(Mp3FormatError, match="bytes into a frame or tag"):
+        parse_mp3(frame() + tag[:50])
+
+
+def test_audio_frames_strips_tags_and_info_frame():
+    data = clip(3)
+    assert audio_frames(data) == frame() * 3
+    assert audio_frames(data, keep_tag=True) == id3v2() + frame() * 3
+    assert audio_frames(frame() * 3, keep_tag=True) == frame() * 3
@@ -0,0 +1,94 @@
+"""Splitting domain templates, matching bot replies back to them and voicing them from clips."""
+
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from actions import presynth
+from actions.prerendered import MANIFEST_FILE, PrerenderedAudio, ResponseMatch, split_template
+
+HEADER = bytes.fromhex("fffb9000")  # MPEG-1 layer III, 128 kbit/s, 44.1 kHz: 417-byte frames
+
+
+def frame(fill):
+    return HEADER + fill * (417 - len(HEADER))
+
+
+def static(text):
+    return {"type": "static", "text": text}
+
+
+def slot(name):
+    return {"type": "slot", "name": name}
+
+
+@pytest.mark.parametrize("template, segments", [
+    ("Hello there!", [static("Hello there!")]),
+    ("Thanks {name}. What's your business name?", [static("Thanks"), slot("name"),
+                                                   static("What's your business name?")]),
+    ("{name}, welcome back", [slot("name"), static("welcome back")]),
+    ("Call {name} on {phone}.", [static("Call"), slot("name"), static("on"), slot("phone")]),
+    ("{first}{last}", [slot("first"), slot("last")]),
+])
+def test_split_template(template, segments):
+    assert split_template(template) == segments
+
+
+def write_manifest(directory, templates, responses=None, clips=None):
+    for key, audio in (clips or {}).items():
+        (directory / f"{key}.mp3").write_bytes(audio)
+    manifest = {"version": 2, "templates": templates, "responses": responses or {},
+                "clips": {key: f"{key}.mp3" for key in clips or {}}}
+    (directory / MANIFEST_FILE).write_text(json.dumps(manifest), encoding="utf-8")
+    return PrerenderedAudio(str(directory))
+
+
+def test_replies_match_their_template(tmp_path):
+    prerendered = write_manifest(tmp_path, {
+        "utter_greet": ["Hello there!", "Hi!"],
+        "utter_thanks": ["Thanks {name}. What's your business name?"],
+        "utter_thanks_short": ["Thanks {name}."],
+        "utter_echo": ["{word} and {word} again"],
+    })
+
+    assert prerendered.match("  Hi! ") == ResponseMatch("utter_greet", 1, {})
+    assert prerendered.match("Thanks Ada  Obi. What's your business name?") == \
+        ResponseMatch("utter_thanks", 0, {"name": "Ada Obi"})
+    assert prerendered.match("Thanks Ada.") == ResponseMatch("utter_thanks_short", 0, {"name": "Ada"})
+    assert prerendered.match("yes and yes again").slots == {"word": "yes"}
+    assert prerendered.match("yes and no again") is None
+    assert prerendered.match("Something else entirely") is None
+
+
+def test_manifest_without_templates_matches_nothing(tmp_path):
+    # Written before the manifest kept its templates
+    (tmp_path / MANIFEST_FILE).write_text(json.dumps({"version": 1, "responses": {}, "clips": {}}))
+    assert PrerenderedAudio(str(tmp_path)).match("Hello there!") is None
+    assert PrerenderedAudio(str(tmp_path / "missing")).match("Hello there!") is None
+
+
+def test_reply_is_joined_from_clips_and_live_slot_values(tmp_path, monkeypatch):
+    prerendered = write_manifest(
+        tmp_path,
+        {"utter_thanks": ["Thanks {name}. What's your business name?"]},
+        responses={"utter_thanks": {"calm": [[
+            {**static("Thanks"), "key": "a" * 64}, slot("name"),
+            {**static("What's your business name?"), "key": "b" * 64}]]}},
+        clips={"a" * 64: frame(b"\x01"), "b" * 64: frame(b"\x02")})
+    synthesized = []
+
+    async def synthesize(text, voice_setting, priority):
+        synthesized.append(text)
+        return SimpleNamespace(audio=frame(b"\x03"))
+
+    monkeypatch.setattr(presynth, "get_prerendered", lambda: prerendered)
+    monkeypatch.setattr(presynth, "synthesize", synthesize)
+
+    audio = asyncio.run(presynth.synthesize_reply("Thanks Ada. What's your business name?", "calm"))
+    assert audio == frame(b"\x01") + frame(b"\x03") + frame(b"\x02")
+    assert synthesized == ["Ada"]
+    # Not rendered for this voice, or not a domain response: the caller synthesizes it whole
+    assert asyncio.run(presynth.synthesize_reply("Thanks Ada. What's your business name?", "soft")) is None
+    assert asyncio.run(presynth.synthesize_reply("Something else", "calm")) is None
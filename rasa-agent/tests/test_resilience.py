@@ -0,0 +1,188 @@
+"""State machine of the per-endpoint circuit breaker, and retries in hedged_call."""
+
+import asyncio
+
+import pytest
+
+from actions import resilience
+from actions.resilience import CircuitBreaker
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(resilience.time, "monotonic", clock)
+    return clock
+
+
+def make_breaker(**kwargs):
+    settings = dict(window_seconds=60, min_calls=4, failure_rate=0.5, slow_call_seconds=2, open_seconds=30)
+    settings.update(kwargs)
+    return CircuitBreaker("test", **settings)
+
+
+def trip(breaker):
+    for _ in range(breaker.min_calls):
+        assert breaker.allow()
+        breaker.record(False, 0.1)
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+def test_stays_closed_below_min_calls(clock):
+    breaker = make_breaker()
+    for _ in range(3):
+        breaker.record(False, 0.1)
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow()
+
+
+def test_opens_at_the_failure_rate(clock):
+    breaker = make_breaker()
+    breaker.record(True, 0.1)
+    breaker.record(True, 0.1)
+    breaker.record(False, 0.1)
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.record(False, 0.1)
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+
+
+def test_slow_calls_count_as_failures(clock):
+    breaker = make_breaker()
+    for _ in range(4):
+        breaker.record(True, 2.5)
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+def test_old_calls_leave_the_window(clock):
+    breaker = make_breaker()
+    for _ in range(3):
+        breaker.record(False, 0.1)
+    clock.now += 61
+    breaker.record(False, 0.1)
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_half_open_lets_one_probe_through(clock):
+    breaker = make_breaker()
+    trip(breaker)
+    clock.now += 29
+    assert not breaker.allow()
+
+    clock.now += 1
+    assert breaker.allow()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert not breaker.allow()
+
+
+def test_successful_probe_closes_with_a_fresh_window(clock):
+    breaker = make_breaker()
+    trip(breaker)
+    clock.now += 30
+    assert breaker.allow()
+    breaker.record(True, 0.1)
+
+    assert breaker.state == CircuitBreaker.CLOSED
+    # The failures that opened the circuit are forgotten
+    for _ in range(3):
+        breaker.record(False, 0.1)
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+@pytest.mark.parametrize("succeeded, latency", [(False, 0.1), (True, 2.5)])
+def test_failed_or_slow_probe_reopens(clock, succeeded, latency):
+    breaker = make_breaker()
+    trip(breaker)
+    clock.now += 30
+    assert breaker.allow()
+    breaker.record(succeeded, latency)
+
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+    clock.now += 30
+    assert breaker.allow()
+
+
+def test_release_returns_an_abandoned_probe(clock):
+    breaker = make_breaker()
+    trip(breaker)
+    clock.now += 30
+    assert breaker.allow()
+    breaker.release()
+
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.allow()
+    assert not breaker.allow()
+
+
+def test_release_is_a_no_op_when_closed(clock):
+    breaker = make_breaker()
+    breaker.release()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow()
+
+
+def test_latency_percentile_uses_recent_successes(clock):
+    breaker = make_breaker()
+    for latency in (0.1, 0.2, 0.3):
+        breaker.record(True, latency)
+    assert breaker.latency_percentile(95) is None
+
+    breaker.record(False, 5.0)
+    breaker.record(True, 0.4)
+    assert breaker.latency_percentile(50) == 0.2
+    assert breaker.latency_percentile(95) == 0.4
+
+    clock.now += 61
+    assert breaker.latency_percentile(95) is None
+
+
+def run_hedged(candidates, **kwargs):
+    budget = resilience.RetryBudget(counters=resilience.SharedCounters())
+    return asyncio.run(resilience.hedged_call(candidates, None, budget, **kwargs))
+
+
+def failing(error):
+    async def call():
+        raise error
+    return call
+
+
+def answering(value):
+    async def call():
+        return value
+    return call
+
+
+def test_endpoint_failure_is_retried_on_the_next_endpoint():
+    primary, fallback = make_breaker(), make_breaker()
+    result = run_hedged([(primary, failing(TimeoutError())), (fallback, answering("audio"))])
+
+    assert result == "audio"
+    assert [ok for _, ok, _ in primary._calls] == [False]
+    assert [ok for _, ok, _ in fallback._calls] == [True]
+
+
+def test_request_error_is_raised_without_retry_or_blame():
+    primary, fallback = make_breaker(), make_breaker()
+    called = []
+
+    async def fallback_call():
+        called.append(True)
+        return "audio"
+
+    with pytest.raises(ValueError):
+        run_hedged([(primary, failing(ValueError("invalid voice"))), (fallback, fallback_call)],
+                   is_failure=lambda error: not isinstance(error, ValueError))
+
+    assert not called
+    assert not primary._calls
+    assert primary.state == CircuitBreaker.CLOSED
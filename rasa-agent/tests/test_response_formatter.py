@@ -0,0 +1,37 @@
+"""Capping Marcy's responses at a word limit, singly and in batches."""
+
+import pytest
+
+from actions.response_formatter import (FALLBACK_RESPONSE, FormattedResponse, format_marcy_response,
+                                        format_marcy_responses)
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("  sure, I can help.  ", "Sure, I can help."),
+    ("One two. Three four five", "One two."),
+    ("Really? Three four five six", "Really?"),
+    ("one two three four five", "One two three."),
+    ("one two three. four five", "One two three."),
+    ("one two three four", "One two three four"),
+    ("", FALLBACK_RESPONSE),
+    ("   ", FALLBACK_RESPONSE),
+])
+def test_response_is_cut_at_the_last_sentence_that_fits(text, expected):
+    assert format_marcy_response(text, max_words=4) == expected
+
+
+def test_single_word_limit():
+    assert format_marcy_response("hello there", max_words=1) == "Hello."
+    assert format_marcy_response("Hello there", max_words=0) == FALLBACK_RESPONSE
+
+
+def test_batch_matches_single_responses_and_counts_them():
+    texts = ["  sure, I can help.  ", "One two. Three four five", "one two three four five", "", "a  b"]
+    results = format_marcy_responses(texts, max_words=4)
+
+    assert [result.text for result in results] == [format_marcy_response(text, 4) for text in texts]
+    assert results[1] == FormattedResponse("One two.", 2, 8)
+    assert results[2].words == 3
+    assert results[3] == FormattedResponse(FALLBACK_RESPONSE, len(FALLBACK_RESPONSE.split()), len(FALLBACK_RESPONSE))
+    # Whitespace inside a response that fits is kept, so characters count it
+    assert results[4] == FormattedResponse("A  b", 2, 4)
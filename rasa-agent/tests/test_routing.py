@@ -0,0 +1,92 @@
+"""Compiling tts_routes.yml, matching utterances against it and reloading it."""
+
+import os
+
+import pytest
+import yaml
+
+from actions import routing
+from actions.minimax import DEFAULT_AUDIO_SETTING, DEFAULT_MODEL
+from actions.routing import RouteLoader, RoutingTable
+from actions.tts_cache import make_cache_key
+from actions.voices import VOICE_SETTINGS
+
+CONFIG = {
+    "default_voice": "calm",
+    "routes": [
+        {"name": "love", "voice": "soft", "triggers": ["love", "true love"], "text": "About love."},
+        {"name": "hello", "voice": "Alice", "triggers": ["hello", "hi there"], "text": "Hello!"},
+        {"name": "also_love", "triggers": ["love"], "text": "Never chosen."},
+    ],
+}
+
+
+@pytest.fixture(autouse=True)
+def model(monkeypatch):
+    monkeypatch.delenv("MINIMAX_MODEL", raising=False)
+
+
+def test_routes_are_compiled_with_their_cache_keys():
+    table = RoutingTable.from_config(CONFIG)
+    love = table.routes[0]
+    assert (love.text, love.voice, table.routes[1].voice, table.routes[2].voice) == \
+        ("About love.", "soft", "odia", "calm")
+    assert love.cache_key == make_cache_key("About love.", VOICE_SETTINGS["soft"], DEFAULT_MODEL,
+                                            DEFAULT_AUDIO_SETTING)
+
+
+@pytest.mark.parametrize("utterance, route", [
+    ("Tell me about TRUE LOVE", "love"),
+    ("hello, what is love?", "hello"),
+    ("what is love? hello", "love"),
+    ("Hi there", "hello"),
+    ("nothing here", None),
+])
+def test_earliest_trigger_wins(utterance, route):
+    found = RoutingTable.from_config(CONFIG).match(utterance)
+    assert (found.name if found else None) == route
+
+
+def test_unmatched_utterance_is_spoken_as_is_in_the_default_voice():
+    route = RoutingTable.from_config({"default_voice": "soft"}).resolve("Just say this")
+    assert (route.name, route.text, route.voice, route.cache_key) == ("default", "Just say this", "soft", None)
+
+
+@pytest.mark.parametrize("config, message", [
+    ({"default_voice": "nobody"}, "default_voice"),
+    ({"routes": [{"name": "x", "voice": "nobody", "triggers": ["a"], "text": "b"}]}, "unknown voice"),
+    ({"routes": [{"name": "x", "triggers": [" "], "text": "b"}]}, "no triggers"),
+    ({"routes": [{"name": "x", "triggers": ["a"]}]}, "no text"),
+])
+def test_invalid_config(config, message):
+    with pytest.raises(ValueError, match=message):
+        RoutingTable.from_config(config)
+
+
+def write_routes(path, config, mtime):
+    path.write_text(yaml.safe_dump(config), encoding="utf-8")
+    os.utime(path, (mtime, mtime))
+
+
+def test_loader_reloads_changes_and_keeps_the_last_good_table(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(routing.time, "monotonic", lambda: now[0])
+    path = tmp_path / "tts_routes.yml"
+    write_routes(path, CONFIG, 1)
+    loader = RouteLoader(str(path), reload_seconds=5)
+    assert len(loader.get().routes) == 3
+
+    write_routes(path, {"routes": CONFIG["routes"][:1]}, 2)
+    assert len(loader.get().routes) == 3  # Not checked again yet
+    now[0] += 5
+    assert len(loader.get().routes) == 1
+
+    path.write_text("routes: [", encoding="utf-8")
+    os.utime(path, (3, 3))
+    now[0] += 5
+    assert len(loader.get().routes) == 1
+
+
+def test_missing_file_routes_nothing(tmp_path):
+    table = RouteLoader(str(tmp_path / "missing.yml")).get()
+    assert table.resolve("true love").name == "default"
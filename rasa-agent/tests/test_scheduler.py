@@ -0,0 +1,155 @@
+"""Token bucket, priority order and load shedding of the MiniMax scheduler."""
+
+import asyncio
+
+import pytest
+
+from actions import scheduler
+from actions.scheduler import PRIORITY_BATCH, PRIORITY_LIVE, RequestDropped, RequestScheduler, TokenBucket
+from actions.shared_state import SharedCounters
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(scheduler.time, "monotonic", clock)
+    return clock
+
+
+def make_scheduler(rate=100.0, burst=4.0, live_reserve=0.5, deadlines=None, queue_limits=None):
+    bucket = TokenBucket(rate=rate, burst=burst, counters=SharedCounters())
+    return RequestScheduler(
+        bucket,
+        live_reserve=live_reserve,
+        deadlines=deadlines or {PRIORITY_LIVE: 0, PRIORITY_BATCH: 0},
+        queue_limits=queue_limits or {PRIORITY_LIVE: 10, PRIORITY_BATCH: 10},
+    )
+
+
+def test_bucket_starts_full_and_refills(clock):
+    bucket = TokenBucket(rate=2, burst=3, counters=SharedCounters())
+    assert [bucket.try_take() for _ in range(3)] == [0, 0, 0]
+    assert bucket.try_take() == pytest.approx(0.5)
+
+    clock.now += 0.5
+    assert bucket.try_take() == 0
+    clock.now += 60
+    # Refill stops at the burst
+    assert [bucket.try_take() for _ in range(4)][-1] > 0
+
+
+def test_bucket_keeps_the_floor(clock):
+    bucket = TokenBucket(rate=1, burst=4, counters=SharedCounters())
+    assert bucket.try_take(floor=2) == 0
+    assert bucket.try_take(floor=2) == 0
+    assert bucket.try_take(floor=2) == pytest.approx(1.0)
+    # A caller without a floor may still use the reserve
+    assert bucket.try_take() == 0
+
+
+def test_drained_bucket_waits_for_a_full_token(clock):
+    bucket = TokenBucket(rate=4, burst=4, counters=SharedCounters())
+    bucket.drain()
+    assert bucket.try_take() == pytest.approx(0.25)
+
+
+def test_zero_rate_never_limits():
+    bucket = TokenBucket(rate=0, burst=1, counters=SharedCounters())
+    assert all(bucket.try_take() == 0 for _ in range(100))
+
+
+def test_batch_cannot_use_the_live_reserve():
+    requests = make_scheduler(rate=0.01, burst=4, live_reserve=0.5,
+                              deadlines={PRIORITY_LIVE: 0.05, PRIORITY_BATCH: 0.05})
+
+    async def run():
+        for _ in range(2):
+            await requests.acquire(PRIORITY_BATCH)
+        with pytest.raises(RequestDropped):
+            await requests.acquire(PRIORITY_BATCH)
+        for _ in range(2):
+            await requests.acquire(PRIORITY_LIVE)
+
+    asyncio.run(run())
+
+
+def test_live_requests_are_granted_before_earlier_batch_requests():
+    requests = make_scheduler(rate=200, burst=1, live_reserve=0)
+    requests.bucket.drain()
+    granted = []
+
+    async def request(priority, name):
+        await requests.acquire(priority)
+        granted.append(name)
+
+    async def run():
+        batch = [asyncio.ensure_future(request(PRIORITY_BATCH, f"batch{i}")) for i in range(2)]
+        await asyncio.sleep(0)
+        live = [asyncio.ensure_future(request(PRIORITY_LIVE, f"live{i}")) for i in range(2)]
+        await asyncio.gather(*batch, *live)
+
+    asyncio.run(run())
+    assert granted == ["live0", "live1", "batch0", "batch1"]
+
+
+def test_full_queue_drops_new_requests():
+    requests = make_scheduler(rate=0.01, burst=1, queue_limits={PRIORITY_LIVE: 1, PRIORITY_BATCH: 1})
+    requests.bucket.drain()
+
+    async def run():
+        waiting = asyncio.ensure_future(requests.acquire(PRIORITY_LIVE))
+        await asyncio.sleep(0)
+        with pytest.raises(RequestDropped, match="queue is full"):
+            await requests.acquire(PRIORITY_LIVE)
+        waiting.cancel()
+
+    asyncio.run(run())
+
+
+def test_request_that_cannot_meet_its_deadline_is_dropped_up_front():
+    requests = make_scheduler(rate=1, burst=1, deadlines={PRIORITY_LIVE: 0.5, PRIORITY_BATCH: 0})
+    requests.bucket.drain()
+
+    async def run():
+        with pytest.raises(RequestDropped, match="would wait longer"):
+            await requests.acquire(PRIORITY_LIVE)
+
+    asyncio.run(run())
+    assert requests._depth[PRIORITY_LIVE] == 0
+
+
+def test_request_that_waits_past_its_deadline_is_dropped():
+    requests = make_scheduler(rate=10, burst=1, deadlines={PRIORITY_LIVE: 0.15, PRIORITY_BATCH: 0})
+    requests.bucket.drain()
+
+    async def keep_throttled():
+        # MiniMax keeps answering with rate limits, so the bucket never refills
+        for _ in range(15):
+            requests.throttle()
+            await asyncio.sleep(0.02)
+
+    async def run():
+        throttled = asyncio.ensure_future(keep_throttled())
+        with pytest.raises(RequestDropped, match="no token within"):
+            await requests.acquire(PRIORITY_LIVE)
+        await throttled
+
+    asyncio.run(run())
+    assert requests._depth[PRIORITY_LIVE] == 0
+
+
+def test_scheduler_survives_a_new_event_loop():
+    requests = make_scheduler(rate=200, burst=1)
+
+    for _ in range(2):
+        requests.bucket.drain()
+        asyncio.run(asyncio.wait_for(requests.acquire(PRIORITY_LIVE), 1))
+    assert requests._depth[PRIORITY_LIVE] == 0
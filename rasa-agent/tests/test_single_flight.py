@@ -0,0 +1,103 @@
+"""Coalescing identical in-flight calls within a process and across processes."""
+
+import asyncio
+import multiprocessing
+
+import pytest
+
+from actions.single_flight import KeyLock, SingleFlight, fcntl
+
+
+def test_concurrent_callers_share_one_call():
+    flight = SingleFlight()
+    calls = []
+
+    async def call():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return len(calls)
+
+    async def run():
+        results = await asyncio.gather(*(flight.do("key", call) for _ in range(5)), flight.do("other", call))
+        assert not flight.joined("key")
+        return results
+
+    assert asyncio.run(run()) == [2, 2, 2, 2, 2, 2]
+    assert len(calls) == 2
+
+
+def test_error_reaches_every_caller():
+    flight = SingleFlight()
+
+    async def call():
+        await asyncio.sleep(0.01)
+        raise ValueError("bad")
+
+    async def run():
+        return await asyncio.gather(*(flight.do("key", call) for _ in range(3)), return_exceptions=True)
+
+    assert [type(result) for result in asyncio.run(run())] == [ValueError] * 3
+
+
+def test_cancelled_caller_does_not_cancel_the_call():
+    flight = SingleFlight()
+    finished = []
+
+    async def call():
+        await asyncio.sleep(0.02)
+        finished.append(True)
+        return "audio"
+
+    async def run():
+        first = asyncio.ensure_future(flight.do("key", call))
+        await asyncio.sleep(0)
+        assert flight.joined("key")
+        second = asyncio.ensure_future(flight.do("key", call))
+        await asyncio.sleep(0)
+        first.cancel()
+        return await second
+
+    assert asyncio.run(run()) == "audio"
+    assert finished == [True]
+
+
+def test_call_in_flight_on_another_loop_is_not_joined():
+    flight = SingleFlight()
+    old_loop = asyncio.new_event_loop()
+    flight._calls["key"] = old_loop.create_future()
+
+    async def call():
+        return "done"
+
+    try:
+        assert asyncio.run(asyncio.wait_for(flight.do("key", call), 1)) == "done"
+    finally:
+        old_loop.close()
+
+
+def hold(path, key, held, release):
+    lock = KeyLock(path)
+    assert lock.try_acquire(key)
+    held.set()
+    release.wait(5)
+    lock.release(key)
+
+
+@pytest.mark.skipif(fcntl is None, reason="file locks are unavailable")
+def test_key_lock_excludes_other_processes(tmp_path):
+    path = str(tmp_path / "locks")
+    held, release = multiprocessing.Event(), multiprocessing.Event()
+    holder = multiprocessing.Process(target=hold, args=(path, "key", held, release))
+    holder.start()
+    try:
+        assert held.wait(5)
+        lock = KeyLock(path)
+        assert not lock.try_acquire("key")
+        assert lock.try_acquire("other")
+        assert not asyncio.run(lock.acquire("key", timeout=0.05, poll_seconds=0.01))
+
+        release.set()
+        assert asyncio.run(lock.acquire("key", timeout=5, poll_seconds=0.01))
+    finally:
+        release.set()
+        holder.join(5)
@@ -0,0 +1,120 @@
+"""TTL expiry and eviction in both tiers of the TTS cache."""
+
+import hashlib
+import os
+
+from actions import tts_cache
+from actions.tts_cache import DISK_BYTES, TTSCache, cache_key_template, make_cache_key
+
+
+def key(name):
+    return make_cache_key(name, {"voice_id": "v"}, "model")
+
+
+def age(cache, name, seconds):
+    path = cache._path(key(name))
+    stored_at = os.path.getmtime(path) - seconds
+    os.utime(path, (stored_at, stored_at))
+
+
+def test_keys_depend_on_everything_that_changes_the_audio():
+    voice = {"voice_id": "v", "speed": 1.0, "vol": 1.0, "pitch": 0}
+    base = make_cache_key("hi", voice, "m")
+    assert make_cache_key("hi", dict(voice), "m") == base
+    assert make_cache_key("hi", {**voice, "speed": 1.1}, "m") != base
+    assert make_cache_key("hi", voice, "m", {"format": "wav"}) != base
+    assert make_cache_key("hi ", voice, "m") != base
+
+
+def test_disk_tier_serves_a_fresh_process(tmp_path):
+    TTSCache(cache_dir=str(tmp_path)).put(key("a"), b"audio")
+    assert TTSCache(cache_dir=str(tmp_path)).get(key("a")) == b"audio"
+
+
+def test_expired_disk_entry_is_a_miss_and_removed(tmp_path):
+    TTSCache(cache_dir=str(tmp_path), ttl_seconds=60).put(key("a"), b"audio")
+    cache = TTSCache(cache_dir=str(tmp_path), ttl_seconds=60)
+    age(cache, "a", 61)
+
+    assert cache.get(key("a")) is None
+    assert not os.path.exists(cache._path(key("a")))
+
+
+def test_expired_memory_entry_is_a_miss(tmp_path, monkeypatch):
+    cache = TTSCache(cache_dir=str(tmp_path), disk_bytes=0, ttl_seconds=60)
+    now = tts_cache.time.time()
+    monkeypatch.setattr(tts_cache.time, "time", lambda: now)
+    cache.put(key("a"), b"audio")
+    assert cache.get(key("a")) == b"audio"
+
+    monkeypatch.setattr(tts_cache.time, "time", lambda: now + 61)
+    assert cache.get(key("a")) is None
+    assert cache._memory_used == 0
+
+
+def test_zero_ttl_never_expires(tmp_path):
+    TTSCache(cache_dir=str(tmp_path), ttl_seconds=0).put(key("a"), b"audio")
+    cache = TTSCache(cache_dir=str(tmp_path), ttl_seconds=0)
+    age(cache, "a", 10 * 365 * 24 * 3600)
+    assert cache.get(key("a")) == b"audio"
+
+
+def test_memory_tier_evicts_least_recently_used(tmp_path):
+    cache = TTSCache(cache_dir=str(tmp_path), memory_bytes=10, disk_bytes=0)
+    cache.put(key("a"), b"aaaa")
+    cache.put(key("b"), b"bbbb")
+    cache.get(key("a"))
+    cache.put(key("c"), b"cccc")
+
+    assert cache.get(key("a")) == b"aaaa"
+    assert cache.get(key("b")) is None
+    assert cache.get(key("c")) == b"cccc"
+    assert cache._memory_used == 8
+
+
+def test_memory_tier_skips_entries_larger_than_it(tmp_path):
+    cache = TTSCache(cache_dir=str(tmp_path), memory_bytes=4, disk_bytes=0)
+    cache.put(key("a"), b"aaaaa")
+    assert cache.get(key("a")) is None
+    assert cache._memory_used == 0
+
+
+def test_disk_tier_evicts_oldest_files_past_its_limit(tmp_path):
+    cache = TTSCache(cache_dir=str(tmp_path), memory_bytes=0, disk_bytes=10)
+    cache.put(key("a"), b"aaaa")
+    age(cache, "a", 20)
+    cache.put(key("b"), b"bbbb")
+    age(cache, "b", 10)
+    cache.put(key("c"), b"cccc")
+
+    assert cache.get(key("a")) is None
+    assert cache.get(key("b")) == b"bbbb"
+    assert cache.get(key("c")) == b"cccc"
+    assert cache._counters.get(DISK_BYTES) == 8
+
+
+def test_eviction_also_drops_expired_files(tmp_path):
+    cache = TTSCache(cache_dir=str(tmp_path), memory_bytes=0, disk_bytes=10, ttl_seconds=60)
+    cache.put(key("a"), b"aa")
+    age(cache, "a", 61)
+    cache.put(key("b"), b"bbbbb")
+    cache.put(key("c"), b"ccccc")
+
+    assert not os.path.exists(cache._path(key("a")))
+    assert cache._counters.get(DISK_BYTES) == 10
+
+
+def test_overwrite_does_not_double_count_disk_usage(tmp_path):
+    cache = TTSCache(cache_dir=str(tmp_path), memory_bytes=0, disk_bytes=100)
+    cache.put(key("a"), b"aaaa")
+    cache.put(key("a"), b"aaaaaa")
+    assert cache._counters.get(DISK_BYTES) == 6
+    assert TTSCache(cache_dir=str(tmp_path))._counters.get(DISK_BYTES) == 6
+
+
+def test_key_template_renders_the_key_material():
+    voice = {"voice_id": "v", "speed": 0.9, "vol": 1.0, "pitch": 0}
+    template = cache_key_template(voice, "m", {"format": "mp3"})
+    for text in ("hi", 'quote " and \\ backslash', "naïve ☕ 😀", "ctrl \x01\n"):
+        rendered = template.render(text)
+        assert hashlib.sha256(rendered).hexdigest() == make_cache_key(text, voice, "m", {"format": "mp3"})
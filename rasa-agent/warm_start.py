@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+"""
+Warm-start serving for the Rasa server
+
+`rasa run` gunzips and untars the model archive into a fresh temporary
+directory on every start, then loads each graph component from it, and the
+TensorFlow models trace their inference functions on the first message a
+caller sends. This script moves that work out of the request path:
+
+- prepare (build time): unpack the archive once into a versioned directory
+  next to it (models/warm/<model_id>-v<format>/), with a manifest tying it to
+  the archive it came from.
+- run (container start): start `rasa run` with the model loaded straight
+  from the prepared directory (the files are read through the page cache
+  instead of being decompressed), run one warm-up parse and prediction so
+  the TF graphs are traced before traffic arrives, and log a timing
+  breakdown of the startup.
+
+An archive without a matching prepared directory is loaded the normal way,
+so a stale or missing warm directory only costs the old startup time.
+
+The loader is swapped by patching private MessageProcessor methods, so it
+is only installed on the Rasa versions listed in TESTED_RASA_VERSIONS (the
+version every requirements file pins); any other version, or
+WARM_START_ENABLED=false, runs plain `rasa run`. Components can defer their
+own heavy loading past startup: config-production.yml has the fast-path
+classifier build its DIET model in the background (lazy_load), so the
+server answers the greeting before TensorFlow has finished.
+
+Usage:
+    python warm_start.py prepare --model models/lightweight.tar.gz
+    python warm_start.py run --enable-api --port 5005 --model models/lightweight.tar.gz
+"""
+
+import argparse
+import contextlib
+import hashlib
+import json
+import logging
+import os
+import shutil
+import sys
+import tarfile
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Text, Tuple
+
+logger = logging.getLogger("warm_start")
+
+_STARTED = time.perf_counter()
+
+WARM_START_DIR = os.getenv("WARM_START_DIR", "models/warm")
+WARM_START_ENABLED = os.getenv("WARM_START_ENABLED", "true").lower() == "true"
+# Message used to trace the NLU and policy graphs before the first caller
+WARM_UP_TEXT = os.getenv("WARM_UP_TEXT", "hello")
+
+# Rasa releases whose MessageProcessor internals the patch was written against
+TESTED_RASA_VERSIONS = ("3.6.20",)
+# Private MessageProcessor members the patch replaces or calls
+PATCHED_MEMBERS = ("_load_model", "_parse_message_with_graph", "_predict_next_with_tracker")
+
+# Bump when the layout of a prepared directory changes
+FORMAT_VERSION = 1
+MANIFEST_FILE = "warm_start.json"
+COMPONENTS_DIR = "components"
+METADATA_FILE = "metadata.json"
+
+
+class StartupTimer:
+    """Named startup phases with their durations, logged as one breakdown."""
+
+    def __init__(self):
+        self.phases: List[Tuple[Text, float]] = []
+
+    @contextlib.contextmanager
+    def phase(self, name: Text) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, time.perf_counter() - started))
+
+    def report(self) -> None:
+        lines = [f"  {name:<28} {seconds * 1000:9.0f} ms" for name, seconds in self.phases]
+        lines.append(f"  {'ready after process start':<28} {(time.perf_counter() - _STARTED) * 1000:9.0f} ms")
+        logger.info("Startup timing:\n%s", "\n".join(lines))
+        self.phases.clear()
+
+
+def _sha256(path: Path) -> Text:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _archive_signature(path: Path) -> Dict[Text, int]:
+    stat = path.stat()
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def _read_archive_metadata(archive: Path) -> Dict[Text, Any]:
+    with tarfile.open(archive, mode="r:gz") as tar:
+        for member in tar:
+            if member.isfile() and member.name.lstrip("./") == METADATA_FILE:
+                return json.load(tar.extractfile(member))
+    raise ValueError(f"{archive} has no {METADATA_FILE}; is it a Rasa 3 model?")
+
+
+def _safe_members(tar: tarfile.TarFile, destination: Path) -> Iterator[tarfile.TarInfo]:
+    """Archive members, refusing anything that would land outside destination."""
+    root = destination.resolve()
+    for member in tar:
+        target = (destination / member.name).resolve()
+        if (root not in target.parents and target != root) or member.issym() or member.islnk():
+            raise ValueError(f"Unsafe path in model archive: {member.name}")
+        yield member
+
+
+def prepare(archive: Path, warm_dir: Path = Path(WARM_START_DIR)) -> Path:
+    """Unpack archive into its versioned warm directory, reusing an up-to-date one."""
+    prepared = find_prepared(archive, warm_dir)
+    if prepared is not None:
+        logger.info("Warm model %s is up to date", prepared)
+        return prepared
+
+    metadata = _read_archive_metadata(archive)
+    target = warm_dir / f"{metadata['model_id']}-v{FORMAT_VERSION}"
+    checksum = _sha256(archive)
+
+    manifest_path = target / MANIFEST_FILE
+    if manifest_path.exists():
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest.get("sha256") == checksum:
+            # Same bytes (e.g. a fresh checkout): only the signature needs updating
+            manifest.update(_archive_signature(archive))
+            with open(manifest_path, "w", encoding="utf-8") as f:
+                json.dump(manifest, f, indent=2)
+            logger.info("Warm model %s is up to date", target)
+            return target
+
+    warm_dir.mkdir(parents=True, exist_ok=True)
+    staging = warm_dir / f".{target.name}.{os.getpid()}.tmp"
+    shutil.rmtree(staging, ignore_errors=True)
+    staging.mkdir()
+    with tarfile.open(archive, mode="r:gz") as tar:
+        tar.extractall(staging, members=_safe_members(tar, staging))
+
+    manifest = {
+        "format_version": FORMAT_VERSION,
+        "model_id": metadata["model_id"],
+        "rasa_version": metadata.get("rasa_open_source_version"),
+        "archive": os.path.abspath(archive),
+        "sha256": checksum,
+        "prepared_at": time.time(),
+        **_archive_signature(archive),
+    }
+    with open(staging / MANIFEST_FILE, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+
+    shutil.rmtree(target, ignore_errors=True)
+    os.replace(staging, target)
+    logger.info("Prepared warm model %s from %s", target, archive)
+    return target
+
+
+def find_prepared(archive: Path, warm_dir: Path = Path(WARM_START_DIR)) -> Optional[Path]:
+    """The warm directory prepared from this exact archive file, if any."""
+    if not warm_dir.is_dir():
+        return None
+    signature = _archive_signature(archive)
+    for manifest_path in warm_dir.glob(f"*-v{FORMAT_VERSION}/{MANIFEST_FILE}"):
+        try:
+            with open(manifest_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if all(manifest.get(key) == value for key, value in signature.items()):
+            return manifest_path.parent
+    return None
+
+
+def install(timer: StartupTimer, warm_dir: Path = Path(WARM_START_DIR)) -> bool:
+    """
+    Patch Rasa's MessageProcessor to load prepared models from warm_dir and
+    to warm the inference graphs up once the processor exists. Returns False,
+    leaving Rasa untouched, on a version the patch was not written for.
+    """
+    with timer.phase("import rasa"):
+        import rasa
+        from rasa.core.channels.channel import UserMessage
+        from rasa.core.processor import MessageProcessor
+        from rasa.engine.graph import ExecutionContext
+        from rasa.engine.runner.dask import DaskGraphRunner
+        from rasa.engine.storage.local_model_storage import LocalModelStorage
+        from rasa.engine.storage.storage import ModelMetadata
+        from rasa.model import get_latest_model
+        from rasa.shared.core.events import UserUttered
+        from rasa.shared.core.trackers import DialogueStateTracker
+
+    missing = [name for name in PATCHED_MEMBERS if not hasattr(MessageProcessor, name)]
+    if rasa.__version__ not in TESTED_RASA_VERSIONS or missing:
+        logger.warning("Warm start supports Rasa %s, found %s%s; starting without it",
+                       ", ".join(TESTED_RASA_VERSIONS), rasa.__version__,
+                       f" (missing MessageProcessor.{', '.join(missing)})" if missing else "")
+        return False
+
+    load_model = MessageProcessor._load_model
+    init = MessageProcessor.__init__
+
+    def load_warm_model(model_path):
+        archive = model_path if os.path.isfile(model_path) else get_latest_model(model_path)
+        prepared = find_prepared(Path(archive), warm_dir) if archive else None
+        if prepared is None:
+            logger.warning("No warm model for %s, unpacking the archive", model_path)
+            with timer.phase("unpack and load archive"):
+                return load_model(model_path)
+
+        logger.info("Loading warm model %s", prepared)
+        with timer.phase("read model metadata"):
+            with open(prepared / METADATA_FILE, "r", encoding="utf-8") as f:
+                metadata = ModelMetadata.from_dict(json.load(f))
+        with timer.phase("load graph components"):
+            runner = DaskGraphRunner.create(
+                graph_schema=metadata.predict_schema,
+                model_storage=LocalModelStorage(prepared / COMPONENTS_DIR),
+                execution_context=ExecutionContext(graph_schema=metadata.predict_schema,
+                                                   model_id=metadata.model_id),
+            )
+        return os.path.basename(archive), metadata, runner
+
+    def init_and_warm_up(self, *args, **kwargs):
+        init(self, *args, **kwargs)
+        tracker = DialogueStateTracker("warm_start", self.domain.slots)
+        try:
+            with timer.phase("warm up NLU"):
+                parse_data = self._parse_message_with_graph(UserMessage(WARM_UP_TEXT), tracker)
+            with timer.phase("warm up policies"):
+                tracker.update(UserUttered(WARM_UP_TEXT, parse_data.get("intent"),
+                                           parse_data.get("entities"), parse_data))
+                self._predict_next_with_tracker(tracker)
+        except Exception as e:
+            # The first real message will trace the graphs instead
+            logger.warning("Warm-up failed: %s", str(e))
+        timer.report()
+
+    MessageProcessor._load_model = staticmethod(load_warm_model)
+    MessageProcessor.__init__ = init_and_warm_up
+    return True
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Prepare and serve warm-start Rasa models")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    prepare_parser = subparsers.add_parser("prepare", help="Unpack a model archive for warm starts")
+    prepare_parser.add_argument("--model", default="models", help="Model archive or directory of archives")
+    prepare_parser.add_argument("--warm-dir", default=WARM_START_DIR, help="Where prepared models are kept")
+    subparsers.add_parser("run", add_help=False, help="Run `rasa run` with warm starts; other arguments are passed on")
+    args, rasa_args = parser.parse_known_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s - %(message)s")
+
+    if args.command == "prepare":
+        model = Path(args.model)
+        if model.is_dir():
+            archives = sorted(model.glob("*.tar.gz"), key=lambda path: path.stat().st_mtime)
+            if not archives:
+                parser.error(f"No model archives in {model}")
+            model = archives[-1]
+        prepare(model, Path(args.warm_dir))
+        return
+
+    if WARM_START_ENABLED:
+        install(StartupTimer())
+    from rasa.__main__ import main as rasa_main
+
+    sys.argv = ["rasa", "run", *rasa_args]
+    rasa_main()
+
+
+if __name__ == "__main__":
+    main()